@@ -0,0 +1,101 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Benchmark sending a step of actions to a local redis-server, one `lpush`
+per value versus a single batched `lpush` per step."""
+
+import json
+import time
+
+import redis
+
+from absl import app
+from absl import flags
+
+from pylol.lib import actions
+from pylol.lib import common
+from pylol.lib import point
+from pylol.lib import portspicker
+from pylol.lib import remote_controller
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("host", "localhost", "Host to run redis-server on")
+flags.DEFINE_integer("num_players", 10, "Number of players sending an action each step")
+flags.DEFINE_integer("num_steps", 1000, "Number of steps to time for each method")
+
+def make_request(num_players):
+    """Build one step's worth of move actions, one per player."""
+    acts = []
+    for i in range(num_players):
+        action = common.Action()
+        actions.move(action, user_id=i + 1, move_range=point.Point(i % 8, 4))
+        acts.append(action)
+    return common.RequestAction(actions=acts)
+
+def send_unbatched(r, req_action):
+    """Send the actions like `RemoteController.player_move` used to, with an
+    `lpush` for the type and another for the payload of every action."""
+    for action in req_action.actions:
+        props = action.props
+        action = {
+            "player_id": str(props["user_id"]),
+            "x": float((props["move_range"].x - 4) * 100.0),
+            "y": float((props["move_range"].y - 4) * 100.0)
+        }
+        r.lpush("action", "move")
+        r.lpush("action", json.dumps(action))
+
+def time_steps(controller, req_action, batched):
+    start_time = time.time()
+    for _ in range(FLAGS.num_steps):
+        if batched:
+            controller.actions(req_action)
+        else:
+            send_unbatched(controller.r, req_action)
+    elapsed_time = time.time() - start_time
+    controller.r.delete("action")
+    return elapsed_time
+
+def main(unused_argv):
+    redis_port = portspicker.pick_unused_ports(1)[0]
+    controller = remote_controller.RemoteController(
+        None, FLAGS.host, None, timeout_seconds=FLAGS.lol_timeout,
+        kwargs={"redis_port": redis_port})
+    try:
+        for _ in range(100):
+            try:
+                controller.r.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.05)
+
+        req_action = make_request(FLAGS.num_players)
+        for name, batched in (("unbatched", False), ("batched", True)):
+            elapsed_time = time_steps(controller, req_action, batched)
+            print("%s: %.3f seconds for %s steps of %s actions: %.1f steps/sec" % (
+                name, elapsed_time, FLAGS.num_steps, FLAGS.num_players,
+                FLAGS.num_steps / elapsed_time))
+    finally:
+        controller.close()
+        portspicker.return_ports([redis_port])
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,179 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Benchmark the throughput of `LoLEnv.step` against the fake GameServer.
+
+Runs each config against `lib/fake_game_server.py` over a local
+redis-server and reports steps/sec, the p50/p99 latency of a step and a
+breakdown of where the time goes, timed with a `metrics.SampleCollector`:
+
+    transform_action: Validating and converting the agents' actions.
+    send_actions: Sending the actions to Redis.
+    observe: Waiting for the next tick's observations, split into `brpop`,
+        the time spent waiting on Redis, and `decode`, decoding them.
+    transform_obs: Converting the observations into numpy arrays.
+    calc_reward: Calculating the rewards.
+
+The results can be saved as JSON to compare between versions of pylol, e.g.
+
+    python -m pylol.bin.benchmark_env --output=before.json
+"""
+
+import json
+import platform
+import shutil
+import sys
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from pylol import run_configs
+from pylol.env import lol_env
+from pylol.lib import actions
+from pylol.lib import metrics
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list("configs", ["1v1", "5v5"], "Which team sizes to benchmark, e.g. 1v1,5v5")
+flags.DEFINE_integer("num_steps", 2000, "Number of steps to time for each config")
+flags.DEFINE_integer("warmup_steps", 100, "Number of steps to run before timing")
+flags.DEFINE_string("host", "localhost", "Host of GameServer and Redis")
+flags.DEFINE_bool("binary_observations", False, "Ask the GameServer for binary observations")
+flags.DEFINE_bool("reuse_observations", False, "Reuse preallocated observation arrays between steps")
+flags.DEFINE_bool("unix_socket", False, "Talk to redis-server over a Unix domain socket instead of TCP")
+flags.DEFINE_string("output", None, "Where to save the results as JSON")
+
+PHASES = ["transform_action", "send_actions", "observe", "brpop", "decode",
+          "transform_obs", "calc_reward"]
+COUNTERS = ["redis_round_trips", "bytes_received", "actions_sent",
+            "observations"]
+
+def parse_config(config):
+    blue, purple = (int(n) for n in config.lower().split("v"))
+    return ([lol_env.Agent(champion="Ezreal", team="BLUE")] * blue +
+            [lol_env.Agent(champion="Ezreal", team="PURPLE")] * purple)
+
+def agent_actions(timesteps, step):
+    """Cheap deterministic actions, alternating moving and casting at the
+    nearest enemy, so the agents cost next to nothing."""
+    acts = []
+    for timestep in timesteps:
+        obs = timestep.observation
+        if step % 2:
+            enemy = obs["enemy_unit"]
+            acts.append(actions.FunctionCall(actions.FUNCTIONS.spell.id, [
+                [step % 4], [enemy.position_x, enemy.position_y]]))
+        else:
+            acts.append(actions.FunctionCall(actions.FUNCTIONS.move.id, [
+                [step % 8, 7 - step % 8]]))
+    return acts
+
+def run_config(config):
+    players = parse_config(config)
+    collector = metrics.SampleCollector()
+    with lol_env.LoLEnv(
+        host=FLAGS.host,
+        map_name="Old Summoners Rift",
+        players=players,
+        agent_interface_format=lol_env.parse_agent_interface_format(
+            feature_map=16000,
+            feature_move_range=8),
+        binary_observations=FLAGS.binary_observations,
+        reuse_observations=FLAGS.reuse_observations,
+        redis_unix_socket=FLAGS.unix_socket,
+        run_config=run_configs.platforms.Fake(),
+        metrics_collector=collector) as env:
+
+        env.connect()
+        startup_times = env.startup_times
+        timesteps = env.reset()
+        step_times = []
+        episodes = 0
+        for step in range(FLAGS.warmup_steps + FLAGS.num_steps):
+            if step == FLAGS.warmup_steps:
+                collector.reset()
+                start_time = time.perf_counter()
+            step_start = time.perf_counter()
+            if timesteps[0].last():
+                episodes += 1
+                timesteps = env.reset()
+            else:
+                timesteps = env.step(agent_actions(timesteps, step))
+            if step >= FLAGS.warmup_steps:
+                step_times.append(time.perf_counter() - step_start)
+        elapsed_time = time.perf_counter() - start_time
+        stats = collector.stats()
+        counters = collector.snapshot()["counters"]
+
+    step_ms = np.array(step_times) * 1000
+    return {
+        "num_agents": len(players),
+        "num_steps": FLAGS.num_steps,
+        "episodes": episodes,
+        # Seconds from launching the game until each startup state.
+        "startup": startup_times,
+        "seconds": elapsed_time,
+        "steps_per_sec": FLAGS.num_steps / elapsed_time,
+        "step_ms": {
+            "mean": float(step_ms.mean()),
+            "p50": float(np.percentile(step_ms, 50)),
+            "p99": float(np.percentile(step_ms, 99)),
+        },
+        # Mean, p50 and p99 milliseconds of each phase, per call.
+        "phases": {name: stats[name] for name in PHASES if name in stats},
+        "per_step": {name: counters.get(name, 0) / FLAGS.num_steps
+                     for name in COUNTERS},
+    }
+
+def main(unused_argv):
+    if not shutil.which("redis-server"):
+        sys.exit("The benchmark needs redis-server on the PATH.")
+
+    results = {}
+    for config in FLAGS.configs:
+        result = results[config] = run_config(config)
+        print("%s: %.1f steps/sec, step p50 %.3fms p99 %.3fms, %s episodes" % (
+            config, result["steps_per_sec"], result["step_ms"]["p50"],
+            result["step_ms"]["p99"], result["episodes"]))
+        for name, s in result["phases"].items():
+            print("    %-17s mean %8.3fms  p50 %8.3fms  p99 %8.3fms" % (
+                name, s["mean"], s["p50"], s["p99"]))
+        for name, value in result["per_step"].items():
+            print("    %-17s %.1f per step" % (name, value))
+        for name, seconds in result["startup"].items():
+            print("    %-17s %.3fs after launch" % (name, seconds))
+
+    if FLAGS.output:
+        with open(FLAGS.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "flags": {"num_steps": FLAGS.num_steps,
+                          "warmup_steps": FLAGS.warmup_steps,
+                          "binary_observations": FLAGS.binary_observations,
+                          "reuse_observations": FLAGS.reuse_observations,
+                          "unix_socket": FLAGS.unix_socket},
+                "results": results,
+            }, f, indent=4)
+        print("Wrote results to:", FLAGS.output)
+
+if __name__ == "__main__":
+    app.run(main)
@@ -26,9 +26,11 @@ import os
 from absl import flags
 from absl import app
 
+from pylol import run_configs
 from pylol.agents import base_agent, random_agent, scripted_agent
 from pylol.env import lol_env
 from pylol.env import run_loop
+from pylol.env import trajectory
 from pylol.lib import point_flag
 
 FLAGS = flags.FLAGS
@@ -38,7 +40,9 @@ point_flag.DEFINE_point("feature_move_range", "8",
                         "Resolution for screen feature layers.")
 flags.DEFINE_string("players", "Ezreal.BLUE,Ezreal.PURPLE", "Formatted list of champions and teams")
 flags.DEFINE_string("map", "Old Summoners Rift", "Name of league map to use.")
+flags.DEFINE_string("spawn_positions", "6900:6900,7100:7100", "Formatted list of x:y positions the first players start each episode at")
 flags.DEFINE_bool("save_replay", False, "Whether to save a replay at the end.")
+flags.DEFINE_string("record_dir", None, "Directory to record the observations, actions and rewards of every step to")
 flags.DEFINE_bool("run_client", False, "Whether to run the league client or not.")
 flags.DEFINE_string("agent", "random", "Which inbuilt agent to run")
 flags.DEFINE_integer("max_episodes", 0, "Maximum number of episodes to run")
@@ -51,10 +55,15 @@ flags.DEFINE_bool("manacosts_enabled", False, "Toggles mana costs for spells (de
 flags.DEFINE_bool("minion_spawns_enabled", False, "Toggles spawning of minions (default is False")
 flags.DEFINE_float("multiplier", 7.5, "How many observations and actions per second (default is 7.5)")
 flags.DEFINE_float("step_multiplier", 1, "Real-time step multiplier so 2 would be 2x real time (default is 1)")
+flags.DEFINE_bool("binary_observations", False, "Ask the GameServer for binary observations (default is False)")
+flags.DEFINE_bool("reuse_observations", False, "Reuse preallocated observation arrays between steps (default is False)")
+flags.DEFINE_bool("fake_game_server", False, "Run the pure Python fake GameServer instead of the real one (default is False)")
 
 def main(unused_argv):
     players = []
     agents = []
+    spawn_positions = [tuple(float(v) for v in p.split(":"))
+                       for p in FLAGS.spawn_positions.split(",") if p]
 
     for player in FLAGS.players.split(","):
         c, t = player.split(".")
@@ -66,7 +75,7 @@ def main(unused_argv):
         elif FLAGS.agent == "scripted":
             agents.append(scripted_agent.ScriptedAgent())
 
-    with lol_env.LoLEnv(
+    env = lol_env.LoLEnv(
         host=FLAGS.host,
         map_name=FLAGS.map,
         players=players,
@@ -76,10 +85,17 @@ def main(unused_argv):
         human_observer=FLAGS.run_client,
         cooldowns_enabled=FLAGS.enable_cooldowns,
         manacosts_enabled=FLAGS.manacosts_enabled,
-        config_path=FLAGS.config_path,
+        config_path="" if FLAGS.fake_game_server else FLAGS.config_path,
         multiplier=FLAGS.multiplier,
-        step_multiplier=FLAGS.step_multiplier) as env:
+        step_multiplier=FLAGS.step_multiplier,
+        binary_observations=FLAGS.binary_observations,
+        reuse_observations=FLAGS.reuse_observations,
+        spawn_positions=spawn_positions[:len(players)],
+        run_config=run_configs.platforms.Fake() if FLAGS.fake_game_server else None)
+    if FLAGS.record_dir:
+        env = trajectory.TrajectoryRecorder(env, FLAGS.record_dir)
 
+    with env:
         run_loop.run_loop(agents, env, max_episodes=FLAGS.max_episodes,
                           max_steps=FLAGS.max_steps)
         if FLAGS.save_replay:
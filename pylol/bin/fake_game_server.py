@@ -0,0 +1,64 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Run the fake GameServer in `lib/fake_game_server.py`.
+
+Takes the same arguments as `GameServerConsole`, so `LoLProcess` can launch it
+in place of the real binary, see `run_configs.platforms.Fake`."""
+
+import os
+
+from absl import app
+from absl import flags
+
+from pylol.lib import fake_game_server
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("host", "localhost", "Host of redis-server")
+flags.DEFINE_integer("port", 5119, "Port for clients to join on (unused)")
+flags.DEFINE_integer("redis_port", 6379, "Port of redis-server")
+flags.DEFINE_integer("human_count", 0, "Number of human players (unused)")
+flags.DEFINE_integer("agent_count", 2, "Number of agents, when there are no settings")
+flags.DEFINE_float("multiplier", 7.5, "How many observations per second of game time")
+flags.DEFINE_float("step_multiplier", 1, "Real-time step multiplier (unused, the fake runs in lockstep)")
+flags.DEFINE_string("replay_path", "", "Replay to run (unsupported)")
+flags.DEFINE_string("settings", "Settings/GameInfo.json", "Game settings written by `LoLProcess`")
+flags.DEFINE_bool("batch_ticks", False, "Send every agent's observations for a tick as one message")
+flags.DEFINE_string("redis_key_prefix", "", "Prefix of the Redis lists of this game, when sharing redis-server")
+flags.DEFINE_string("redis_unix_socket", None, "Unix socket of redis-server, instead of TCP")
+
+def main(unused_argv):
+    kwargs = dict(redis_host=FLAGS.host,
+                  redis_port=FLAGS.redis_port,
+                  multiplier=FLAGS.multiplier,
+                  batch_ticks=FLAGS.batch_ticks,
+                  key_prefix=FLAGS.redis_key_prefix,
+                  redis_unix_socket=FLAGS.redis_unix_socket)
+    if os.path.isfile(FLAGS.settings):
+        server = fake_game_server.FakeGameServer.from_settings(FLAGS.settings, **kwargs)
+    else:
+        teams = ["BLUE", "PURPLE"]
+        players = [("Ezreal", teams[i % 2]) for i in range(FLAGS.agent_count)]
+        server = fake_game_server.FakeGameServer(players=players, **kwargs)
+    server.run()
+
+if __name__ == "__main__":
+    app.run(main)
@@ -21,54 +21,94 @@
 # SOFTWARE.
 """Run multiple games at once.
 
-Current example runs 4 concurrent 5v5 games. Not fully tested, don't trust at this stage.
-"""
+Runs `--count` games, at most `--max_concurrent` at a time and one per CPU by
+default, with `env/orchestrator.py`. Games whose GameServer crashes or hangs
+are restarted, the total throughput is logged every `--report_secs`, and
+every GameServer and redis-server is shut down on exit, e.g.
 
-import subprocess
+    python -m pylol.bin.parallel --count=8 --max_steps=10000 --fake_game_server
+"""
 
 from absl import flags
 from absl import app
 
-from pylol.lib import run_parallel
+from pylol import run_configs
+from pylol.agents import base_agent, random_agent, scripted_agent
+from pylol.env import lol_env
+from pylol.env import orchestrator
+from pylol.lib import metrics
+from pylol.lib import point_flag
 
 FLAGS = flags.FLAGS
+point_flag.DEFINE_point("feature_map_size", "16000",
+                        "Resolution for screen feature layers.")
+point_flag.DEFINE_point("feature_move_range", "8",
+                        "Resolution for screen feature layers.")
 flags.DEFINE_string("players", "Ezreal.BLUE,Ezreal.PURPLE", "Formatted list of champions and teams")
 flags.DEFINE_string("map", "Old Summoners Rift", "Name of league map to use.")
 flags.DEFINE_bool("save_replay", True, "Whether to save a replay at the end.")
-flags.DEFINE_integer("count", 1, "Number of games to run at once")
+flags.DEFINE_integer("count", 1, "Number of games to run")
+flags.DEFINE_integer("max_concurrent", None, "Number of games to run at once, at most and by default the number of CPUs")
+flags.DEFINE_integer("max_restarts", 3, "How many times to restart a crashed game before giving up on it")
+flags.DEFINE_integer("health_timeout_secs", 120, "Restart a game which hasn't stepped for this long")
+flags.DEFINE_integer("report_secs", 5, "How often to log the throughput of every game together")
 flags.DEFINE_string("agent", "random", "Which inbuilt agent to run")
 flags.DEFINE_integer("max_episodes", 0, "Maximum number of episodes to run")
 flags.DEFINE_integer("max_steps", 0, "Maximum number of steps to run")
 flags.DEFINE_string("host", "localhost", "Host of GameServer and Redis")
-flags.DEFINE_string("config_path", "./config_dirs.txt", "File containing directories of gameserver, lol client and redis conf respectively")
+flags.DEFINE_string("config_path", "./config.txt", "File containing directories of GameServer, League client respectively")
 flags.DEFINE_bool("enable_cooldowns", False, "Toggles cooldowns (default is False)")
 flags.DEFINE_bool("manacosts_enabled", False, "Toggles mana costs for spells (default is False)")
 flags.DEFINE_bool("minion_spawns_enabled", False, "Toggles spawning of minions (default is False")
+flags.DEFINE_bool("redis_unix_socket", False, "Talk to redis-server over a Unix domain socket instead of TCP")
+flags.DEFINE_bool("fake_game_server", False, "Run the pure Python fake GameServer instead of the real one (default is False)")
+
+AGENTS = {
+    "base": base_agent.BaseAgent,
+    "random": random_agent.RandomAgent,
+    "scripted": scripted_agent.ScriptedAgent,
+}
 
 def main(unused_argv):
-    parallel = run_parallel.RunParallel()
+    players = []
+    for player in FLAGS.players.split(","):
+        c, t = player.split(".")
+        players.append(lol_env.Agent(champion=c, team=t))
 
-    args = ["python3", 
-    "-m", "pylol.bin.client", 
-    "--players", str(FLAGS.players),
-    "--map", str(FLAGS.map),
-    "--save_replay", str(FLAGS.save_replay),
-    "--max_steps", str(FLAGS.max_steps),
-    "--max_episodes", str(FLAGS.max_episodes),
-    "--agent", str(FLAGS.agent),
-    "--players", str(FLAGS.players),
-    "--host", str(FLAGS.host),
-    "--enable_cooldowns", str(FLAGS.enable_cooldowns),
-    "--manacosts_enabled", str(FLAGS.manacosts_enabled),
-    "--minion_spawns_enabled", str(FLAGS.minion_spawns_enabled)]
+    with orchestrator.Orchestrator(
+        FLAGS.count,
+        AGENTS[FLAGS.agent],
+        max_concurrent=FLAGS.max_concurrent,
+        max_steps=FLAGS.max_steps,
+        max_episodes=FLAGS.max_episodes,
+        save_replay=FLAGS.save_replay,
+        max_restarts=FLAGS.max_restarts,
+        health_timeout_secs=FLAGS.health_timeout_secs,
+        report_secs=FLAGS.report_secs,
+        host=FLAGS.host,
+        map_name=FLAGS.map,
+        players=players,
+        agent_interface_format=lol_env.parse_agent_interface_format(
+            feature_map=FLAGS.feature_map_size,
+            feature_move_range=FLAGS.feature_move_range),
+        cooldowns_enabled=FLAGS.enable_cooldowns,
+        manacosts_enabled=FLAGS.manacosts_enabled,
+        minion_spawns_enabled=FLAGS.minion_spawns_enabled,
+        config_path="" if FLAGS.fake_game_server else FLAGS.config_path,
+        redis_unix_socket=FLAGS.redis_unix_socket,
+        run_config=run_configs.platforms.Fake() if FLAGS.fake_game_server else None) as orch:
 
-    try:
-        parallel.run((subprocess.Popen, args) for _ in range(FLAGS.count))
-    except KeyboardInterrupt:
-        print("CLOSE EVERYTHING :D")
+        try:
+            stats = orch.run(exporter=metrics.LogExporter(orch))
+        except KeyboardInterrupt:
+            print("CLOSE EVERYTHING :D")
+            stats = orch.stats()
+    print("Ran %s games, %s failed and %s restarts: %s steps at %.1f steps/sec" % (
+        stats["games_finished"], stats["games_failed"], stats["game_restarts"],
+        stats["steps"], stats["steps_per_sec"]))
 
 def entry_point():
     app.run(main)
 
 if __name__ == "__main__":
-    app.run(main)
\ No newline at end of file
+    app.run(main)
@@ -19,27 +19,127 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-"""Watch a replay which was made using pylol using the league client."""
+"""Watch a replay which was made using pylol using the league client.
+
+With --headless the replays are instead re-simulated without a client at a
+high step multiplier, by stepping a `LoLEnv` with the actions of each replay,
+and their observations are recorded as trajectories under --output_dir, see
+`trajectory.record_replay`. This regenerates the training data of old games
+for a new set of features, e.g.
+
+    python -m pylol.bin.replay --headless --replay_dir=replays --output_dir=out
+
+where each replay is recorded to `output_dir/<replay name>` by one of
+--processes GameServers.
+"""
 
 from configparser import ConfigParser
+import functools
+import multiprocessing
+import os
 
 from pylol.lib import lol_process
 from pylol import run_configs
 from pylol.env import lol_env
+from pylol.env import trajectory
 from pylol.lib import portspicker
 from pylol.lib import replay
+from pylol.lib import replay_index
 
 from absl import flags
 from absl import app
+from absl import logging
 
 flags.DEFINE_string("replay_path", "", "Path to the replay file")
 flags.DEFINE_string("config_path", "./config.txt", "File containing directories of GameServer, League client respectively")
 flags.DEFINE_string("host", "localhost", "Host for GameServer and league client")
 flags.DEFINE_string("players", "Ezreal.BLUE,Ezreal.PURPLE", "NOTE: TEMPORARY")
+flags.DEFINE_bool("headless", False, "Re-simulate the replays without a client and record their observations")
+flags.DEFINE_string("replay_dir", "", "Directory of replays to re-simulate with --headless, instead of --replay_path")
+flags.DEFINE_string("output_dir", "", "Where to record the trajectories with --headless")
+flags.DEFINE_integer("processes", 1, "Number of replays to re-simulate at once, each with its own GameServer")
+flags.DEFINE_float("step_multiplier", 100.0, "Real-time step multiplier to re-simulate at with --headless")
+flags.DEFINE_integer("feature_map", 16000, "Size of the feature map to record with --headless")
+flags.DEFINE_integer("feature_move_range", 8, "Move range the replays were played with, to decode and re-simulate their moves with")
+flags.DEFINE_bool("fake_game_server", False, "Re-simulate with the fake GameServer instead of the one in --config_path")
 
 FLAGS = flags.FLAGS
 
+_worker_ports = None
+
+def _init_worker(ports):
+    """Take the ports of this worker's games, reserved by the parent so the
+    workers can't pick the same ones."""
+    global _worker_ports
+    _worker_ports = ports.get()
+
+def _record(output_dir, env_kwargs, replay_path):
+    """Record one replay in a worker, returning errors rather than raising
+    them so one bad replay doesn't stop the rest."""
+    name = os.path.splitext(os.path.basename(replay_path))[0]
+    try:
+        steps = trajectory.record_replay(
+            replay_path, os.path.join(output_dir, name), ports=_worker_ports,
+            **env_kwargs)
+        return replay_path, steps, None
+    except Exception as e:  # Logged by the parent instead.
+        return replay_path, 0, "%s: %s" % (type(e).__name__, e)
+
+def resimulate():
+    """Record every replay with `trajectory.record_replay`, across a pool of
+    processes."""
+    if not FLAGS.output_dir:
+        raise ValueError("--headless needs an --output_dir.")
+    if FLAGS.replay_dir:
+        replay_paths = replay_index.find_replays(FLAGS.replay_dir)
+    elif FLAGS.replay_path:
+        replay_paths = [FLAGS.replay_path]
+    else:
+        raise ValueError("--headless needs a --replay_dir or --replay_path.")
+
+    env_kwargs = {
+        "host": FLAGS.host,
+        "step_multiplier": FLAGS.step_multiplier,
+        "agent_interface_format": lol_env.parse_agent_interface_format(
+            feature_map=FLAGS.feature_map,
+            feature_move_range=FLAGS.feature_move_range),
+    }
+    if FLAGS.fake_game_server:
+        env_kwargs["run_config"] = run_configs.platforms.Fake()
+    else:
+        env_kwargs["config_path"] = FLAGS.config_path
+
+    processes = max(1, min(FLAGS.processes, len(replay_paths)))
+    ports = portspicker.pick_contiguous_unused_ports(2 * processes)
+    worker_ports = multiprocessing.Queue()
+    for i in range(0, len(ports), 2):
+        worker_ports.put(ports[i:i + 2])
+    recorded = failed = steps = 0
+    try:
+        with multiprocessing.Pool(processes, _init_worker,
+                                  (worker_ports,)) as pool:
+            record = functools.partial(_record, FLAGS.output_dir, env_kwargs)
+            for replay_path, replay_steps, error in pool.imap_unordered(
+                    record, replay_paths):
+                if error:
+                    logging.warning("Failed to re-simulate replay %s: %s",
+                                    replay_path, error)
+                    failed += 1
+                else:
+                    logging.info("Recorded %s steps of %s.", replay_steps,
+                                 replay_path)
+                    recorded += 1
+                    steps += replay_steps
+    finally:
+        portspicker.return_ports(ports)
+    print("Recorded %s replays, %s steps, to %s. %s failed." % (
+        recorded, steps, FLAGS.output_dir, failed))
+
 def main(unused_argv):
+    if FLAGS.headless:
+        resimulate()
+        return
+
     try:
         with open(FLAGS.config_path) as f:
             cfg = ConfigParser()
@@ -51,7 +151,7 @@ def main(unused_argv):
 
     try:
         with open(FLAGS.replay_path) as f:
-            replay_info = replay.get_replay_info(f.read())
+            replay_info = replay.read_replay_info(f)
     except:
         raise IOError("Could not open replay file: '%s'" % FLAGS.config_path)
 
@@ -0,0 +1,71 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Index a directory of replays and search it.
+
+Parses the replays saved by `LoLEnv.save_replay` across a pool of processes
+into an SQLite index, see `lib/replay_index.py`, which later runs only update
+with the new and changed replays. Then lists the replays matching the
+`--map`, `--champions`, `--min_actions`, `--max_actions` and `--multiplier`
+filters, e.g.
+
+    python -m pylol.bin.replay_index --replay_dir=./replays --champions=Ezreal
+"""
+
+import json
+
+from absl import app
+from absl import flags
+
+from pylol.lib import replay_index
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("replay_dir", None, "Directory of the replays to index")
+flags.DEFINE_string("index_path", "./replays.db", "Where to keep the SQLite index")
+flags.DEFINE_integer("processes", None, "Number of processes to parse replays with, defaults to the number of CPUs")
+flags.DEFINE_bool("update", True, "Whether to index the new and changed replays first")
+flags.DEFINE_string("map", None, "Only list replays on this map")
+flags.DEFINE_list("champions", [], "Only list replays with all of these champions")
+flags.DEFINE_integer("min_actions", None, "Only list replays with at least this many actions")
+flags.DEFINE_integer("max_actions", None, "Only list replays with at most this many actions")
+flags.DEFINE_float("multiplier", None, "Only list replays played at this multiplier")
+flags.DEFINE_bool("json", False, "List the info of each replay as JSON lines instead of its path")
+flags.mark_flag_as_required("replay_dir")
+
+def main(unused_argv):
+    with replay_index.ReplayIndex(FLAGS.index_path) as index:
+        if FLAGS.update:
+            counts = index.update(FLAGS.replay_dir, processes=FLAGS.processes)
+            print("Indexed %(indexed)s replays, %(unchanged)s unchanged, "
+                  "%(removed)s removed and %(failed)s failed." % counts)
+
+        for row in index.query(map_name=FLAGS.map,
+                               champions=FLAGS.champions,
+                               min_actions=FLAGS.min_actions,
+                               max_actions=FLAGS.max_actions,
+                               multiplier=FLAGS.multiplier):
+            print(json.dumps(row) if FLAGS.json else row["path"])
+
+def entry_point():
+    app.run(main)
+
+if __name__ == "__main__":
+    app.run(main)
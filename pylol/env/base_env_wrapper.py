@@ -49,4 +49,10 @@ class BaseEnvWrapper(environment.Base):
     
     @property
     def state(self):
-        return self.env.state
\ No newline at end of file
+        return self.env.state
+
+    def __getattr__(self, name):
+        # Anything else, e.g. `players`, comes from the wrapped env.
+        if name == "env":
+            raise AttributeError(name)
+        return getattr(self.env, name)
\ No newline at end of file
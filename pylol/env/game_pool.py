@@ -0,0 +1,204 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""A pool of games which are launched ahead of time and reused.
+
+Launching a GameServer and waiting for it to start the game takes seconds,
+far longer than a whole episode of stepping. A `GamePool` launches its games
+in parallel up front, connects to each of them, and hands them out to each
+`LoLEnv` created with it as its `game_pool`. Closing the env gives the game
+back to the pool rather than shutting it down, and `LoLEnv.reset` starts each
+episode by resetting the champions within the running game, so a game is
+only ever launched once, e.g.
+
+    with game_pool.GamePool(4, players=players, map_name=map_name,
+                            run_config=run_config) as pool:
+        for _ in range(num_runs):
+            with lol_env.LoLEnv(players=players, map_name=map_name,
+                                agent_interface_format=aif,
+                                game_pool=pool) as env:
+                ...
+"""
+
+import queue
+import threading
+
+from absl import logging
+
+from pylol import run_configs
+from pylol.env import lol_env
+from pylol.lib import portspicker
+
+class GamePool(object):
+    """A fixed number of running, connected games, reused between envs."""
+
+    def __init__(self, size, run_config=None, config_path="", **game_kwargs):
+        """Launch the games of the pool in the background.
+
+        Args:
+            size: The number of games to run.
+            run_config: The `run_configs.lib.RunConfig` to launch the games
+                with, like `LoLEnv`.
+            config_path: The config listing the GameServer and client
+                directories, like `LoLEnv`.
+            **game_kwargs: The arguments of `LoLEnv` for launching a game, e.g.
+                `host`, `players`, `map_name` and `shared_redis_port`. Every
+                game plays `players` on `map_name`.
+        """
+        if not game_kwargs.get("players"):
+            raise ValueError("Missing players.")
+        if not game_kwargs.get("map_name"):
+            raise ValueError("Missing a map name.")
+
+        game_server_dir = client_dir = ""
+        if config_path or not run_config:
+            game_server_dir, client_dir = lol_env.read_config(config_path)
+        game_kwargs.setdefault("game_server_dir", game_server_dir)
+        game_kwargs.setdefault("client_dir", client_dir)
+        game_kwargs.setdefault("human_observer", False)
+        game_kwargs.setdefault("cooldowns_enabled", False)
+        game_kwargs.setdefault("manacosts_enabled", False)
+        game_kwargs.setdefault("minion_spawns_enabled", False)
+
+        self._run_config = run_config or run_configs.get(game_server_dir)
+        self._game_kwargs = game_kwargs
+        self._size = size
+        self._games = queue.Queue()
+        self._ports = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._closed = False
+
+        for _ in range(size):
+            self._launch()
+
+    @property
+    def players(self):
+        return self._game_kwargs["players"]
+
+    @property
+    def map_name(self):
+        return self._game_kwargs["map_name"]
+
+    @property
+    def run_config(self):
+        return self._run_config
+
+    @property
+    def size(self):
+        return self._size
+
+    def _launch(self):
+        """Launch and connect to a game in the background, adding it to the
+        pool once it has started, or the error if it fails to."""
+        def run():
+            lol_proc = None
+            try:
+                lol_proc, ports = lol_env.launch_game(
+                    self._run_config, **self._game_kwargs)
+                with self._lock:
+                    self._ports[lol_proc] = ports
+                lol_proc.controller.connect()
+                self._games.put(lol_proc)
+            except Exception as e:
+                logging.exception("Failed to launch a game for the pool.")
+                if lol_proc:
+                    self._close_game(lol_proc)
+                self._games.put(e)
+
+        thread = threading.Thread(target=run, name="game_pool_launch", daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def acquire(self, timeout=None):
+        """Take a game from the pool, waiting for one to start or be released.
+
+        Returns:
+            The `LoLProcess` of a game whose controller is connected.
+
+        Raises:
+            queue.Empty: No game was free within `timeout` seconds.
+            ValueError: The pool is closed.
+        """
+        if self._closed:
+            raise ValueError("The game pool is closed.")
+        game = self._games.get(timeout=timeout)
+        if isinstance(game, Exception):
+            # Try again for the next one.
+            self._launch()
+            raise game
+        if game.exit_code is not None:
+            logging.warning("Replacing a game which exited with: %s", game.exit_code)
+            self._close_game(game)
+            self._launch()
+            return self.acquire(timeout)
+        return game
+
+    def release(self, lol_proc, players=None):
+        """Give a game back to the pool.
+
+        Args:
+            lol_proc: The `LoLProcess` from `acquire`.
+            players: The players the game ended with, if any champions were
+                changed, which are changed back to those of the pool.
+        """
+        if self._closed or lol_proc.exit_code is not None:
+            self._close_game(lol_proc)
+            if not self._closed:
+                self._launch()
+            return
+        if players:
+            for i, (player, default) in enumerate(zip(players, self.players)):
+                if player.champ != default.champ:
+                    lol_proc.controller.player_change(i + 1, default.champ)
+        self._games.put(lol_proc)
+
+    def _close_game(self, lol_proc):
+        lol_proc.close()
+        with self._lock:
+            ports = self._ports.pop(lol_proc, None)
+        if ports:
+            portspicker.return_ports(ports)
+
+    def close(self):
+        """Shut down every game in the pool. Games which are still in use are
+        shut down when they are released."""
+        logging.info("Game Pool Close")
+        self._closed = True
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+        while True:
+            try:
+                game = self._games.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(game, Exception):
+                self._close_game(game)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
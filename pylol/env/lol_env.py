@@ -32,9 +32,11 @@ import enum
 from pylol import maps
 from pylol import run_configs
 from pylol.env import environment
+from pylol.env import rewards
 from pylol.lib import features
-from pylol.lib import common
+from pylol.lib import metrics
 from pylol.lib import portspicker
+from pylol.lib import redis_server
 
 def to_list(arg):
     return arg if isinstance(arg, list) else [arg]
@@ -71,7 +73,18 @@ class LoLEnv(environment.Base):
                  minion_spawns_enabled=False,
                  config_path="",
                  multiplier=7.5,
-                 step_multiplier=1):
+                 step_multiplier=1,
+                 binary_observations=False,
+                 reuse_observations=False,
+                 reward_weights=None,
+                 ports=None,
+                 run_config=None,
+                 metrics_collector=None,
+                 shared_redis_port=None,
+                 redis_unix_socket=False,
+                 shared_redis_unix_socket=None,
+                 spawn_positions=None,
+                 game_pool=None):
         """Create a League of Legends v4.20 Env.
 
         Args:
@@ -79,6 +92,41 @@ class LoLEnv(environment.Base):
                 this defaults to `Old Summoners Rift`.
             players: A list of Agent instances that specify who will play.
             replay_dir: Directory for the custom replay file to save to.
+            binary_observations: Whether to ask the GameServer for the compact
+                binary observation format in `lib/binary_obs.py`. JSON
+                observations are still handled if it doesn't support it.
+            reuse_observations: Whether to write observations into preallocated
+                double buffered arrays instead of allocating them every step.
+                Each observation is then only valid until the step after the
+                one which returned it.
+            reward_weights: The `rewards.RewardWeights` used to calculate the
+                reward of each agent, defaults to `rewards.RewardWeights()`.
+            ports: A (client_port, redis_port) pair to use instead of picking
+                unused ports, e.g. when they are reserved by a parent process.
+                Only the client_port is needed when Redis doesn't need a port.
+            run_config: The `run_configs.lib.RunConfig` to launch the
+                GameServer with, e.g. `run_configs.platforms.Fake()`. Defaults
+                to the one for this platform, in which case `config_path` must
+                list the GameServer and client directories.
+            metrics_collector: A `metrics.Collector` to record the timings
+                and counters of each step with, defaults to `metrics.NO_OP`.
+            shared_redis_port: Port of a `redis_server.RedisServer` on `host`
+                to share with other environments instead of starting one. The
+                game's keys are prefixed with `redis_server.key_prefix`, so the
+                GameServer must support `--redis_key_prefix`.
+            redis_unix_socket: Whether to start redis-server on a Unix domain
+                socket instead of TCP, for when everything runs on one host.
+                The GameServer must support `--redis_unix_socket`.
+            shared_redis_unix_socket: Path of the Unix socket of a
+                `redis_server.RedisServer` to share, like `shared_redis_port`.
+            spawn_positions: A list of (x, y) positions to teleport the
+                champions of the first players to at the start of every
+                episode. Defaults to `DEFAULT_SPAWN_POSITIONS`, pass an empty
+                list to leave the champions where the reset puts them.
+            game_pool: A `game_pool.GamePool` of games already launched with
+                the same players and map to take one from, instead of launching
+                a new one. The game is given back to the pool on `close`, and
+                the arguments for launching a game are ignored.
         """
 
         if not host:
@@ -94,34 +142,54 @@ class LoLEnv(environment.Base):
         
         if agent_interface_format is None:
             raise ValueError("Please specify agent_interface_format.")
+
+        if spawn_positions and len(spawn_positions) > len(players):
+            raise ValueError("Expected at most %s spawn positions, got: %s" % (
+                len(players), len(spawn_positions)))
         
         self._agent_interface_format = agent_interface_format
 
         # num_players = len(players)
         self._num_agents = sum(1 for p in players if isinstance(p, Agent))
         self.players = players
+        self._reuse_observations = reuse_observations
+        self._reward_weights = reward_weights or rewards.RewardWeights()
+        self._reward_terms = None
+        self._metrics = metrics_collector or metrics.NO_OP
+        if spawn_positions is None:
+            spawn_positions = DEFAULT_SPAWN_POSITIONS[:len(players)]
+        self._spawn_positions = spawn_positions
+        self._game_pool = game_pool
 
         if not map_name:
             raise ValueError("Missing a map name.")
-        
-        # Extract directories here
-        try:
-            with open(config_path) as f:
-                cfg = ConfigParser()
-                cfg.read_string(f.read())
-                game_server_dir = cfg.get("dirs", "gameserver")
-                client_dir = cfg.get("dirs", "lolclient")
-                #game_server_dir, client_dir = f.read().split("\n")
-                print("GAMESERVER DIR:", game_server_dir)
-                print("CLIENT DIR:", client_dir)
-        except:
-            raise IOError("Could not open config file: '%s'" % config_path)
 
         self._map_name = map_name
-        self._run_config = run_configs.get(game_server_dir)
         self._game_info = None
 
-        self._launch_game(host=host,
+        if game_pool:
+            if list(players) != list(game_pool.players) or map_name != game_pool.map_name:
+                raise ValueError("The game pool is for %s on %s, not %s on %s." % (
+                    game_pool.players, game_pool.map_name, players, map_name))
+            self._run_config = game_pool.run_config
+            self._ports = None
+            self._lol_procs = [game_pool.acquire()]
+            self._set_controllers()
+            self._finalize()
+            return
+        
+        # Extract directories here
+        game_server_dir = client_dir = ""
+        if config_path or not run_config:
+            game_server_dir, client_dir = read_config(config_path)
+
+        self._run_config = run_config or run_configs.get(game_server_dir)
+
+        self._launch_game(ports=ports,
+                          shared_redis_port=shared_redis_port,
+                          redis_unix_socket=redis_unix_socket,
+                          shared_redis_unix_socket=shared_redis_unix_socket,
+                          host=host,
                           human_observer=human_observer,
                           players=players,
                           map_name=map_name,
@@ -131,7 +199,8 @@ class LoLEnv(environment.Base):
                           game_server_dir=game_server_dir,
                           client_dir=client_dir,
                           multiplier=multiplier,
-                          step_multiplier=step_multiplier)
+                          step_multiplier=step_multiplier,
+                          binary_observations=binary_observations)
 
         self._finalize()
 
@@ -141,28 +210,35 @@ class LoLEnv(environment.Base):
         self._episode_count = 0
 
         self._features = [features.features_from_game_info(
-            agent_interface_format=self._agent_interface_format
+            agent_interface_format=self._agent_interface_format,
+            num_champ_units=len(self.players)
         )]
 
+        if self._reuse_observations:
+            self._obs_buffers = [features.ObservationBuffer(len(self.players))
+                                 for _ in self.players]
+        else:
+            self._obs_buffers = [None] * len(self.players)
+
         self._last_agent_obs = [None] * self._num_agents
         self._obs = [None] * self._num_agents
         self._agent_obs = [None] * self._num_agents
         self._state = environment.StepType.LAST
         logging.info("Environment is ready.")
 
-    def _launch_game(self, **kwargs):
+    def _launch_game(self, ports=None, **kwargs):
         """Actually launch the GameServer."""
-
-        # Reserve some ports
-        self._ports = portspicker.pick_contiguous_unused_ports(2)
-        logging.info("Ports used for GameServer and Redis respectively: %s", self._ports)
-
-        kwargs["host"] = kwargs["host"]
-        kwargs["client_port"] = self._ports[0]
-        kwargs["redis_port"] = self._ports[1]
-
-        self._lol_procs = [self._run_config.start(**kwargs)]
+        lol_proc, picked_ports = launch_game(self._run_config, ports=ports, **kwargs)
+        # Only the ports picked by `launch_game` are returned on `close`, the
+        # caller still owns any it passed in.
+        self._ports = None if ports else picked_ports
+        self._lol_procs = [lol_proc]
+        self._set_controllers()
+
+    def _set_controllers(self):
         self._controllers = [p.controller for p in self._lol_procs]
+        for c in self._controllers:
+            c.metrics = self._metrics
     
     @property
     def map_name(self):
@@ -172,6 +248,11 @@ class LoLEnv(environment.Base):
     @property
     def game_info(self):
         return self._game_info
+
+    @property
+    def reward_terms(self):
+        """The weighted reward terms per agent from the last step, for logging."""
+        return self._reward_terms
     
     def observation_spec(self):
         """Look at Features for full spec."""
@@ -199,26 +280,41 @@ class LoLEnv(environment.Base):
 
         if self._state == environment.StepType.LAST:
             return self.reset()
-        
+
+        with self._metrics.timer("step"):
+            return self._step_actions(actions)
+
+    def _step_actions(self, actions):
+        """Send the agents' actions and observe the result."""
+
         """
         actions = [[f.transform_action(o["observation"], a)
                     for a in to_list(acts)]
                    for f, o, acts in zip(self._features, self._obs, actions)]
         """
 
-        new_actions = []
-        for o, a in zip(self._obs, actions):
-            # print("CURRENT OBS ENV STEP:", o)
-            new_actions.append(self._features[0].transform_action(o["observation"], a))
+        with self._metrics.timer("transform_action"):
+            # Encoded straight to the wire format, see `Features.encode_action`.
+            encode_action = self._features[0].encode_action
+            new_actions = [encode_action(o["observation"], a)
+                           for o, a in zip(self._obs, actions)]
 
-        for c, a in zip(self._controllers, actions):
-            c.actions(common.RequestAction(actions=new_actions))
+        with self._metrics.timer("send_actions"):
+            for c in self._controllers:
+                c.send_encoded_actions(new_actions)
 
+        self._metrics.inc("steps")
         self._state = environment.StepType.MID
         return self._step()
     
     def close(self):
         logging.info("Environment Close")
+        if getattr(self, "_game_pool", None) and getattr(self, "_lol_procs", None):
+            # Give the game back to the pool instead of shutting it down.
+            for p in self._lol_procs:
+                self._game_pool.release(p, players=self.players)
+            self._controllers = None
+            self._lol_procs = None
         if hasattr(self, "_controllers") and self._controllers:
             for c in self._controllers:
                 c.quit()
@@ -226,9 +322,10 @@ class LoLEnv(environment.Base):
         if hasattr(self, "_lol_procs") and self._lol_procs:
             for p in self._lol_procs:
                 p.close()
-            self.lol_procs = None
+            self._lol_procs = None
         if hasattr(self, "_ports") and self._ports:
             portspicker.return_ports(self._ports)
+            self._ports = None
         self._game_info = None
     
     def _get_observations(self):
@@ -255,9 +352,12 @@ class LoLEnv(environment.Base):
         # print("_get_observations.res:", res)
         """
 
-        obs = [self._controllers[0].observe() for _ in self.players]
+        with self._metrics.timer("observe"):
+            obs = self._controllers[0].observe_tick(len(self.players))
         #obs = [self._controllers[0].observe()]
-        agent_obs = [self._features[0].transform_obs(o) for o in obs]
+        with self._metrics.timer("transform_obs"):
+            agent_obs = [self._features[0].transform_obs(o, buffer=b)
+                         for o, b in zip(obs, self._obs_buffers)]
         
         # Save last observation to calculate rewards
         self._last_agent_obs = self._agent_obs
@@ -266,111 +366,16 @@ class LoLEnv(environment.Base):
         self._obs, self._agent_obs = obs, agent_obs
 
     def calc_reward(self, last_obs, obs):
-        """Returns the cumulative reward for an observation."""
-
-        reward = 0
+        """Returns the cumulative reward for an observation.
 
-        # Winning (+5) Zero-Sum
-        winning_weighting = 5.0
-        if self._state == environment.StepType.LAST: # Last observation for episode
-            if obs["me_unit"].kill_count > obs["enemy_unit"].kill_count:
-                winning_reward = winning_weighting
-            elif obs["me_unit"].kill_count < last_obs["enemy_unit"].kill_count:
-                winning_reward = -winning_weighting
-            else:
-                winning_reward = 0
-            reward += winning_reward
-            print("Winning Reward:",
-              winning_reward,
-              obs["me_unit"].kill_count,
-              obs["enemy_unit"].kill_count)
-
-        # Death (-1)
-        death_weighting = -1
-        death_reward = 0
-        if obs["me_unit"].death_count > last_obs["me_unit"].death_count:
-            death_reward += death_weighting
-        if obs["enemy_unit"].death_count > last_obs["enemy_unit"].death_count:
-            death_reward += -death_weighting
-        if obs["me_unit"].death_count == last_obs["me_unit"].death_count and \
-                obs["enemy_unit"].death_count == last_obs["enemy_unit"].death_count:
-            death_reward = 0
-        reward += death_reward
-        # print("Death Reward:", death_reward)
-
-        # XP Gained (+0.002) Zero-Sum
-        xp_weighting = 0.002
-        me_xp_diff = obs["me_unit"].current_xp - last_obs["me_unit"].current_xp
-        me_xp_reward = me_xp_diff * xp_weighting
-        enemy_xp_diff = obs["enemy_unit"].current_xp - last_obs["enemy_unit"].current_xp
-        enemy_xp_reward = -(enemy_xp_diff * xp_weighting)
-        xp_reward = me_xp_reward + enemy_xp_reward # Zero-Sum
-        reward += xp_reward
-        # print("XP Reward:", xp_reward)
-        
-        # Gold Gained (+0.006) Zero-Sum
-        gold_weighting = 0.006
-        me_gold_diff = obs["me_unit"].current_gold - last_obs["me_unit"].current_gold
-        me_gold_reward = me_gold_diff * gold_weighting
-        enemy_gold_diff = obs["enemy_unit"].current_gold - last_obs["enemy_unit"].current_gold
-        enemy_gold_reward = -(enemy_gold_diff * gold_weighting)
-        gold_reward = me_gold_reward + enemy_gold_reward
-        reward += gold_reward
-        # print("Gold Reward:", gold_reward)
-
-        # Health Changed (+2) Zero-Sum
-        hp_weighting = 2.0
-        def hp_change_to_reward(x): return (x + 1 - (1 - x)**4) / 2
-        me_cur_hp_diff  = obs["me_unit"].current_hp / obs["me_unit"].max_hp
-        me_last_hp_diff = last_obs["me_unit"].current_hp / last_obs["me_unit"].max_hp
-        me_hp_diff = me_cur_hp_diff - me_last_hp_diff
-        me_hp_reward = hp_change_to_reward(me_hp_diff) * hp_weighting
-
-        enemy_cur_hp_diff  = obs["enemy_unit"].current_hp / obs["enemy_unit"].max_hp
-        enemy_last_hp_diff = last_obs["enemy_unit"].current_hp / last_obs["enemy_unit"].max_hp
-        enemy_hp_diff = enemy_cur_hp_diff - enemy_last_hp_diff
-        enemy_hp_reward = -(hp_change_to_reward(enemy_hp_diff) * hp_weighting)
-
-        hp_reward = me_hp_reward + enemy_hp_reward
-        reward += hp_reward
-        # print("HP Reward:", hp_reward)
-
-        # Mana Changed (+0.75)
-        mp_weighting = 0.75
-        me_cur_mp_diff  = obs["me_unit"].current_mp / obs["me_unit"].max_mp
-        me_last_mp_diff = last_obs["me_unit"].current_mp / last_obs["me_unit"].max_mp
-        me_mp_diff = me_cur_mp_diff - me_last_mp_diff
-        me_mp_reward = me_mp_diff * mp_weighting
-
-        enemy_cur_mp_diff  = obs["enemy_unit"].current_mp / obs["enemy_unit"].max_mp
-        enemy_last_mp_diff = last_obs["enemy_unit"].current_mp / last_obs["enemy_unit"].max_mp
-        enemy_mp_diff = enemy_cur_mp_diff - enemy_last_mp_diff
-        enemy_mp_reward = -(enemy_mp_diff * mp_weighting)
-
-        mp_reward = me_mp_reward + enemy_mp_reward
-        reward += mp_reward
-        # print("MP Reward:", mp_reward)
-
-        # Killed Hero (+1, -0.6)
-        kill_weighting = +1
-        kill_reward = 0
-        if obs["me_unit"].kill_count > last_obs["me_unit"].kill_count:
-            kill_diff = obs["me_unit"].kill_count - last_obs["me_unit"].kill_count
-            kill_reward += kill_diff * kill_weighting
-        if obs["enemy_unit"].kill_count > last_obs["enemy_unit"].kill_count:
-            kill_diff = obs["enemy_unit"].kill_count - last_obs["enemy_unit"].kill_count
-            kill_reward += -(kill_diff * kill_weighting)
-        if obs["me_unit"].kill_count == last_obs["me_unit"].kill_count and \
-                obs["enemy_unit"].kill_count == last_obs["enemy_unit"].kill_count:
-            kill_reward = 0
-        reward += kill_reward
-        # print("Kill Reward:", kill_reward)
-
-        # Lane Assignment (-0.15 * seconds out of assigned lane)
-        pass # Empty for now, not primary concern
-        
-        # print("Reward:", reward, end = "\n\n")
-        return reward
+        See `rewards.calc_rewards`, which `_observe` uses to score all of the
+        agents at once.
+        """
+        reward, _ = rewards.calc_rewards(
+            rewards.stack_units([last_obs]), rewards.stack_units([obs]),
+            last_step=self._state == environment.StepType.LAST,
+            weights=self._reward_weights)
+        return float(reward[0])
 
     def _observe(self):
         self._get_observations()
@@ -397,9 +402,15 @@ class LoLEnv(environment.Base):
         # Calc reward for current observation(s)
         if self._episode_steps == 0:
             reward = [0] * self._num_agents
+            self._reward_terms = None
         else:
-            reward = [self.calc_reward(last, cur) 
-                      for last, cur in zip(self._last_agent_obs, self._agent_obs)]
+            with self._metrics.timer("calc_reward"):
+                reward, self._reward_terms = rewards.calc_rewards(
+                    rewards.stack_units(self._last_agent_obs),
+                    rewards.stack_units(self._agent_obs),
+                    last_step=self._state == environment.StepType.LAST,
+                    weights=self._reward_weights)
+                reward = reward.tolist()
         # print("CURRENT REWARD(s):", reward, end = "\n\n\n")
 
         self._episode_steps += 1
@@ -417,21 +428,56 @@ class LoLEnv(environment.Base):
 
         return ret_val
 
-    def _restart(self):
-        # Restart the GameServer controllers
+    def connect(self):
+        """Wait for the game to start, see `RemoteController.connect`.
+
+        `reset` connects first, so this is only needed to wait for the game
+        separately, e.g. to time its startup.
+        """
+        for c in self._controllers:
+            c.connect()
+
+    @property
+    def startup_times(self):
+        """Seconds from launching the game until each startup state."""
+        return self._controllers[0].startup_times
+
+    def _restart(self, champions=None):
+        # Reset the game in place rather than relaunching the GameServer
         for c in self._controllers:
-            c.restart()
+            c.restart(spawn_positions=self._spawn_positions, champions=champions)
 
-    def reset(self):
-        """Starts a new episode."""
+    def reset(self, champions=None, spawn_positions=None):
+        """Starts a new episode.
+
+        Args:
+            champions: An optional list of champion names, one per player, to
+                swap the champions to for this and later episodes. None keeps
+                a player's current champion.
+            spawn_positions: An optional list of (x, y) positions to teleport
+                the first players to for this and later episodes, replacing
+                the `spawn_positions` the env was created with.
+        """
         self._episode_steps = 0
-        if self._episode_count:
-            # No need to restart for the first episode
-            self._restart()
+        if spawn_positions is not None:
+            if len(spawn_positions) > len(self.players):
+                raise ValueError("Expected at most %s spawn positions, got: %s" % (
+                    len(self.players), len(spawn_positions)))
+            self._spawn_positions = spawn_positions
+        if champions is not None:
+            if len(champions) != len(self.players):
+                raise ValueError("Expected %s champions, got: %s" % (
+                    len(self.players), len(champions)))
+            champions = [None if c == p.champ else c
+                         for c, p in zip(champions, self.players)]
+            self.players = [p if c is None else Agent(champion=c, team=p.team)
+                            for c, p in zip(champions, self.players)]
+
+        self.connect()
+        self._restart(champions=champions)
         
         self._episode_count += 1
-
-        self._controllers[0].players_reset()
+        self._metrics.inc("episodes")
 
         logging.info("Starting episode %s: on %s" % (self._episode_count, self._map_name))
         self._state = environment.StepType.FIRST
@@ -447,11 +493,63 @@ class LoLEnv(environment.Base):
         if prefix is None:
             prefix = self._map_name.replace(" ", "_")
         replay_path = self._run_config.save_replay(
-            self._controllers[0].save_replay(), replay_dir, prefix
+            self._controllers[0].replay_chunks(), replay_dir, prefix
         )
         logging.info("Wrote replay to: %s", replay_path)
         return replay_path
 
+def read_config(config_path):
+    """Read the GameServer and League client directories from a config file."""
+    try:
+        with open(config_path) as f:
+            cfg = ConfigParser()
+            cfg.read_string(f.read())
+            game_server_dir = cfg.get("dirs", "gameserver")
+            client_dir = cfg.get("dirs", "lolclient")
+            #game_server_dir, client_dir = f.read().split("\n")
+            logging.info("GameServer dir: %s", game_server_dir)
+            logging.info("Client dir: %s", client_dir)
+    except:
+        raise IOError("Could not open config file: '%s'" % config_path)
+    return game_server_dir, client_dir
+
+def launch_game(run_config, ports=None, shared_redis_port=None,
+                redis_unix_socket=False, shared_redis_unix_socket=None, **kwargs):
+    """Launch a GameServer, see `LoLEnv` and `LoLProcess` for the arguments,
+    e.g. `async_controller` for an `AsyncRemoteController`.
+
+    Returns:
+        The `LoLProcess` and the list of ports it uses. Unless they were passed
+        in as `ports`, they were picked for it and the caller must give them
+        back with `portspicker.return_ports` once the game is closed.
+    """
+    # Reserve some ports
+    shared = shared_redis_port or shared_redis_unix_socket
+    num_ports = 1 if shared or redis_unix_socket else 2
+    picked = not ports
+    ports = list(ports or portspicker.pick_contiguous_unused_ports(num_ports))
+    logging.info("Ports used for GameServer and Redis respectively: %s", ports)
+
+    kwargs["client_port"] = ports[0]
+    if shared:
+        kwargs["redis_port"] = shared_redis_port or 0
+        kwargs["redis_unix_socket"] = shared_redis_unix_socket
+        kwargs["shared_redis"] = True
+        kwargs["redis_key_prefix"] = redis_server.key_prefix(ports[0])
+    elif redis_unix_socket:
+        # No TCP port, the socket is named after the reserved client port.
+        kwargs["redis_port"] = 0
+        kwargs["redis_unix_socket"] = redis_server.unix_socket_path(ports[0])
+    else:
+        kwargs["redis_port"] = ports[1]
+
+    try:
+        return run_config.start(**kwargs), ports
+    except:
+        if picked:
+            portspicker.return_ports(ports)
+        raise
+
 MAP = {
     "Old Summoners Rift": 1,
     "New Summoners Rift": 11,
@@ -469,6 +567,9 @@ SUMMONER_SPELL = {
     "IGNITE": "SummonerDot"
 }
 
+# Where the first players start every episode unless told otherwise.
+DEFAULT_SPAWN_POSITIONS = [(6900.0, 6900.0), (7100.0, 7100.0)]
+
 def LoLEnvSettingsPlayer(
     playerId,
     name,
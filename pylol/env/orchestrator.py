@@ -0,0 +1,307 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Run many games at once on one host, restarting any which crash.
+
+Each game runs `run_loop.run_loop` with its own agents in a worker process,
+which launches its own GameServer and redis-server. At most `max_concurrent`
+games run at once, by default one per CPU, and the rest wait their turn.
+
+While the games run the `Orchestrator`:
+
+    Checks their health: a worker which exits with an error, e.g. because its
+        GameServer crashed, or which hasn't reported for `health_timeout_secs`
+        is killed and its game restarted, up to `max_restarts` times.
+    Aggregates their stats: every worker records its env with a
+        `metrics.InMemoryCollector` and sends a snapshot every `report_secs`,
+        which are summed by `snapshot`, so the orchestrator can be exported
+        like any collector, e.g. with `metrics.LogExporter`.
+    Tears them down: each worker leads its own process group, so `close`
+        kills the GameServers and redis-servers along with the workers.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from absl import logging
+
+from pylol.env import lol_env
+from pylol.env import run_loop
+from pylol.lib import metrics
+from pylol.lib import portspicker
+
+class _ReportingCollector(metrics.InMemoryCollector):
+    """Sends its snapshot to the orchestrator on the first step after every
+    `report_secs` seconds."""
+
+    def __init__(self, reports, game, report_secs):
+        super(_ReportingCollector, self).__init__()
+        self._reports = reports
+        self._game = game
+        self._report_secs = report_secs
+        self._next_report = 0
+
+    def inc(self, name, value=1):
+        super(_ReportingCollector, self).inc(name, value)
+        if name == "steps" and time.time() >= self._next_report:
+            self.report()
+
+    def report(self):
+        self._reports.put((self._game, self.snapshot()))
+        self._next_report = time.time() + self._report_secs
+
+def _terminate(unused_signum, unused_frame):
+    raise SystemExit(128 + signal.SIGTERM)
+
+def _game_worker(reports, game, env_kwargs, agent_fn, max_steps, max_episodes,
+                 save_replay, report_secs):
+    """Play one game with `run_loop`, reporting its metrics to `reports`."""
+    if hasattr(os, "setsid"):
+        # Lead a process group, which the GameServer and redis-server join.
+        os.setsid()
+    # Close the env, and with it the game, when terminated.
+    signal.signal(signal.SIGTERM, _terminate)
+
+    collector = _ReportingCollector(reports, game, report_secs)
+    env = None
+    try:
+        env = lol_env.LoLEnv(metrics_collector=collector, **env_kwargs)
+        agents = [agent_fn() for _ in env.players]
+        run_loop.run_loop(agents, env, max_steps=max_steps,
+                          max_episodes=max_episodes)
+        if save_replay:
+            env.save_replay(agents[0].__class__.__name__)
+    finally:
+        if env:
+            env.close()
+        collector.report()
+
+class _Game(object):
+    """The bookkeeping of one game and its current worker."""
+
+    def __init__(self, index, ports):
+        self.index = index
+        self.ports = ports
+        self.proc = None
+        self.restarts = 0
+        self.last_report = 0
+        self.snapshots = []  # One per run, the last is the current one.
+
+class Orchestrator(object):
+    """Runs `num_games` games, at most `max_concurrent` at once."""
+
+    def __init__(self, num_games, agent_fn, max_concurrent=None, max_steps=0,
+                 max_episodes=0, save_replay=False, max_restarts=3,
+                 health_timeout_secs=120, report_secs=5, context=None,
+                 **env_kwargs):
+        """Prepare the games, which start on `run`.
+
+        Args:
+            num_games: Number of games to play.
+            agent_fn: A picklable callable which returns a new agent, called
+                once for every player of a game.
+            max_concurrent: Number of games to run at once. Defaults to, and
+                is at most, the number of CPUs.
+            max_steps: Steps of each game, see `run_loop.run_loop`.
+            max_episodes: Episodes of each game, see `run_loop.run_loop`.
+            save_replay: Whether to save a replay at the end of each game.
+            max_restarts: How many times to restart a game before giving up on
+                it.
+            health_timeout_secs: How long a worker may go without reporting,
+                e.g. while launching its game, before it is restarted.
+            report_secs: How often each worker reports its metrics.
+            context: Optional multiprocessing start method, e.g. "spawn".
+            **env_kwargs: Arguments for each `LoLEnv`, other than `ports` and
+                `metrics_collector`.
+        """
+        if num_games < 1:
+            raise ValueError("num_games must be at least 1, got: %s" % num_games)
+        cpus = os.cpu_count() or 1
+        self._max_concurrent = min(max_concurrent or cpus, cpus, num_games)
+        self._agent_fn = agent_fn
+        self._max_steps = max_steps
+        self._max_episodes = max_episodes
+        self._save_replay = save_replay
+        self._max_restarts = max_restarts
+        self._health_timeout_secs = health_timeout_secs
+        self._report_secs = report_secs
+        self._env_kwargs = env_kwargs
+        self._ctx = multiprocessing.get_context(context)
+        self._reports = self._ctx.Queue()
+        self._counters = {"game_restarts": 0, "games_finished": 0,
+                          "games_failed": 0}
+        self._start_time = None
+
+        # Reserve the ports here so the workers can't pick the same ones, a
+        # restarted game reuses those of the run before.
+        ports_per_game = 1 if env_kwargs.get("redis_unix_socket") else 2
+        self._ports = portspicker.pick_contiguous_unused_ports(
+            ports_per_game * self._max_concurrent)
+        self._free_ports = [
+            self._ports[i:i + ports_per_game]
+            for i in range(0, len(self._ports), ports_per_game)]
+        self._games = [_Game(i, None) for i in range(num_games)]
+        self._pending = list(self._games)
+        self._running = []
+
+    @property
+    def max_concurrent(self):
+        return self._max_concurrent
+
+    def _start(self, game):
+        game.snapshots.append({"counters": {}, "timers": {}})
+        game.last_report = time.time()
+        kwargs = dict(self._env_kwargs, ports=game.ports)
+        game.proc = self._ctx.Process(
+            target=_game_worker,
+            args=(self._reports, game.index, kwargs, self._agent_fn,
+                  self._max_steps, self._max_episodes, self._save_replay,
+                  self._report_secs),
+            daemon=True)
+        game.proc.start()
+        logging.info("Started game %s on ports %s.", game.index, game.ports)
+
+    def _kill(self, game, timeout=10):
+        """Stop a worker, along with the GameServer and redis-server it started."""
+        proc = game.proc
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(timeout)
+        if hasattr(os, "killpg"):
+            try:
+                # Whatever is left of its process group, even if it crashed.
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+
+    def _drain_reports(self, timeout):
+        try:
+            index, snapshot = self._reports.get(timeout=timeout)
+            while True:
+                for game in self._running:
+                    if game.index == index:
+                        game.snapshots[-1] = snapshot
+                        game.last_report = time.time()
+                index, snapshot = self._reports.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _check_health(self):
+        """Restart crashed or hung games and retire finished ones."""
+        for game in list(self._running):
+            exit_code = game.proc.exitcode
+            if exit_code is None:
+                if time.time() - game.last_report < self._health_timeout_secs:
+                    continue
+                logging.warning("Game %s hasn't reported for %ss, restarting it.",
+                                game.index, self._health_timeout_secs)
+            elif exit_code == 0:
+                logging.info("Game %s finished.", game.index)
+                self._kill(game)
+                self._retire(game)
+                self._counters["games_finished"] += 1
+                continue
+            else:
+                logging.warning("Game %s exited with: %s", game.index, exit_code)
+
+            self._kill(game)
+            if game.restarts >= self._max_restarts:
+                logging.error("Game %s failed %s times, giving up on it.",
+                              game.index, game.restarts + 1)
+                self._retire(game)
+                self._counters["games_failed"] += 1
+            else:
+                game.restarts += 1
+                self._counters["game_restarts"] += 1
+                self._start(game)
+
+    def _retire(self, game):
+        self._running.remove(game)
+        self._free_ports.append(game.ports)
+        game.ports = None
+
+    def run(self, exporter=None):
+        """Play every game, blocking until they have all finished or failed.
+
+        Args:
+            exporter: An optional `metrics.Exporter` of this orchestrator, to
+                export each time the workers report.
+
+        Returns:
+            The summary from `stats`.
+        """
+        self._start_time = time.time()
+        try:
+            while self._pending or self._running:
+                while self._pending and self._free_ports:
+                    game = self._pending.pop(0)
+                    game.ports = self._free_ports.pop(0)
+                    self._running.append(game)
+                    self._start(game)
+                self._drain_reports(timeout=self._report_secs)
+                self._check_health()
+                if exporter:
+                    exporter.export()
+        finally:
+            self.close()
+        return self.stats()
+
+    def snapshot(self):
+        """The metrics of every run of every game summed, along with the
+        orchestrator's own counters, like `metrics.Collector.snapshot`."""
+        snapshot = metrics.merge_snapshots(
+            s for game in self._games for s in game.snapshots)
+        snapshot["counters"].update(self._counters)
+        return snapshot
+
+    def stats(self):
+        """A summary of the games and their total throughput."""
+        counters = self.snapshot()["counters"]
+        elapsed = time.time() - self._start_time if self._start_time else 0
+        steps = counters.get("steps", 0)
+        return dict(self._counters,
+                    steps=steps,
+                    episodes=counters.get("episodes", 0),
+                    seconds=elapsed,
+                    steps_per_sec=steps / elapsed if elapsed else 0.0)
+
+    def close(self):
+        """Stop every game still running and release their ports."""
+        for game in list(self._running):
+            logging.info("Stopping game %s.", game.index)
+            self._kill(game)
+            self._retire(game)
+        self._pending = []
+        if self._ports:
+            portspicker.return_ports(self._ports)
+            self._ports = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
@@ -0,0 +1,122 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Rewards for League of Legends v4.20 observations.
+
+The rewards are calculated with numpy over stacked champion units, so one call
+scores a single agent, every agent in an environment or every agent across
+many environments, e.g. when relabeling rewards in a learner.
+"""
+
+import collections
+
+import numpy as np
+
+from pylol.lib import features
+from pylol.lib import named_array
+
+ChampUnit = features.ChampUnit
+
+class RewardWeights(collections.namedtuple("RewardWeights", [
+        "winning", "death", "xp", "gold", "hp", "mp", "kill"])):
+    """Weights for each of the reward terms.
+
+    All of the terms are zero-sum between an agent and its enemy.
+
+    Attributes:
+        winning: Given on the last step to the champion with the most kills.
+        death: Given when the champion dies.
+        xp: Per point of experience gained.
+        gold: Per point of gold gained.
+        hp: Scales the change in the fraction of health remaining.
+        mp: Scales the change in the fraction of mana remaining.
+        kill: Per champion killed.
+    """
+    __slots__ = ()
+
+    def __new__(cls, winning=5.0, death=-1.0, xp=0.002, gold=0.006, hp=2.0,
+                mp=0.75, kill=1.0):
+        return super(RewardWeights, cls).__new__(
+            cls, winning, death, xp, gold, hp, mp, kill)
+
+def hp_change_to_reward(x):
+    """Emphasise large losses of health over small ones."""
+    return (x + 1 - (1 - x)**4) / 2
+
+def stack_units(observations):
+    """Stack the `me_unit` and `enemy_unit` of some agent observations.
+
+    Returns:
+        A (len(observations), 2, len(ChampUnit)) array, which can be stacked
+        again for many environments.
+    """
+    return np.stack([(o["me_unit"], o["enemy_unit"]) for o in observations])
+
+def calc_rewards(last_units, units, last_step=False, weights=None):
+    """Calculate the rewards of stacked agents between two observations.
+
+    Args:
+        last_units: A (..., 2, len(ChampUnit)) array of the previous me and
+            enemy units of each agent, see `stack_units`.
+        units: The current units in the same layout as `last_units`.
+        last_step: Whether this is the last step of the episode, either a bool
+            or an array broadcastable to the leading dimensions of `units`.
+        weights: The `RewardWeights` to use, defaults to `RewardWeights()`.
+
+    Returns:
+        A tuple of the total reward with the leading shape of `units`, and a
+        `NamedDict` of each weighted term in the same shape for logging.
+    """
+    weights = weights or RewardWeights()
+    last_units = np.asarray(last_units)
+    units = np.asarray(units)
+
+    def diff(column):
+        # Me minus enemy change in `column`, the zero-sum part of most terms.
+        delta = units[..., column] - last_units[..., column]
+        return delta[..., 0] - delta[..., 1]
+
+    def fraction_diff(current, maximum, fn=lambda x: x):
+        delta = (units[..., current] / units[..., maximum] -
+                 last_units[..., current] / last_units[..., maximum])
+        return fn(delta[..., 0]) - fn(delta[..., 1])
+
+    kills = units[..., ChampUnit.kill_count]
+    won = np.sign(kills[..., 0] - kills[..., 1])
+    died = (units[..., ChampUnit.death_count] >
+            last_units[..., ChampUnit.death_count])
+    killed = np.maximum(units[..., ChampUnit.kill_count] -
+                        last_units[..., ChampUnit.kill_count], 0)
+
+    terms = named_array.NamedDict({
+        "winning": np.where(last_step, won * weights.winning, 0.0),
+        "death": (died[..., 0].astype(np.float32) -
+                  died[..., 1].astype(np.float32)) * weights.death,
+        "xp": diff(ChampUnit.current_xp) * weights.xp,
+        "gold": diff(ChampUnit.current_gold) * weights.gold,
+        "hp": fraction_diff(ChampUnit.current_hp, ChampUnit.max_hp,
+                            hp_change_to_reward) * weights.hp,
+        "mp": fraction_diff(ChampUnit.current_mp, ChampUnit.max_mp) * weights.mp,
+        "kill": (killed[..., 0] - killed[..., 1]) * weights.kill,
+    })
+
+    reward = sum(terms[name] for name in RewardWeights._fields)
+    return reward, terms
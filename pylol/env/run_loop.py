@@ -30,8 +30,7 @@ from pylol import run_configs
 
 def run_loop(agents, env, max_steps=0, max_episodes=0):
     # Connect
-    controller = env._controllers[0]
-    controller.connect()
+    env.connect()
     # controller.players_reset()
 
     # A run loop for agent/environment interaction
@@ -49,8 +48,6 @@ def run_loop(agents, env, max_steps=0, max_episodes=0):
         while not max_episodes or total_episodes < max_episodes:
             total_episodes += 1
             timesteps = env.reset()
-            controller.player_teleport(1, 6900.0, 6900.0)
-            controller.player_teleport(2, 7100.0, 7100.0)
             env.broadcast_msg("CURRENTLY RUNNING EPISODE: %s" % total_episodes)
             # print("TIMESTEPS:", timesteps)
             for a in agents:
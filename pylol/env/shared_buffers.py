@@ -0,0 +1,178 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Shared memory buffers for exchanging observations and actions between
+`LoLVecEnv` worker processes and the learner.
+
+The layout is built from `Features.observation_spec()`, so the learner and the
+workers can each map the same block without sending any arrays over the pipes.
+Observations are written into a ring of slots so the learner can keep reading
+the last observations while the workers write the next ones. Keys which vary in
+shape, e.g. `available_actions`, can't be laid out ahead of time and are left
+to the caller.
+
+Actions are flattened into one row of floats per agent: the function id
+followed by the values of each of its arguments, see `encode_actions`.
+"""
+
+import collections
+import os
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+from absl import logging
+import numpy as np
+
+from pylol.lib import actions
+
+OBS_DTYPE = np.dtype(np.float32)
+ACTION_DTYPE = np.dtype(np.float64)
+
+# Observation keys which aren't stored as `OBS_DTYPE`.
+KEY_DTYPES = {"action_mask": np.dtype(bool)}
+
+# The function id and the values of the function with the most arguments.
+ACTION_WIDTH = 1 + max(sum(len(t.sizes) for t in f.args)
+                       for f in actions.FUNCTIONS)
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+def _dtype(key):
+    return KEY_DTYPES.get(key, OBS_DTYPE)
+
+def encode_actions(func_calls, out):
+    """Flatten some `FunctionCall`s into the rows of `out`."""
+    if len(func_calls) != len(out):
+        raise ValueError("Expected %s actions, got: %s" % (
+            len(out), len(func_calls)))
+    out[:] = 0
+    for row, func_call in zip(out, func_calls):
+        values = [v for arg in func_call.arguments for v in arg]
+        row[0] = func_call.function
+        row[1:1 + len(values)] = values
+
+def decode_actions(rows):
+    """Rebuild the `FunctionCall`s flattened by `encode_actions`."""
+    func_calls = []
+    for row in rows.tolist():
+        func = actions.FUNCTIONS[int(row[0])]
+        args = []
+        pos = 1
+        for t in func.args:
+            # Whole values go back to ints, e.g. to index enum arguments.
+            args.append([int(v) if v.is_integer() else v
+                         for v in row[pos:pos + len(t.sizes)]])
+            pos += len(t.sizes)
+        func_calls.append(actions.FunctionCall(func.id, args))
+    return func_calls
+
+class SharedBuffers(object):
+    """Observations and actions of every agent of every environment.
+
+    The block holds a (size, num_envs, num_agents, ...) float32 array, or bool
+    for the keys in `KEY_DTYPES`, for each fixed shape key of the observation
+    spec and a (num_envs, num_agents,
+    ACTION_WIDTH) array of actions. The process which creates the block owns
+    it and unlinks it on `close`, other processes attach to it by `name`.
+    """
+
+    def __init__(self, observation_spec, num_envs, num_agents, size=2,
+                 name=None):
+        """Create or attach to the shared memory block.
+
+        Args:
+            observation_spec: The observation spec of a single agent.
+            num_envs: Number of environments.
+            num_agents: Number of agents in each environment.
+            size: Number of observation slots in the ring.
+            name: Name of an existing block to attach to, otherwise a new one
+                is created.
+        """
+        shapes = collections.OrderedDict(
+            (key, (size, num_envs, num_agents) + tuple(shape))
+            for key, shape in observation_spec.items() if 0 not in shape)
+
+        offsets = {}
+        nbytes = 0
+        for key, shape in shapes.items():
+            offsets[key] = nbytes
+            nbytes = _align(nbytes + int(np.prod(shape)) * _dtype(key).itemsize)
+        action_shape = (num_envs, num_agents, ACTION_WIDTH)
+        action_offset = nbytes
+        nbytes += int(np.prod(action_shape)) * ACTION_DTYPE.itemsize
+
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=self._owner, size=nbytes if self._owner else 0)
+        if not self._owner and os.name == "posix":
+            # Only the owner should unlink the block when it exits. The block
+            # is only tracked on POSIX, by its name with the leading "/" that
+            # `name` leaves out.
+            resource_tracker.unregister("/" + self._shm.name, "shared_memory")
+
+        self._size = size
+        self._observations = {
+            key: np.ndarray(shape, dtype=_dtype(key), buffer=self._shm.buf,
+                            offset=offsets[key])
+            for key, shape in shapes.items()}
+        self.actions = np.ndarray(action_shape, dtype=ACTION_DTYPE,
+                                  buffer=self._shm.buf, offset=action_offset)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def keys(self):
+        """The observation keys held in shared memory."""
+        return list(self._observations)
+
+    def write(self, slot, env_index, observations):
+        """Write the observation of each agent of an environment into `slot`."""
+        for key, array in self._observations.items():
+            for i, obs in enumerate(observations):
+                array[slot, env_index, i] = obs[key]
+
+    def read(self, slot):
+        """The observations in `slot` as (num_envs, num_agents, ...) views.
+
+        The views are overwritten once the ring wraps around to `slot` again,
+        so copy them to keep them for longer than `size - 1` more steps.
+        """
+        return {key: array[slot] for key, array in self._observations.items()}
+
+    def close(self):
+        self._observations = {}
+        self.actions = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Views handed out by `read` are still alive, the memory is freed
+            # once they are.
+            logging.warning("Shared memory %s still in use.", self.name)
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
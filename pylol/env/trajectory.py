@@ -0,0 +1,492 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Record trajectories of observations, actions and rewards to disk.
+
+A recording is a directory with one subdirectory per column, holding that
+column in chunks of `chunk_size` steps as `.npy` files, and a `meta.json`
+describing the columns and the chunks, e.g.
+
+    meta.json
+    observation/me_unit/000000.npy  # (chunk_size, num_agents, len(ChampUnit))
+    observation/me_unit/000001.npy
+    action/000000.npy               # (chunk_size, num_agents, ACTION_WIDTH)
+    reward/000000.npy               # (chunk_size, num_agents)
+    discount/000000.npy             # (chunk_size,)
+    step_type/000000.npy            # (chunk_size,)
+
+Every fixed shape key of the observation spec is a column, the keys which vary
+in shape, e.g. `available_actions`, are left out. Each step is the timestep
+an agent saw and the action it took in response, flattened with
+`shared_buffers.encode_actions`. The last timestep of an episode has no action
+and is recorded with a `no_op`.
+
+Steps are copied into preallocated chunks, and full chunks are written by a
+background thread, so recording costs a few array copies per step.
+`TrajectoryDataset` memory maps recordings back for sampling, e.g. for
+offline RL, and `record_replay` records a replay by re-simulating it.
+"""
+
+import collections
+import json
+import os
+import queue
+import threading
+
+from absl import logging
+import numpy as np
+
+from pylol.env import base_env_wrapper
+from pylol.env import environment
+from pylol.env import lol_env
+from pylol.env import shared_buffers
+from pylol.lib import actions
+from pylol.lib import replay
+
+META_FILE = "meta.json"
+CHUNK_FORMAT = "%06d.npy"
+
+def observation_column(key):
+    """The column of an observation key."""
+    return "observation/" + key
+
+def columns(observation_spec, num_agents):
+    """The name, dtype and shape of a step of each column of a recording."""
+    cols = {}
+    for key, shape in observation_spec.items():
+        if 0 not in shape:
+            dtype = shared_buffers.KEY_DTYPES.get(key, shared_buffers.OBS_DTYPE)
+            cols[observation_column(key)] = (
+                np.dtype(dtype), (num_agents,) + tuple(shape))
+    cols["action"] = (shared_buffers.ACTION_DTYPE,
+                      (num_agents, shared_buffers.ACTION_WIDTH))
+    cols["reward"] = (np.dtype(np.float32), (num_agents,))
+    cols["discount"] = (np.dtype(np.float32), ())
+    cols["step_type"] = (np.dtype(np.int8), ())
+    return cols
+
+_NO_OP = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+
+class TrajectoryWriter(object):
+    """Writes the steps of one or more episodes to a recording directory."""
+
+    def __init__(self, directory, observation_spec, num_agents,
+                 chunk_size=1024, max_queued_chunks=4):
+        """Create the recording.
+
+        Args:
+            directory: Where to write the recording, which must not already
+                hold one.
+            observation_spec: The observation spec of a single agent.
+            num_agents: Number of agents in each timestep.
+            chunk_size: Number of steps in each chunk file.
+            max_queued_chunks: Number of full chunks which may wait to be
+                written before `append` blocks.
+        """
+        if os.path.exists(os.path.join(directory, META_FILE)):
+            raise ValueError("There's already a recording in: %s" % directory)
+        self._directory = directory
+        self._num_agents = num_agents
+        self._chunk_size = chunk_size
+        self._columns = columns(observation_spec, num_agents)
+        self._obs_keys = [(key, observation_column(key))
+                          for key in observation_spec
+                          if observation_column(key) in self._columns]
+        for name in self._columns:
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+        self._chunk_lengths = []
+        self._num_steps = 0
+        self._error = None
+        self._write_meta(0)
+        # Enough chunks to fill one while the queue is full and one is written.
+        self._free = queue.Queue()
+        for _ in range(max_queued_chunks + 2):
+            self._free.put(self._new_chunk())
+        self._full = queue.Queue(max_queued_chunks)
+        self._chunk = self._free.get()
+        self._pos = 0
+        self._thread = threading.Thread(target=self._write_chunks,
+                                        name="trajectory_writer", daemon=True)
+        self._thread.start()
+
+    def _new_chunk(self):
+        return {name: np.zeros((self._chunk_size,) + shape, dtype=dtype)
+                for name, (dtype, shape) in self._columns.items()}
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def num_steps(self):
+        """The number of steps appended so far."""
+        return self._num_steps
+
+    def append(self, timesteps, func_calls=None):
+        """Record a step.
+
+        Args:
+            timesteps: The `TimeStep` of each agent.
+            func_calls: The `FunctionCall` of each agent in response, or None
+                at the end of an episode.
+        """
+        self._check_error()
+        chunk, pos = self._chunk, self._pos
+        for i, timestep in enumerate(timesteps):
+            obs = timestep.observation
+            for key, name in self._obs_keys:
+                chunk[name][pos, i] = obs[key]
+            chunk["reward"][pos, i] = timestep.reward
+        chunk["discount"][pos] = timesteps[0].discount
+        chunk["step_type"][pos] = timesteps[0].step_type
+        shared_buffers.encode_actions(
+            func_calls or [_NO_OP] * self._num_agents, chunk["action"][pos])
+
+        self._num_steps += 1
+        self._pos += 1
+        if self._pos == self._chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pos:
+            self._full.put((len(self._chunk_lengths), self._chunk, self._pos))
+            self._chunk_lengths.append(self._pos)
+            self._chunk = self._free.get()
+            self._pos = 0
+
+    def _write_chunks(self):
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            index, chunk, length = item
+            try:
+                if self._error is None:
+                    for name, array in chunk.items():
+                        np.save(os.path.join(self._directory, name,
+                                             CHUNK_FORMAT % index),
+                                array[:length])
+                    self._write_meta(index + 1)
+            except Exception as e:  # Raised by the next `append` or `close`.
+                logging.exception("Failed to write trajectory chunk %s.", index)
+                self._error = e
+            self._free.put(chunk)
+
+    def _write_meta(self, num_chunks):
+        lengths = self._chunk_lengths[:num_chunks]
+        meta = {
+            "chunk_size": self._chunk_size,
+            "num_agents": self._num_agents,
+            "num_steps": sum(lengths),
+            "chunk_lengths": lengths,
+            "columns": {name: {"dtype": dtype.str, "shape": list(shape)}
+                        for name, (dtype, shape) in self._columns.items()},
+        }
+        # Write then rename, so the meta never lists a chunk half written.
+        path = os.path.join(self._directory, META_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def _check_error(self):
+        if self._error is not None:
+            raise IOError("Failed to write the trajectory to %s: %s" % (
+                self._directory, self._error))
+
+    def close(self):
+        """Write the last partial chunk and wait for every chunk to be written."""
+        if self._thread:
+            self._flush()
+            self._full.put(None)
+            self._thread.join()
+            self._thread = None
+            self._check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
+
+class TrajectoryRecorder(base_env_wrapper.BaseEnvWrapper):
+    """An env wrapper which records every step to a `TrajectoryWriter`,
+    created on the first `reset`."""
+
+    def __init__(self, env, directory, **writer_kwargs):
+        super(TrajectoryRecorder, self).__init__(env)
+        self._directory = directory
+        self._writer_kwargs = writer_kwargs
+        self._writer = None
+        self._timesteps = None
+
+    @property
+    def writer(self):
+        return self._writer
+
+    def reset(self, *args, **kwargs):
+        self._record_last()
+        self._timesteps = super(TrajectoryRecorder, self).reset(*args, **kwargs)
+        if self._writer is None:
+            self._writer = TrajectoryWriter(
+                self._directory, self.observation_spec()[0],
+                len(self._timesteps), **self._writer_kwargs)
+        return self._timesteps
+
+    def step(self, actions, *args, **kwargs):
+        if self._timesteps is not None:
+            self._writer.append(self._timesteps, actions)
+        self._timesteps = super(TrajectoryRecorder, self).step(
+            actions, *args, **kwargs)
+        return self._timesteps
+
+    def _record_last(self):
+        # The last timestep of an episode isn't followed by an action.
+        if self._timesteps is not None and self._timesteps[0].last():
+            self._writer.append(self._timesteps)
+        self._timesteps = None
+
+    def close(self, *args, **kwargs):
+        self._record_last()
+        if self._writer:
+            self._writer.close()
+        return super(TrajectoryRecorder, self).close(*args, **kwargs)
+
+def find_recordings(root):
+    """Every recording directory under `root`, sorted."""
+    return sorted(dirpath for dirpath, _, filenames in os.walk(root)
+                  if META_FILE in filenames)
+
+class TrajectoryDataset(object):
+    """Random access to the steps of many recordings without loading them.
+
+    The chunks are memory mapped when first read, at most `max_open_chunks`
+    at once, so only the pages of the sampled steps are ever read from disk.
+    Opening the dataset reads just the meta and `step_type` of each recording
+    to index the episodes, e.g.
+
+        dataset = trajectory.TrajectoryDataset(trajectory.find_recordings(root))
+        batch = dataset.sample_transitions(256)
+        batch["observation/me_unit"]       # (256, num_agents, len(ChampUnit))
+        batch["next/observation/me_unit"]  # The same a step later.
+        batch = dataset.sample_sequences(32, 16)
+        batch["action"]                    # (32, 16, num_agents, ACTION_WIDTH)
+
+    Steps are numbered across every recording in order, an episode never
+    spans two recordings.
+    """
+
+    def __init__(self, directories, max_open_chunks=256):
+        """Index the recordings.
+
+        Args:
+            directories: A list of recording directories, see `find_recordings`.
+            max_open_chunks: The most chunk files to keep memory mapped at once.
+        """
+        if isinstance(directories, str):
+            directories = [directories]
+        self._directories = list(directories)
+        self._max_open_chunks = max_open_chunks
+        self._open_chunks = collections.OrderedDict()
+
+        self._columns = None
+        chunk_dirs, chunk_indices, chunk_lengths = [], [], []
+        step_types = []
+        recording_ends = []
+        for directory in self._directories:
+            with open(os.path.join(directory, META_FILE)) as f:
+                meta = json.load(f)
+            if self._columns is None:
+                self._columns = meta["columns"]
+            elif meta["columns"] != self._columns:
+                raise ValueError("The columns of %s don't match those of %s." % (
+                    directory, self._directories[0]))
+            for i, length in enumerate(meta["chunk_lengths"]):
+                chunk_dirs.append(len(recording_ends))
+                chunk_indices.append(i)
+                chunk_lengths.append(length)
+                step_types.append(np.load(os.path.join(
+                    directory, "step_type", CHUNK_FORMAT % i))[:length])
+            recording_ends.append(sum(chunk_lengths))
+
+        self._chunk_dirs = np.array(chunk_dirs, dtype=np.int64)
+        self._chunk_indices = np.array(chunk_indices, dtype=np.int64)
+        self._chunk_starts = np.concatenate(
+            [[0], np.cumsum(chunk_lengths, dtype=np.int64)])
+        self._num_steps = int(self._chunk_starts[-1])
+
+        # An episode starts at every FIRST step and at every recording.
+        step_types = (np.concatenate(step_types) if step_types else
+                      np.zeros(0, dtype=np.int8))
+        starts = np.zeros(self._num_steps, dtype=bool)
+        starts[step_types == environment.StepType.FIRST] = True
+        starts[[end for end in [0] + recording_ends[:-1]
+                if end < self._num_steps]] = True
+        self._episode_starts = np.flatnonzero(starts)
+        self._episode_lengths = np.diff(
+            np.append(self._episode_starts, self._num_steps))
+
+        # A transition is a step and the next one within the same episode.
+        is_last = np.zeros(self._num_steps, dtype=bool)
+        is_last[self._episode_starts[1:] - 1] = True
+        if self._num_steps:
+            is_last[-1] = True
+        self._transition_starts = np.flatnonzero(~is_last)
+
+    @property
+    def columns(self):
+        """The name of each column, to its dtype and the shape of a step."""
+        return {name: (np.dtype(c["dtype"]), tuple(c["shape"]))
+                for name, c in self._columns.items()}
+
+    @property
+    def num_episodes(self):
+        return len(self._episode_starts)
+
+    def episode(self, index):
+        """The (first step, length) of an episode."""
+        return int(self._episode_starts[index]), int(self._episode_lengths[index])
+
+    def __len__(self):
+        return self._num_steps
+
+    def _chunk(self, chunk, name):
+        key = (chunk, name)
+        array = self._open_chunks.get(key)
+        if array is None:
+            path = os.path.join(self._directories[self._chunk_dirs[chunk]], name,
+                                CHUNK_FORMAT % self._chunk_indices[chunk])
+            array = self._open_chunks[key] = np.load(path, mmap_mode="r")
+            if len(self._open_chunks) > self._max_open_chunks:
+                self._open_chunks.popitem(last=False)
+        else:
+            self._open_chunks.move_to_end(key)
+        return array
+
+    def get(self, steps, columns=None):
+        """Read some steps.
+
+        Args:
+            steps: An array of step numbers, of any shape.
+            columns: The names of the columns to read, defaults to all of them.
+
+        Returns:
+            A dict of each column to an array shaped `steps.shape` followed by
+            the shape of a step of the column.
+        """
+        steps = np.asarray(steps, dtype=np.int64)
+        flat = steps.ravel()
+        if flat.size and (flat.min() < 0 or flat.max() >= self._num_steps):
+            raise IndexError("Steps out of range for %s steps." % self._num_steps)
+        chunks = np.searchsorted(self._chunk_starts, flat, side="right") - 1
+        offsets = flat - self._chunk_starts[chunks]
+
+        batch = {}
+        for name in columns or self._columns:
+            dtype, shape = self.columns[name]
+            out = np.empty((flat.size,) + shape, dtype=dtype)
+            for chunk in np.unique(chunks):
+                rows = chunks == chunk
+                out[rows] = self._chunk(chunk, name)[offsets[rows]]
+            batch[name] = out.reshape(steps.shape + shape)
+        return batch
+
+    def sample_transitions(self, batch_size, columns=None, rng=np.random):
+        """Sample steps uniformly along with the step after each one.
+
+        Returns:
+            A dict of each column, and of each column prefixed with "next/"
+            for the next step, to arrays with a leading `batch_size`.
+        """
+        if not len(self._transition_starts):
+            raise ValueError("There are no transitions to sample.")
+        steps = self._transition_starts[rng.randint(
+            len(self._transition_starts), size=batch_size)]
+        batch = self.get(steps, columns)
+        for name, array in self.get(steps + 1, columns).items():
+            batch["next/" + name] = array
+        return batch
+
+    def sample_sequences(self, batch_size, length, columns=None, rng=np.random):
+        """Sample runs of `length` steps uniformly from within the episodes.
+
+        Returns:
+            A dict of each column to arrays with leading (batch_size, length).
+        """
+        # Each episode has `episode_length - length + 1` runs of `length`.
+        counts = np.maximum(self._episode_lengths - length + 1, 0)
+        ends = np.cumsum(counts)
+        if not len(ends) or not ends[-1]:
+            raise ValueError("There are no episodes of %s steps." % length)
+        runs = rng.randint(ends[-1], size=batch_size)
+        episodes = np.searchsorted(ends, runs, side="right")
+        starts = self._episode_starts[episodes] + runs - (ends[episodes] - counts[episodes])
+        return self.get(starts[:, None] + np.arange(length), columns)
+
+    def close(self):
+        self._open_chunks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
+
+def record_replay(replay_path, directory, **env_kwargs):
+    """Re-simulate a replay without a client, recording it to `directory`.
+
+    Every episode of the replay is played again by stepping a `LoLEnv` with
+    the actions in the replay, see `replay.iter_steps`, so the observations
+    go through the same `Features.transform_obs` and rewards as when it was
+    played, e.g. to record the replay with a new set of features.
+
+    Args:
+        replay_path: Path of the replay to re-simulate.
+        directory: Where to write the recording, see `TrajectoryWriter`.
+        **env_kwargs: Arguments for the `LoLEnv`, other than the map, players
+            and multiplier, which come from the replay. The moves are decoded
+            with the move range of its `agent_interface_format`, so it must be
+            the one the replay was played with.
+
+    Returns:
+        The number of steps recorded.
+    """
+    with open(replay_path, "rb") as f:
+        info = replay.read_replay_info(f)
+    env_kwargs.setdefault("human_observer", False)
+    env = TrajectoryRecorder(lol_env.LoLEnv(
+        map_name=info["map"],
+        players=info["players"],
+        multiplier=info["multiplier"],
+        **env_kwargs), directory)
+    move_range = env_kwargs["agent_interface_format"].action_dimensions.move_range
+    with env:
+        env.connect()
+        started = False
+        with open(replay_path, "rb") as f:
+            for kind, value in replay.iter_steps(f, len(info["players"]),
+                                                 move_range=move_range):
+                if kind == "reset":
+                    env.reset(spawn_positions=value)
+                    started = True
+                elif started:
+                    env.step(value)
+    return env.writer.num_steps if env.writer else 0
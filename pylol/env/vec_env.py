@@ -0,0 +1,333 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Run many League of Legends v4.20 environments from one learner.
+
+Each `LoLEnv` runs in its own worker process with its own GameServer and Redis
+ports. The environments are stepped concurrently and their observations,
+rewards and dones are stacked into numpy arrays with a leading environment
+dimension.
+"""
+
+import multiprocessing
+import traceback
+
+from absl import logging
+import numpy as np
+
+from pylol.env import lol_env
+from pylol.env import shared_buffers
+from pylol.lib import features
+from pylol.lib import portspicker
+from pylol.lib import redis_server
+
+def _worker(conn, env_index, env_kwargs):
+    """Run a `LoLEnv` and serve commands from the `LoLVecEnv` over `conn`."""
+    env = None
+    buffers = None
+    try:
+        env = lol_env.LoLEnv(**env_kwargs)
+        env.connect()
+
+        def reply(timesteps, done, slot):
+            observations = [t.observation for t in timesteps]
+            if buffers:
+                # Only send the keys which aren't laid out in shared memory.
+                buffers.write(slot, env_index, observations)
+                observations = [{k: v for k, v in o.items()
+                                 if k not in buffers.keys}
+                                for o in observations]
+            conn.send((True, (observations, [t.reward for t in timesteps],
+                              done)))
+
+        while True:
+            command, data = conn.recv()
+            if command == "step":
+                if buffers:
+                    slot = data
+                    acts = shared_buffers.decode_actions(
+                        buffers.actions[env_index])
+                else:
+                    slot, acts = None, data
+                timesteps = env.step(acts)
+                done = timesteps[0].last()
+                if done:
+                    # Auto-reset, returning the last rewards with the new episode.
+                    rewards = [t.reward for t in timesteps]
+                    timesteps = tuple(t._replace(reward=r) for t, r in zip(
+                        env.reset(), rewards))
+                reply(timesteps, done, slot)
+            elif command == "reset":
+                reply(env.reset(), False, data)
+            elif command == "spec":
+                conn.send((True, (env.observation_spec(), env.action_spec())))
+            elif command == "attach":
+                buffers = shared_buffers.SharedBuffers(
+                    env.observation_spec()[0], *data)
+                conn.send((True, None))
+            elif command == "close":
+                break
+            else:
+                raise ValueError("Unknown command: %s" % command)
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:  # Report it to the learner instead of dying silently.
+        conn.send((False, traceback.format_exc()))
+    finally:
+        if buffers:
+            buffers.close()
+        if env:
+            env.close()
+        conn.close()
+
+class LoLVecEnv(object):
+    """A vector of `LoLEnv`s, each running in its own worker process.
+
+    Observations are returned as a dict of arrays shaped (num_envs, num_agents,
+    ...) for every key with a fixed shape in the observation spec, and nested
+    [env][agent] lists for keys which vary, e.g. `available_actions`. Episodes
+    which finish are reset automatically: the step that ends an episode returns
+    its rewards, `done=True` and the first observation of the next episode.
+
+    With `use_shared_memory=True` the workers write the fixed shape
+    observations straight into shared memory and the learner gets views of it,
+    instead of every observation being pickled through a pipe. The views stay
+    valid for `ring_size - 1` more steps, copy them to keep them for longer.
+
+    With `redis_servers=n` the environments share `n` redis-servers, started
+    here, instead of starting one each, see `LoLEnv`'s `shared_redis_port`.
+    They listen on Unix domain sockets instead of ports if `redis_unix_socket`
+    is passed on to the environments.
+    """
+
+    def __init__(self, num_envs, context=None, use_shared_memory=False,
+                 ring_size=2, redis_servers=0, **env_kwargs):
+        """Launch the environments.
+
+        Args:
+            num_envs: Number of environments to run.
+            context: Optional multiprocessing start method, e.g. "spawn".
+            use_shared_memory: Whether to exchange observations and actions
+                with the workers through shared memory.
+            ring_size: Number of steps of observations kept in shared memory.
+            redis_servers: Number of redis-servers for the environments to
+                share, or 0 for one each.
+            **env_kwargs: Arguments for each `LoLEnv`, other than `ports`,
+                `shared_redis_port` and `shared_redis_unix_socket`.
+        """
+        if num_envs < 1:
+            raise ValueError("num_envs must be at least 1, got: %s" % num_envs)
+        if not 0 <= redis_servers <= num_envs:
+            raise ValueError("redis_servers must be between 0 and %s, got: %s" % (
+                num_envs, redis_servers))
+
+        self._num_envs = num_envs
+        self._conns = []
+        self._procs = []
+        self._buffers = None
+        self._redis_servers = []
+        self._slot = 0
+
+        # Reserve the ports here so the workers can't pick the same ones.
+        unix_socket = env_kwargs.get("redis_unix_socket", False)
+        if unix_socket:
+            self._ports = portspicker.pick_contiguous_unused_ports(num_envs)
+        elif redis_servers:
+            self._ports = portspicker.pick_contiguous_unused_ports(
+                num_envs + redis_servers)
+        else:
+            self._ports = portspicker.pick_contiguous_unused_ports(2 * num_envs)
+        ctx = multiprocessing.get_context(context)
+        try:
+            for i in range(redis_servers):
+                if unix_socket:
+                    self._redis_servers.append(redis_server.RedisServer(
+                        env_kwargs["host"], None, unix_socket=redis_server.unix_socket_path(
+                            "%s-%s" % (self._ports[0], i))))
+                else:
+                    self._redis_servers.append(redis_server.RedisServer(
+                        env_kwargs["host"], self._ports[num_envs + i]))
+            for i in range(num_envs):
+                conn, worker_conn = ctx.Pipe()
+                if redis_servers:
+                    server = self._redis_servers[i % redis_servers]
+                    kwargs = dict(env_kwargs, ports=self._ports[i:i + 1],
+                                  shared_redis_port=server.port,
+                                  shared_redis_unix_socket=server.unix_socket)
+                elif unix_socket:
+                    kwargs = dict(env_kwargs, ports=self._ports[i:i + 1])
+                else:
+                    kwargs = dict(env_kwargs, ports=self._ports[2 * i:2 * i + 2])
+                proc = ctx.Process(target=_worker,
+                                   args=(worker_conn, i, kwargs), daemon=True)
+                proc.start()
+                worker_conn.close()
+                self._conns.append(conn)
+                self._procs.append(proc)
+
+            self._observation_spec, self._action_spec = self._call("spec")[0]
+            self._action_validator = features.ActionValidator(
+                self._action_spec[0])
+            if use_shared_memory:
+                num_agents = len(env_kwargs["players"])
+                self._buffers = shared_buffers.SharedBuffers(
+                    self._observation_spec[0], num_envs, num_agents, ring_size)
+                self._call("attach", [(num_envs, num_agents, ring_size,
+                                       self._buffers.name)] * num_envs)
+        except:
+            self.close()
+            raise
+        logging.info("Started %s environments.", num_envs)
+
+    @property
+    def num_envs(self):
+        return self._num_envs
+
+    def observation_spec(self):
+        """The observation spec of each agent, see `LoLEnv.observation_spec`."""
+        return self._observation_spec
+
+    def action_spec(self):
+        """The action spec of each agent, see `LoLEnv.action_spec`."""
+        return self._action_spec
+
+    def reset(self):
+        """Reset every environment, returning the stacked observations."""
+        slot = self._next_slot()
+        results = self._call("reset", [slot] * self._num_envs)
+        return self._stack_obs([obs for obs, _, _ in results], slot)
+
+    def step(self, actions):
+        """Step every environment concurrently.
+
+        Args:
+            actions: A list with one list of `FunctionCall`s per environment,
+                one per agent.
+
+        Returns:
+            A tuple of the stacked observations, a (num_envs, num_agents) array
+            of rewards and a (num_envs,) bool array of whether each episode
+            ended on this step.
+        """
+        if len(actions) != self._num_envs:
+            raise ValueError("Expected actions for %s environments, got: %s" % (
+                self._num_envs, len(actions)))
+        slot = self._next_slot()
+        if self._buffers:
+            rows = self._buffers.actions
+            for env_actions, out in zip(actions, rows):
+                shared_buffers.encode_actions(env_actions, out)
+            # Check every action here at once, rather than failing in a worker.
+            valid, errors = self._action_validator.validate(
+                rows[..., 0], rows[..., 1:])
+            if not valid.all():
+                env_index, agent = np.argwhere(~valid)[0]
+                raise ValueError("Invalid action for agent %s of environment %s: %s" % (
+                    agent, env_index, features.ActionError(errors[env_index, agent]).name))
+            results = self._call("step", [slot] * self._num_envs)
+        else:
+            results = self._call("step", actions)
+        rewards = np.array([r for _, r, _ in results], dtype=np.float32)
+        dones = np.array([done for _, _, done in results], dtype=bool)
+        return self._stack_obs([obs for obs, _, _ in results], slot), rewards, dones
+
+    def close(self):
+        """Close every environment and shut down the workers."""
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(10)
+            if proc.is_alive():
+                logging.warning("Terminating environment worker %s.", proc.pid)
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        self._conns = []
+        self._procs = []
+        if self._buffers:
+            self._buffers.close()
+            self._buffers = None
+        for server in self._redis_servers:
+            server.close()
+        self._redis_servers = []
+        if self._ports:
+            portspicker.return_ports(self._ports)
+            self._ports = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
+
+    def _call(self, command, data=None):
+        """Send a command to every worker, then wait for all of the results.
+
+        Every worker's reply is received before raising, so none are left
+        behind for the next command.
+        """
+        sent = []
+        failures = []
+        for i, conn in enumerate(self._conns):
+            try:
+                conn.send((command, data[i] if data is not None else None))
+                sent.append(i)
+            except (BrokenPipeError, EOFError, OSError):
+                failures.append((i, "The worker has exited."))
+        results = [None] * len(self._conns)
+        for i in sent:
+            try:
+                ok, result = self._conns[i].recv()
+            except (EOFError, OSError):
+                ok, result = False, "The worker has exited."
+            if ok:
+                results[i] = result
+            else:
+                failures.append((i, result))
+        if failures:
+            raise RuntimeError("%s environment worker(s) failed:\n%s" % (
+                len(failures), "\n".join("Environment %s: %s" % failure
+                                         for failure in sorted(failures))))
+        return results
+
+    def _next_slot(self):
+        if not self._buffers:
+            return None
+        self._slot = (self._slot + 1) % self._buffers.size
+        return self._slot
+
+    def _stack_obs(self, observations, slot=None):
+        """Stack the observations of every agent of every environment."""
+        spec = self._observation_spec[0]
+        out = self._buffers.read(slot) if self._buffers else {}
+        for key, shape in spec.items():
+            if key in out:
+                continue
+            values = [[o[key] for o in env_obs] for env_obs in observations]
+            if 0 in shape:
+                out[key] = values
+            else:
+                out[key] = np.array(values, dtype=shared_buffers.KEY_DTYPES.get(
+                    key, shared_buffers.OBS_DTYPE))
+        return out
@@ -0,0 +1,142 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Compact binary observation format sent by the GameServer.
+
+Each observation is a fixed size header followed by one float32 row per
+champion unit, with the columns in `features.ChampUnit` order. This lets the
+champion units be decoded with `np.frombuffer` instead of parsing JSON. JSON
+observations are still accepted everywhere, binary ones are only sent by the
+GameServer once `RemoteController` asks for them.
+
+The observations of every agent for one tick can be sent as a single message
+by concatenating them, see `decode_all`.
+"""
+
+import enum
+import numpy as np
+
+from pylol.lib import features
+from pylol.lib import named_array
+
+MAGIC = b"LOLB"
+VERSION = 1
+
+class AvailableAction(enum.IntEnum):
+    """Indices into the `available_actions` flags of the header."""
+    can_no_op   = 0
+    can_move    = 1
+    can_spell_0 = 2
+    can_spell_1 = 3
+    can_spell_2 = 4
+    can_spell_3 = 5
+    can_spell_4 = 6
+    can_spell_5 = 7
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("num_units", "<u2"),
+    ("game_time", "<f4"),
+    ("available_actions", "u1", (len(AvailableAction),)),
+])
+
+UNIT_DTYPE = np.dtype("<f4")
+
+def is_binary(data):
+    """Whether `data` is a binary observation rather than JSON."""
+    return data[:len(MAGIC)] == MAGIC
+
+def encode(game_time, champ_units, available_actions):
+    """Encode an observation into the binary format.
+
+    Args:
+        game_time: Game time of the observation in seconds.
+        champ_units: A (num_units, len(ChampUnit)) array like.
+        available_actions: A sequence of flags in `AvailableAction` order.
+
+    Returns:
+        The encoded observation as bytes.
+    """
+    champ_units = np.asarray(champ_units, dtype=UNIT_DTYPE)
+    if champ_units.ndim != 2 or champ_units.shape[1] != len(features.ChampUnit):
+        raise ValueError("Expected champ_units of shape (n, %s), got: %s" % (
+            len(features.ChampUnit), champ_units.shape))
+
+    header = np.zeros((), dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["num_units"] = champ_units.shape[0]
+    header["game_time"] = game_time
+    header["available_actions"] = available_actions
+    return header.tobytes() + champ_units.tobytes()
+
+def decode(data, offset=0):
+    """Decode a binary observation without copying the champion units.
+
+    Args:
+        data: The received message.
+        offset: Where the observation starts within `data`.
+
+    Returns:
+        A dict laid out like the JSON observations, except that `champ_units`
+        is a read-only (num_units, len(ChampUnit)) `NamedNumpyArray` backed by
+        `data` and `available_actions` is a `NamedNumpyArray` of flags.
+
+    Raises:
+        ValueError: if `data` isn't a binary observation of a known version.
+    """
+    if data[offset:offset + len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary observation.")
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1, offset=offset)[0]
+    if header["version"] != VERSION:
+        raise ValueError("Unsupported binary observation version: %s" % (
+            header["version"]))
+
+    num_units = int(header["num_units"])
+    units = np.frombuffer(data, dtype=UNIT_DTYPE,
+                          count=num_units * len(features.ChampUnit),
+                          offset=offset + HEADER_DTYPE.itemsize)
+    units = units.reshape(num_units, len(features.ChampUnit))
+
+    return {
+        "observation": {
+            "game_time": float(header["game_time"]),
+            "champ_units": named_array.NamedNumpyArray(
+                units, [None, features.ChampUnit], copy=False),
+            "available_actions": named_array.NamedNumpyArray(
+                header["available_actions"], AvailableAction, copy=False)
+        }
+    }
+
+def frame_size(num_units):
+    """Size in bytes of an observation of `num_units` champion units."""
+    return HEADER_DTYPE.itemsize + num_units * len(features.ChampUnit) * UNIT_DTYPE.itemsize
+
+def decode_all(data):
+    """Decode a message of one or more concatenated binary observations."""
+    observations = []
+    offset = 0
+    while offset < len(data):
+        obs = decode(data, offset)
+        observations.append(obs)
+        offset += frame_size(len(obs["observation"]["champ_units"]))
+    return observations
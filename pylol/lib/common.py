@@ -21,6 +21,10 @@
 # SOFTWARE.
 """Equivalent to protobuff for this project."""
 
+import math
+
+from pylol.lib import actions
+
 class Action(object):
     """Creates an action template to be converted to a RequestAction."""
 
@@ -40,4 +44,70 @@ class Action(object):
 
 class RequestAction(object):
     def __init__(self, actions):
-        self.actions = actions
\ No newline at end of file
+        self.actions = actions
+
+# Payloads formatted exactly like `json.dumps` of the dicts built by the
+# `RemoteController.player_*` helpers, which uses `repr` for floats.
+_MOVE_TEMPLATE = '{"player_id": "%s", "x": %r, "y": %r}'
+_SPELL_TEMPLATE = ('{"player_id": "%s", "target_player_id": "2", '
+                   '"spell_slot": %d, "x": %r, "y": %r}')
+
+# The move range of the default agent interface format.
+MOVE_RANGE = 8
+
+def move_centre(move_range):
+    """The (x, y) centre of a move range, a size or (width, height), which
+    moves are relative to."""
+    if isinstance(move_range, int):
+        move_range = (move_range, move_range)
+    return int(move_range[0]) // 2, int(move_range[1]) // 2
+
+def encode_no_op(user_id, values, move_range=MOVE_RANGE):
+    return ("noop", "")
+
+def encode_move(user_id, values, move_range=MOVE_RANGE):
+    # Relative to the centre of the move range, like `RemoteController.actions`.
+    centre_x, centre_y = move_centre(move_range)
+    x = int(math.floor(values[0])) - centre_x
+    y = int(math.floor(values[1])) - centre_y
+    return ("move", _MOVE_TEMPLATE % (user_id, float(x * 100.0), float(y * 100.0)))
+
+def encode_spell(user_id, values, move_range=MOVE_RANGE):
+    return ("spell", _SPELL_TEMPLATE % (
+        user_id, actions.TYPES.spell.fn([int(values[0])]),
+        float(int(math.floor(values[1]))), float(int(math.floor(values[2])))))
+
+# The encoder of each `actions.FUNCTIONS` function type, by name. An encoder
+# takes the issuer's user_id, the flattened values of the arguments and the
+# move range of the agent interface format, and returns the (type, payload)
+# pair pushed onto the "action" list.
+ENCODERS = {
+    "no_op": encode_no_op,
+    "move": encode_move,
+    "spell": encode_spell,
+}
+
+def decode_no_op(data, move_range=MOVE_RANGE):
+    return actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+
+def decode_move(data, move_range=MOVE_RANGE):
+    # Back to the move range, the inverse of `encode_move`.
+    centre_x, centre_y = move_centre(move_range)
+    return actions.FunctionCall(actions.FUNCTIONS.move.id, [[
+        int(round(data["x"] / 100.0)) + centre_x,
+        int(round(data["y"] / 100.0)) + centre_y]])
+
+def decode_spell(data, move_range=MOVE_RANGE):
+    slots = [slot for _, slot in actions.SPELL_OPTIONS]
+    return actions.FunctionCall(actions.FUNCTIONS.spell.id, [
+        [slots.index(data["spell_slot"])], [int(data["x"]), int(data["y"])]])
+
+# The inverse of `ENCODERS`, by the type of action sent to the GameServer. A
+# decoder takes the decoded JSON payload and the move range the actions were
+# encoded with, and returns the `FunctionCall`, e.g. to replay the actions of
+# a replay.
+DECODERS = {
+    "noop": decode_no_op,
+    "move": decode_move,
+    "spell": decode_spell,
+}
@@ -0,0 +1,455 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""A pure Python stand-in for the LeagueSandbox GameServer.
+
+`FakeGameServer` speaks the same Redis protocol as the modified GameServer
+which `RemoteController` talks to, so `LoLEnv` can be run, profiled and
+regression tested without the real binary or a League of Legends client:
+
+    * "clients_join" then "game_started" are sent on the "observation" list
+      once Redis is reachable.
+    * Actions are popped from the "action" list as type/payload pairs.
+    * Commands are popped from the "command" list, `start_observing` on its
+      own and the others with a JSON payload, e.g. `save_replay` which is
+      answered on the "command_data" list, in chunks if it asks for them.
+    * Observations of every agent are pushed onto the "observation" list.
+
+Every list name starts with `key_prefix` when sharing a redis-server between
+games, see `lib/redis_server.py`.
+
+The simulation of `champ_units` is deliberately simple and fully
+deterministic. Champions move towards their move targets, spells damage the
+enemies near where they are cast and the game ends up with deaths, kills, gold
+and experience for the rewards to work with. The server runs in lockstep with
+the agents: it sends a tick once observing starts, whenever the players are
+reset and after every agent has sent an action, so it runs as fast as the
+Python side can step it.
+"""
+
+import json
+import math
+import time
+
+from absl import logging
+import redis
+
+from pylol.lib import binary_obs
+from pylol.lib import features
+from pylol.lib import redis_server
+
+# Actions sent by agents every step, the GameServer ticks once every agent
+# has sent one.
+AGENT_ACTIONS = frozenset(["noop", "move", "spell", "attack"])
+
+# Commands which are followed by a JSON payload.
+PAYLOAD_COMMANDS = frozenset(["observation_format", "change_champion",
+                              "save_replay"])
+
+BLUE_SPAWN = (6900.0, 6900.0)
+PURPLE_SPAWN = (7100.0, 7100.0)
+SPAWN_SPACING = 150.0
+
+BASE_STATS = {
+    "max_hp": 600.0,
+    "hp_regen": 1.5,
+    "max_mp": 300.0,
+    "mp_regen": 2.0,
+    "attack_damage": 60.0,
+    "attack_speed": 0.625,
+    "armor": 30.0,
+    "mr": 30.0,
+    "move_speed": 325.0,
+}
+# Stats which differ from `BASE_STATS`, so the champion can be told apart in
+# the observations. A changed champion gets them from the next reset.
+CHAMPION_STATS = {
+    "Ashe": {"max_hp": 640.0, "attack_damage": 61.0},
+}
+ATTACK_RANGE = 550.0
+SPELL_RANGE = 1100.0
+SPELL_RADIUS = 250.0
+SPELL_DAMAGE = 90.0
+SPELL_COST = 40.0
+SPELL_COOLDOWN = 6.0
+KILL_GOLD = 300.0
+KILL_XP = 200.0
+GOLD_PER_SECOND = 2.0
+XP_PER_SECOND = 1.0
+
+SPELL_SLOTS = ("q", "w", "e", "r", "sum_1", "sum_2")
+
+class Champion(object):
+    """The simulated state of one champion."""
+
+    def __init__(self, user_id, name, team, spawn):
+        self.user_id = user_id
+        self.name = name
+        self.team = team
+        self.spawn = spawn
+        self.reset()
+
+    def reset(self):
+        self.x, self.y = self.spawn
+        self.target = None
+        self.facing_angle = 0.0
+        self.stats = dict(BASE_STATS, **CHAMPION_STATS.get(self.name, {}))
+        self.current_hp = self.stats["max_hp"]
+        self.current_mp = self.stats["max_mp"]
+        self.alive = True
+        self.level = 1
+        self.current_gold = 500.0
+        self.current_xp = 0.0
+        self.death_count = 0
+        self.kill_count = 0
+        self.cooldowns = [0.0] * len(SPELL_SLOTS)
+        self.attack_cooldown = 0.0
+
+    def distance(self, x, y):
+        return math.hypot(self.x - x, self.y - y)
+
+class FakeGameServer(object):
+    """Simulates a GameServer for a list of players over Redis."""
+
+    def __init__(self, redis_host="localhost", redis_port=6379, players=None,
+                 multiplier=7.5, cooldowns_enabled=False, manacosts_enabled=False,
+                 batch_ticks=False, timeout_seconds=60, key_prefix="",
+                 redis_unix_socket=None):
+        """Create the fake GameServer.
+
+        Args:
+            redis_host: Host of the redis-server started by `RemoteController`.
+            redis_port: Port of the redis-server.
+            players: A list of (champion, team) pairs, team being "BLUE" or
+                "PURPLE". Defaults to a 1v1.
+            multiplier: Observations per second of game time.
+            cooldowns_enabled: Whether spells go on cooldown.
+            manacosts_enabled: Whether spells cost mana.
+            batch_ticks: Whether to send the observations of every agent for a
+                tick as one message.
+            timeout_seconds: How long to wait for redis-server to start.
+            key_prefix: Prefix of the names of the lists of this game.
+            redis_unix_socket: Path of the Unix socket of the redis-server, to
+                connect over instead of TCP.
+        """
+        players = players or [("Ezreal", "BLUE"), ("Ezreal", "PURPLE")]
+        if redis_unix_socket:
+            self._r = redis.Redis(unix_socket_path=redis_unix_socket, db=0)
+        else:
+            self._r = redis.Redis(host=redis_host, port=redis_port, db=0)
+        self._keys = redis_server.keys(key_prefix)
+        self._multiplier = multiplier
+        self._cooldowns_enabled = cooldowns_enabled
+        self._manacosts_enabled = manacosts_enabled
+        self._batch_ticks = batch_ticks
+        self._timeout = timeout_seconds
+        self._binary = False
+        self._observing = False
+        self._running = False
+        self._tick = 0
+        self._game_time = 0.0
+        self._pending_actions = 0
+        self._reset_tick = False
+        self._replay = []
+
+        counts = {}
+        self.champions = []
+        for i, (name, team) in enumerate(players):
+            k = counts[team] = counts.get(team, -1) + 1
+            x, y = BLUE_SPAWN if team == "BLUE" else PURPLE_SPAWN
+            sign = -1 if team == "BLUE" else 1
+            spawn = (x + sign * k * SPAWN_SPACING, y)
+            self.champions.append(Champion(i + 1, name, team, spawn))
+
+    @classmethod
+    def from_settings(cls, settings_path, **kwargs):
+        """Create a fake GameServer for the `GameInfo.json` written by
+        `lib.utils.write_config`."""
+        with open(settings_path) as f:
+            settings = json.load(f)
+        players = [(p["champion"], p["team"]) for p in settings["players"]]
+        game_info = settings["gameInfo"]
+        return cls(players=players,
+                   cooldowns_enabled=game_info["COOLDOWNS_ENABLED"],
+                   manacosts_enabled=game_info["MANACOSTS_ENABLED"],
+                   **kwargs)
+
+    @property
+    def tick(self):
+        return self._tick
+
+    def run(self):
+        """Announce the game and serve actions and commands until stopped."""
+        self._wait_for_redis()
+        self._r.lpush(self._keys["observation"], json.dumps("clients_join"))
+        self._r.lpush(self._keys["observation"], json.dumps("game_started"))
+
+        names = {self._keys[key].encode("utf-8"): key for key in ("action", "command")}
+        self._running = True
+        try:
+            while self._running:
+                item = self._r.brpop([self._keys["action"], self._keys["command"]], 1)
+                if item:
+                    self.handle(names[item[0]], item[1].decode("utf-8"))
+                    if self._reset_tick and not self._r.llen(self._keys["action"]):
+                        self._reset_tick = False
+                        self.send_tick()
+        except redis.ConnectionError:
+            logging.info("Redis went away, shutting down.")
+
+    def stop(self):
+        self._running = False
+
+    def _wait_for_redis(self):
+        deadline = time.time() + self._timeout
+        while True:
+            try:
+                self._r.ping()
+                return
+            except redis.ConnectionError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def _payload(self, key):
+        payload = self._r.rpop(self._keys[key])
+        return payload.decode("utf-8") if payload else ""
+
+    def handle(self, key, name):
+        """Handle an action or command popped from Redis."""
+        if key == "action":
+            self.handle_action(name, self._payload("action"))
+        elif name in PAYLOAD_COMMANDS:
+            self.handle_command(name, self._payload("command"))
+        else:
+            self.handle_command(name, "")
+
+    def handle_action(self, action_type, payload):
+        """Apply an action, sending a tick once every agent has acted."""
+        data = json.loads(payload) if payload else {}
+        self._replay.append([self._game_time, action_type, data])
+
+        if action_type == "reset":
+            for champion in self.champions:
+                champion.reset()
+            self._pending_actions = 0
+            # Tick once the actions sent along with the reset, like teleporting
+            # to the spawn positions, have been applied.
+            self._reset_tick = self._observing
+            return
+
+        champion = self._champion(data.get("player_id"))
+        if action_type == "move" and champion:
+            champion.target = (champion.x + data["x"], champion.y + data["y"])
+        elif action_type == "move_to" and champion:
+            champion.target = (data["x"], data["y"])
+        elif action_type == "teleport" and champion:
+            champion.x, champion.y = data["x"], data["y"]
+            champion.target = None
+        elif action_type == "spell" and champion:
+            self._cast(champion, data["spell_slot"], data["x"], data["y"])
+        elif action_type == "attack" and champion:
+            champion.target = None
+            self._attack(champion, self._champion(data["target_player_id"]))
+        elif action_type == "message":
+            logging.info("GameServer message: %s", data.get("msg"))
+
+        if action_type in AGENT_ACTIONS:
+            self._pending_actions += 1
+            if self._pending_actions >= len(self.champions):
+                self._pending_actions = 0
+                self.step()
+                if self._observing:
+                    self.send_tick()
+
+    def handle_command(self, command, payload):
+        if command == "start_observing":
+            self._observing = True
+            self._pending_actions = 0
+            self.send_tick()
+        elif command == "observation_format":
+            self._binary = json.loads(payload)["format"] == "binary"
+        elif command == "change_champion":
+            data = json.loads(payload)
+            champion = self._champion(data["player_id"])
+            if champion:
+                champion.name = data["champion_name"]
+        elif command == "save_replay":
+            info = json.loads(payload)
+            chunk_size = info.pop("chunk_size", None)
+            replay = {"info": info, "actions": self._replay}
+            if not chunk_size:
+                self._r.lpush(self._keys["command_data"], json.dumps(replay))
+                return
+            self._r.lpush(self._keys["command_data"], redis_server.REPLAY_CHUNKED)
+            chunk = ""
+            for part in json.JSONEncoder().iterencode(replay):
+                chunk += part
+                while len(chunk) >= chunk_size:
+                    self._r.lpush(self._keys["command_data"], chunk[:chunk_size])
+                    chunk = chunk[chunk_size:]
+            if chunk:
+                self._r.lpush(self._keys["command_data"], chunk)
+            self._r.lpush(self._keys["command_data"], "")
+        else:
+            logging.warning("Unknown command: %s", command)
+
+    def _champion(self, player_id):
+        try:
+            return self.champions[int(player_id) - 1]
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def _damage(self, source, target, amount, resist):
+        if not target.alive:
+            return
+        target.current_hp -= amount * 100.0 / (100.0 + resist)
+        if target.current_hp <= 0.0:
+            target.current_hp = 0.0
+            target.alive = False
+            target.target = None
+            target.death_count += 1
+            source.kill_count += 1
+            source.current_gold += KILL_GOLD
+            source.current_xp += KILL_XP
+
+    def _cast(self, champion, slot, x, y):
+        slot = int(slot)
+        if (not champion.alive or not 0 <= slot < len(SPELL_SLOTS) or
+                champion.cooldowns[slot] > 0.0):
+            return
+        if self._manacosts_enabled:
+            if champion.current_mp < SPELL_COST:
+                return
+            champion.current_mp -= SPELL_COST
+        if self._cooldowns_enabled:
+            champion.cooldowns[slot] = SPELL_COOLDOWN
+
+        # Cast towards the target, up to the spell's range.
+        d = champion.distance(x, y)
+        if d > SPELL_RANGE:
+            x = champion.x + (x - champion.x) * SPELL_RANGE / d
+            y = champion.y + (y - champion.y) * SPELL_RANGE / d
+        champion.facing_angle = math.degrees(math.atan2(y - champion.y,
+                                                        x - champion.x))
+        for enemy in self.champions:
+            if enemy.team != champion.team and enemy.distance(x, y) <= SPELL_RADIUS:
+                self._damage(champion, enemy, SPELL_DAMAGE, enemy.stats["mr"])
+
+    def _attack(self, champion, target):
+        if (not champion.alive or not target or target.team == champion.team or
+                champion.attack_cooldown > 0.0 or
+                champion.distance(target.x, target.y) > ATTACK_RANGE):
+            return
+        champion.attack_cooldown = 1.0 / champion.stats["attack_speed"]
+        self._damage(champion, target, champion.stats["attack_damage"],
+                     target.stats["armor"])
+
+    def step(self):
+        """Advance the game by one observation's worth of game time."""
+        dt = 1.0 / self._multiplier
+        self._tick += 1
+        self._game_time += dt
+        for c in self.champions:
+            c.cooldowns = [max(0.0, cd - dt) for cd in c.cooldowns]
+            c.attack_cooldown = max(0.0, c.attack_cooldown - dt)
+            if not c.alive:
+                continue
+            c.current_hp = min(c.stats["max_hp"],
+                               c.current_hp + c.stats["hp_regen"] * dt)
+            c.current_mp = min(c.stats["max_mp"],
+                               c.current_mp + c.stats["mp_regen"] * dt)
+            c.current_gold += GOLD_PER_SECOND * dt
+            c.current_xp += XP_PER_SECOND * dt
+            if c.target:
+                dx, dy = c.target[0] - c.x, c.target[1] - c.y
+                d = math.hypot(dx, dy)
+                travel = c.stats["move_speed"] * dt
+                if d <= travel:
+                    c.x, c.y = c.target
+                    c.target = None
+                else:
+                    c.x += dx * travel / d
+                    c.y += dy * travel / d
+                    c.facing_angle = math.degrees(math.atan2(dy, dx))
+
+    def _champ_unit(self, c, me):
+        unit = {
+            "user_id": c.user_id,
+            "position": {"X": c.x, "Y": c.y},
+            "facing_angle": c.facing_angle,
+            "current_hp": c.current_hp,
+            "current_mp": c.current_mp,
+            "alive": float(c.alive),
+            "level": c.level,
+            "current_gold": c.current_gold,
+            "current_xp": c.current_xp,
+            "death_count": c.death_count,
+            "kill_count": c.kill_count,
+            "my_team": float(c.team == me.team),
+            "neutal": 0.0,
+            "dx_to_me": c.x - me.x,
+            "dy_to_me": c.y - me.y,
+            "distance_to_me": c.distance(me.x, me.y),
+            "sum_1_cooldown": c.cooldowns[4],
+            "sum_2_cooldown": c.cooldowns[5],
+        }
+        unit.update(c.stats)
+        for slot, cooldown in zip(SPELL_SLOTS[:4], c.cooldowns):
+            unit["%s_cooldown" % slot] = cooldown
+            unit["%s_level" % slot] = 1
+        return unit
+
+    def _available_actions(self, me):
+        available = {"can_no_op": True, "can_move": me.alive}
+        for i, cooldown in enumerate(me.cooldowns):
+            available["can_spell_%s" % i] = bool(
+                me.alive and cooldown == 0.0 and
+                (not self._manacosts_enabled or me.current_mp >= SPELL_COST))
+        return available
+
+    def observation(self, me):
+        """The JSON observation of the agent controlling `me`."""
+        return {"observation": {
+            "game_time": self._game_time,
+            "champ_units": [self._champ_unit(c, me) for c in self.champions],
+            "available_actions": self._available_actions(me)}}
+
+    def _encode(self, obs):
+        obs = obs["observation"]
+        units = features.champ_unit_matrix(obs["champ_units"])
+        available = [obs["available_actions"][a.name]
+                     for a in binary_obs.AvailableAction]
+        return binary_obs.encode(obs["game_time"], units, available)
+
+    def send_tick(self):
+        """Push the observation of every agent for the current tick."""
+        observations = [self.observation(c) for c in self.champions]
+        if self._binary:
+            messages = [self._encode(o) for o in observations]
+            if self._batch_ticks:
+                messages = [b"".join(messages)]
+        elif self._batch_ticks:
+            messages = [json.dumps({"tick": self._tick,
+                                    "observations": observations})]
+        else:
+            messages = [json.dumps(o) for o in observations]
+        self._r.lpush(self._keys["observation"], *messages)
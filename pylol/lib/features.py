@@ -22,6 +22,8 @@
 """Features used for ML"""
 
 import collections
+import functools
+import operator
 from absl import logging
 import random
 import six
@@ -72,6 +74,15 @@ class ChampUnit(enum.IntEnum):
     sum_1_cooldown		    = 34
     sum_2_cooldown		    = 35
 
+# Which functions can be called with which spell slot, see `action_mask`.
+ACTION_MASK_SHAPE = (len(actions.FUNCTIONS), len(actions.SPELL_OPTIONS))
+
+class ActionError(enum.IntEnum):
+    """Why `ActionValidator` rejected an action."""
+    none                    = 0
+    invalid_function        = 1
+    out_of_range            = 2
+
 class AgentInterfaceFormat(object):
     """Observation and action interface format specific to a particular agent."""
     
@@ -186,33 +197,41 @@ class Dimensions(object):
 class Features(object):
     """Render feature layers from GameServer observation into numpy arrays."""
 
-    def __init__(self, agent_interface_format=None):
+    def __init__(self, agent_interface_format=None, num_champ_units=2):
         """Initialize a Features instance matching the specified interface format.
 
         Args:
             agent_interface_format: See the documentation for `AgentInterfaceFormat`.
+            num_champ_units: Number of champions in the game, i.e. players.
         """
         if not agent_interface_format:
             raise ValueError("Please specify agent_interface_format")
         
         self._agent_interface_format = agent_interface_format
+        self._num_champ_units = num_champ_units
         aif = self._agent_interface_format
 
         self._valid_functions = _init_valid_functions(aif.action_dimensions)
+        self._action_encoders = _init_action_encoders(self._valid_functions)
+        self._action_validator = ActionValidator(self._valid_functions)
     
     def observation_spec(self):
         """The observation spec for the League of Legends v4.20 environment.
         
         Returns:
-            The dict of observation names 
+            The dict of observation names to shapes. A 0 marks a dimension which
+            varies, `ally_units` and `enemy_units` depend on the agent's team.
         """
 
         aif = self._agent_interface_format
 
         obs_spec = named_array.NamedDict({
-            "my_id": (0,),
-            "game_time": (0,),
+            "my_id": (),
+            "game_time": (),
+            "champ_units": (self._num_champ_units, len(ChampUnit)),
             "me_unit": (len(ChampUnit),),
+            "ally_units": (0, len(ChampUnit)),
+            "enemy_units": (0, len(ChampUnit)),
             "enemy_unit": (len(ChampUnit),)
         })
         
@@ -227,6 +246,7 @@ class Features(object):
         """
 
         obs_spec["available_actions"] = (0,)
+        obs_spec["action_mask"] = ACTION_MASK_SHAPE
 
         return obs_spec
 
@@ -236,26 +256,29 @@ class Features(object):
 
     def available_actions(self, obs):
         """Return the list of available action ids."""
-        available_actions = set()
-        obs_available_actions = obs["available_actions"]
-        # print("AVAILABLE ACTIONS:", obs_available_actions)
-        if obs_available_actions["can_no_op"]: available_actions.add(0)
-        if obs_available_actions["can_move"]: available_actions.add(1)
-        if  obs_available_actions["can_spell_0"] or \
-            obs_available_actions["can_spell_1"] or \
-            obs_available_actions["can_spell_2"] or \
-            obs_available_actions["can_spell_3"] or \
-            obs_available_actions["can_spell_4"] or \
-            obs_available_actions["can_spell_5"]:
-            available_actions.add(2)
-        """
-        print("FUNCTIONS AVAILABLE:", actions.FUNCTIONS_AVAILABLE)
-        for i, func in six.iteritems(actions.FUNCTIONS_AVAILABLE):
-            if func.avail_fn(obs):
-                available_actions.add(i)
+        return np.flatnonzero(self.action_mask(obs).any(axis=1)).tolist()
+
+    def action_mask(self, obs, out=None):
+        """Which actions are available, as a fixed shape bool array.
+
+        Row `f` is for function id `f` and column `s` for spell slot `s`. Only
+        `spell` takes a spell slot, so the row of every other function is
+        either all True or all False. `mask.any(axis=1)` masks the function
+        ids and `mask[FUNCTIONS.spell.id]` the spell slots.
+
+        Args:
+            obs: The observation from the GameServer, with its
+                "available_actions" flags.
+            out: An optional bool array of `ACTION_MASK_SHAPE` to write into.
         """
-        
-        return list(available_actions)
+        flags = obs["available_actions"]
+        if out is None:
+            out = np.empty(ACTION_MASK_SHAPE, dtype=bool)
+        out[actions.FUNCTIONS.no_op.id] = bool(flags["can_no_op"])
+        out[actions.FUNCTIONS.move.id] = bool(flags["can_move"])
+        for i in range(ACTION_MASK_SHAPE[1]):
+            out[actions.FUNCTIONS.spell.id, i] = bool(flags["can_spell_%s" % i])
+        return out
 
     def transform_action(self, obs, func_call):
         """Transform an agent-style action to one that GameServer can consume.
@@ -303,7 +326,7 @@ class Features(object):
                     "Wrong number of values for argument of %s, got: %s" % (
                         func, func_call.arguments))
             for s, a in zip(sizes, arg):
-                if not np.all(0 <= a) and np.all(a < s):
+                if not (np.all(0 <= a) and np.all(a < s)):
                     raise ValueError("Argument is out of range for %s, got: %s" % (
                         func, func_call.arguments))
 
@@ -312,9 +335,13 @@ class Features(object):
               for type_, a in zip(func.args, func_call.arguments)}
         
         # Get the issuers user_id from the observation
-        for champ_unit in obs["champ_units"]:
-            if champ_unit["distance_to_me"] == 0.0:
-                kwargs["user_id"] = champ_unit["user_id"]
+        user_id = _user_id(obs)
+        if user_id is not None:
+            kwargs["user_id"] = user_id
+
+        # Moves are relative to the centre of the move range
+        if "move_range" in kwargs:
+            kwargs["move_centre"] = common.move_centre(aif.action_dimensions.move_range)
 
         # redis magic...
         lol_action = common.Action()
@@ -324,78 +351,289 @@ class Features(object):
 
         return lol_action
 
-    def transform_obs(self, obs):
-        """Render some GameServer observations into something an agent can handle."""
-        # Get agents user id
-        me_id = None
-        enemy_id = None
-        me_unit = None
-        enemy_unit = None
-        for champ_unit in obs["observation"]["champ_units"]:
-            if champ_unit["distance_to_me"] == 0.0:
-                me_id = champ_unit["user_id"]
-                me_unit = champ_unit
-            else:
-                enemy_id = champ_unit["user_id"]
-                enemy_unit = champ_unit
-
-        # Observations of champion units in the game
-        champ_units = [named_array.NamedNumpyArray([
-            champ_unit["user_id"],
-            champ_unit["position"]["X"],
-            champ_unit["position"]["Y"],
-            champ_unit["facing_angle"],
-            champ_unit["max_hp"],
-            champ_unit["current_hp"],
-            champ_unit["hp_regen"],
-            champ_unit["max_mp"],
-            champ_unit["current_mp"],
-            champ_unit["mp_regen"],
-            champ_unit["attack_damage"],
-            champ_unit["attack_speed"]	,
-            champ_unit["alive"],
-            champ_unit["level"],
-            champ_unit["armor"],
-            champ_unit["mr"],
-            champ_unit["current_gold"],
-            champ_unit["current_xp"],
-            champ_unit["death_count"],
-            champ_unit["kill_count"],
-            champ_unit["move_speed"],
-            champ_unit["my_team"],
-            champ_unit["neutal"],
-            champ_unit["dx_to_me"],
-            champ_unit["dy_to_me"],
-            champ_unit["distance_to_me"],
-            champ_unit["q_cooldown"],
-            champ_unit["q_level"],
-            champ_unit["w_cooldown"],
-            champ_unit["w_level"],
-            champ_unit["e_cooldown"],
-            champ_unit["e_level"],
-            champ_unit["r_cooldown"],
-            champ_unit["r_level"],
-            champ_unit["sum_1_cooldown"],
-            champ_unit["sum_2_cooldown"],
-        ], names=ChampUnit, dtype=np.float32) for champ_unit in obs["observation"]["champ_units"]]
+    def encode_action(self, obs, func_call):
+        """Validate an agent-style action and encode it for the GameServer.
+
+        This is the fast path of `transform_action`, which skips building a
+        `common.Action` and serialising it with `json.dumps`.
+
+        Args:
+            obs: an observation extracted from redis from the previous step.
+            func_call: a `FunctionCall` to be turned into a a redis action.
+
+        Returns:
+            The (type, payload) pair to push onto the "action" list, see
+            `RemoteController.send_encoded_actions`.
+
+        Raises:
+            ValueError: if the action doesn't pass validation.
+        """
+        try:
+            encoder, arg_lengths, bounds = self._action_encoders[func_call.function]
+        except (KeyError, TypeError):
+            raise ValueError("Invalid function: %s." % (func_call.function,))
+
+        arguments = func_call.arguments
+        if len(arguments) != len(arg_lengths):
+            raise ValueError(
+                "Wrong number of arguments for function: %s, got: %s" % (
+                    actions.FUNCTIONS[func_call.function], arguments))
+        values = []
+        for n, arg in zip(arg_lengths, arguments):
+            if len(arg) != n:
+                raise ValueError(
+                    "Wrong number of values for argument of %s, got: %s" % (
+                        actions.FUNCTIONS[func_call.function], arguments))
+            values.extend(arg)
+        for v, (s, whole) in zip(values, bounds):
+            if not 0 <= v < s or (whole and v != int(v)):
+                raise ValueError("Argument is out of range for %s, got: %s" % (
+                    actions.FUNCTIONS[func_call.function], arguments))
+
+        user_id = _user_id(obs)
+        if user_id is None:
+            raise ValueError("The observation has no champion for the agent.")
+        return encoder(user_id, values)
+
+    def validate_actions(self, function_ids, arguments):
+        """Validate a batch of actions at once, see `ActionValidator`."""
+        return self._action_validator.validate(function_ids, arguments)
+
+    def transform_obs(self, obs, buffer=None):
+        """Render some GameServer observations into something an agent can handle.
+
+        Every champion unit is written into a single (num_units, len(ChampUnit))
+        float32 matrix, `champ_units`, with the rows ordered as the observing
+        champion, then its allies, then its enemies. The rows are named `me`,
+        `ally_<i>` and `enemy_<i>`, and `me_unit`, `ally_units`, `enemy_units`
+        and `enemy_unit` (the first enemy) are views into it.
+
+        The observing champion is the first unit at distance 0, as other
+        champions can be stacked on the same spot, e.g. in the fountain.
+
+        Args:
+            obs: An observation received from the GameServer.
+            buffer: An optional `ObservationBuffer` to write the observation
+                into instead of allocating a new one.
+        """
+        observation = obs["observation"]
+        units = champ_unit_matrix(observation["champ_units"],
+                                   out=buffer.units if buffer else None)
+
+        # Order the units as me, allies then enemies
+        is_me = np.zeros(len(units), dtype=bool)
+        is_me[_me_index(units)] = True
+        my_team = units[is_me, ChampUnit.my_team]
+        is_ally = (units[:, ChampUnit.my_team] == my_team) & ~is_me
+        rank = np.where(is_me, 0, np.where(is_ally, 1, 2))
+        order = np.argsort(rank, kind="stable")
+        num_allies = int(np.count_nonzero(is_ally))
+        num_enemies = len(units) - num_allies - 1
 
         # Observation output
-        out = named_array.NamedDict({
-            "my_id": float(me_id),
-            "game_time": float(obs["observation"]["game_time"]),
-            "me_unit": champ_units[0 if me_id == 1 else 1],
-            "enemy_unit": champ_units[0 if enemy_id == 1 else 1]
-        })
+        if buffer is None:
+            out = _observation_views(np.empty_like(units), num_allies, num_enemies)
+        else:
+            out = buffer.next(num_allies, num_enemies)
+        np.take(units, order, axis=0, out=out.champ_units)
+        out["my_id"] = float(out.champ_units[0, ChampUnit.user_id])
+        out["game_time"] = float(observation["game_time"])
 
         # Print original observation
         # print("transform_obs().obs:", obs)
 
         # Set available actions
-        out["available_actions"] = np.array(
-          self.available_actions(obs["observation"]), dtype=np.int32)
+        action_mask = self.action_mask(
+            observation, out=buffer.action_mask() if buffer else None)
+        available_actions = np.flatnonzero(action_mask.any(axis=1))
+        if buffer is None:
+            out["available_actions"] = available_actions.astype(np.int32)
+        else:
+            out["available_actions"] = buffer.available_actions(available_actions)
+        out["action_mask"] = action_mask
         
         return out
 
+class ObservationBuffer(object):
+    """A ring of preallocated observations for `Features.transform_obs` to fill.
+
+    Each call to `transform_obs` with a buffer overwrites the oldest observation
+    in the ring, so with the default size of 2 the previous observation stays
+    valid alongside the current one (e.g. to calculate rewards), but anything
+    older is reused. Copy observations which need to be kept for longer.
+    """
+
+    def __init__(self, num_champ_units, size=2):
+        """Initializer.
+
+        Args:
+            num_champ_units: Number of champions in the game, i.e. players.
+            size: Number of observations in the ring.
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1, got: %s" % size)
+
+        self._units = np.empty((num_champ_units, len(ChampUnit)), dtype=np.float32)
+        self._champ_units = [np.empty_like(self._units) for _ in range(size)]
+        self._available_actions = [np.empty(len(actions.FUNCTIONS), dtype=np.int32)
+                                   for _ in range(size)]
+        self._action_masks = [np.empty(ACTION_MASK_SHAPE, dtype=bool)
+                              for _ in range(size)]
+        self._obs = [None] * size
+        self._teams = [None] * size
+        self._index = -1
+
+    @property
+    def units(self):
+        """Scratch space for the received champion units, before reordering."""
+        return self._units
+
+    def next(self, num_allies, num_enemies):
+        """Move to the next observation in the ring and return it."""
+        self._index = (self._index + 1) % len(self._obs)
+        i = self._index
+        if self._teams[i] != (num_allies, num_enemies):
+            self._obs[i] = _observation_views(
+                self._champ_units[i], num_allies, num_enemies)
+            self._teams[i] = (num_allies, num_enemies)
+        return self._obs[i]
+
+    def available_actions(self, function_ids):
+        """Copy `function_ids` into the current observation's preallocated array."""
+        available_actions = self._available_actions[self._index]
+        available_actions[:len(function_ids)] = function_ids
+        return available_actions[:len(function_ids)]
+
+    def action_mask(self):
+        """The current observation's preallocated action mask."""
+        return self._action_masks[self._index]
+
+class ActionValidator(object):
+    """Validates whole batches of actions, e.g. the outputs of a policy for
+    every agent of every environment, in one vectorised pass.
+
+    Actions are given as an array of function ids and an array of the
+    flattened values of their arguments, laid out like the rows of
+    `shared_buffers.encode_actions` without the function id. Values past the
+    arguments of a function are ignored.
+    """
+
+    def __init__(self, valid_actions):
+        """Precompute the bounds of every value of every function.
+
+        Args:
+            valid_actions: The `ValidActions` from `Features.action_spec`.
+        """
+        functions = list(valid_actions.functions)
+        self._width = max(sum(len(t.sizes) for t in f.args) for f in functions)
+        shape = (len(functions), self._width)
+        self._used = np.zeros(shape, dtype=bool)
+        self._upper = np.zeros(shape)
+        self._whole = np.zeros(shape, dtype=bool)
+        for f in functions:
+            pos = 0
+            for t in f.args:
+                n = len(t.sizes)
+                self._used[f.id, pos:pos + n] = True
+                self._upper[f.id, pos:pos + n] = t.sizes
+                # Enum values index their options.
+                self._whole[f.id, pos:pos + n] = actions.TYPES[t.id].values is not None
+                pos += n
+
+    @property
+    def width(self):
+        """The number of argument values of the function with the most."""
+        return self._width
+
+    def validate(self, function_ids, arguments):
+        """Validate every action.
+
+        Args:
+            function_ids: An array of function ids of any shape, e.g.
+                (num_envs, num_agents).
+            arguments: An array of argument values shaped like `function_ids`
+                plus a trailing dimension of `width`.
+
+        Returns:
+            A bool array shaped like `function_ids` of which actions are valid,
+            and an int array of the `ActionError` of each action.
+        """
+        function_ids = np.asarray(function_ids)
+        arguments = np.asarray(arguments, dtype=np.float64)
+        if arguments.shape != function_ids.shape + (self._width,):
+            raise ValueError("Expected arguments of shape %s, got: %s" % (
+                function_ids.shape + (self._width,), arguments.shape))
+
+        known = ((function_ids >= 0) & (function_ids < len(self._used)) &
+                 (function_ids == np.floor(function_ids)))
+        ids = np.where(known, function_ids, 0).astype(np.intp)
+        # NaNs compare false, so they are out of range too.
+        ok = ((arguments >= 0) & (arguments < self._upper[ids]) &
+              (~self._whole[ids] | (arguments == np.floor(arguments))))
+        in_range = np.all(ok | ~self._used[ids], axis=-1)
+
+        errors = np.where(known,
+                          np.where(in_range, ActionError.none,
+                                   ActionError.out_of_range),
+                          ActionError.invalid_function).astype(np.int32)
+        return errors == ActionError.none, errors
+
+def _observation_views(champ_units, num_allies, num_enemies):
+    """An observation with views into the ordered `champ_units` matrix."""
+    champ_units = named_array.NamedNumpyArray(
+        champ_units, [_unit_names(num_allies, num_enemies), ChampUnit], copy=False)
+    enemies_start = len(champ_units) - num_enemies
+    return named_array.NamedDict({
+        "my_id": 0.0,
+        "game_time": 0.0,
+        "champ_units": champ_units,
+        "me_unit": champ_units[0],
+        "ally_units": champ_units[1:enemies_start],
+        "enemy_units": champ_units[enemies_start:],
+        "enemy_unit": champ_units[min(enemies_start, len(champ_units) - 1)]
+    })
+
+# Columns of `ChampUnit` which are copied straight from the JSON champion units,
+# the position is nested so it is handled separately.
+_JSON_KEYS = [c.name for c in ChampUnit
+              if c not in (ChampUnit.position_x, ChampUnit.position_y)]
+_JSON_COLUMNS = np.array([ChampUnit[k] for k in _JSON_KEYS], dtype=np.intp)
+_JSON_GETTER = operator.itemgetter(*_JSON_KEYS)
+_POSITION_COLUMNS = np.array([ChampUnit.position_x, ChampUnit.position_y],
+                             dtype=np.intp)
+
+def champ_unit_matrix(champ_units, out=None):
+    """Convert the received champion units to a (num_units, len(ChampUnit)) array.
+
+    Binary champion units are returned as is, JSON ones are written into `out`
+    if it is given. This is also how the fake GameServer builds the champion
+    units of its binary observations.
+    """
+    if isinstance(champ_units, np.ndarray):
+        return champ_units
+
+    if out is None:
+        out = np.empty((len(champ_units), len(ChampUnit)), dtype=np.float32)
+    elif len(out) != len(champ_units):
+        raise ValueError("Expected %s champion units, got: %s" % (
+            len(out), len(champ_units)))
+    for i, champ_unit in enumerate(champ_units):
+        out[i, _JSON_COLUMNS] = _JSON_GETTER(champ_unit)
+        position = champ_unit["position"]
+        out[i, _POSITION_COLUMNS] = position["X"], position["Y"]
+    return out
+
+_UNIT_NAMES = {}
+
+def _unit_names(num_allies, num_enemies):
+    """Row names for `champ_units` given the size of each team."""
+    key = (num_allies, num_enemies)
+    if key not in _UNIT_NAMES:
+        _UNIT_NAMES[key] = (["me"] +
+                            ["ally_%s" % i for i in range(num_allies)] +
+                            ["enemy_%s" % i for i in range(num_enemies)])
+    return _UNIT_NAMES[key]
+
 def _init_valid_functions(action_dimensions):
     """Initialize ValidFunctions and set up the callbacks."""
     sizes = {
@@ -413,11 +651,47 @@ def _init_valid_functions(action_dimensions):
     
     return actions.ValidActions(types, functions)
     
-def features_from_game_info(agent_interface_format=None):
+def _init_action_encoders(valid_functions):
+    """Compile the encoder, argument lengths and flattened bounds of every
+    function, so `encode_action` doesn't need to look them up. The bounds are
+    the upper bound of each value and whether it must be whole, as enum
+    values index their options, like `ActionValidator`."""
+    move_range = valid_functions.types.move_range.sizes
+    encoders = {}
+    for f, valid in zip(actions.FUNCTIONS, valid_functions.functions):
+        encoders[f.id] = (
+            functools.partial(common.ENCODERS[f.function_type.__name__],
+                              move_range=move_range),
+            tuple(len(t.sizes) for t in valid.args),
+            tuple((s, actions.TYPES[t.id].values is not None)
+                  for t in valid.args for s in t.sizes))
+    return encoders
+
+def _user_id(obs):
+    """The user_id of the champion which made an observation, if any."""
+    champ_units = obs["champ_units"]
+    if isinstance(champ_units, np.ndarray):
+        me = np.flatnonzero(champ_units[:, ChampUnit.distance_to_me] == 0.0)
+        if len(me):
+            return int(champ_units[me[0], ChampUnit.user_id])
+        return None
+    for champ_unit in champ_units:
+        if champ_unit["distance_to_me"] == 0.0:
+            return champ_unit["user_id"]
+    return None
+
+def _me_index(units):
+    """The row of the observing champion in a champion unit matrix, the first
+    unit at distance 0, or the first unit if none are."""
+    me = np.flatnonzero(units[:, ChampUnit.distance_to_me] == 0.0)
+    return int(me[0]) if len(me) else 0
+
+def features_from_game_info(agent_interface_format=None, num_champ_units=2):
     """Construct a Features object using data extracted from game info.
 
     Returns:
         A features object.
     """
 
-    return Features(agent_interface_format=agent_interface_format)
\ No newline at end of file
+    return Features(agent_interface_format=agent_interface_format,
+                    num_champ_units=num_champ_units)
\ No newline at end of file
@@ -43,7 +43,8 @@ class LoLProcess(object):
     """
 
     def __init__(self, run_config, exec_path, timeout_seconds=20, full_screen=False,
-                 host=None, port=None, window_size=(640, 480), **kwargs):
+                 host=None, port=None, window_size=(640, 480), async_controller=False,
+                 **kwargs):
         """Launch the League of Legends process.
 
         Args:
@@ -54,6 +55,8 @@ class LoLProcess(object):
             port: Port GameServer should listen on for clients.
             timeout_seconds: Timeout for the GameServer to start before we give up.
             window_size: Screen size if not full screen.
+            async_controller: Whether `controller` should be an
+                `AsyncRemoteController`, whose calls are asyncio coroutines.
         """
 
         self._proc = None
@@ -63,15 +66,14 @@ class LoLProcess(object):
         self.port = port or "5119"
         self._run_config = run_config
 
-        print("kwargs process:", kwargs)
+        logging.debug("LoLProcess kwargs: %s", kwargs)
 
         human_count = 1 if kwargs["human_observer"] else 0
         agent_count = len(kwargs["players"]) - human_count
         multiplier = 7.5 if "multiplier" not in kwargs else kwargs["multiplier"]
         step_multiplier = 1 if "step_multiplier" not in kwargs else kwargs["step_multiplier"]
         replay_path = "" if "replay_path" not in kwargs else kwargs["replay_path"]
-        args = [
-            exec_path,
+        args = run_config.exec_command(exec_path) + [
             "--host", self.host,
             "--port", str(kwargs["client_port"]),
             "--redis_port", str(kwargs["redis_port"]),
@@ -81,11 +83,23 @@ class LoLProcess(object):
             "--step_multiplier", str(step_multiplier),
             "--replay_path", str(replay_path)
         ]
+        if kwargs.get("redis_key_prefix"):
+            # Only GameServers which support sharing redis-server take this.
+            args += ["--redis_key_prefix", kwargs["redis_key_prefix"]]
+        if kwargs.get("redis_unix_socket"):
+            # Likewise for connecting to redis-server over a Unix socket.
+            args += ["--redis_unix_socket", kwargs["redis_unix_socket"]]
 
         kwargs["multiplier"] = multiplier
         
         try:
-            self.controller = remote_controller.RemoteController(
+            controller_cls = (remote_controller.AsyncRemoteController
+                              if async_controller else
+                              remote_controller.RemoteController)
+            # Start redis-server and the GameServer side by side rather than
+            # waiting for one before the other, `controller.connect` then
+            # probes them both. The GameServer retries connecting to Redis.
+            self.controller = controller_cls(
                 None, self.host, None, timeout_seconds=timeout_seconds, proc=self, kwargs=kwargs)
             self._proc = self.launch(run_config, args, **kwargs)
         except:
@@ -130,6 +144,11 @@ class LoLProcess(object):
             logging.info("Shutdown with return code: %s", ret)
             self._proc = None
     
+    @property
+    def exit_code(self):
+        """The exit code of the GameServer, None while it is running."""
+        return self._proc.poll() if self._proc else None
+
     def check_exists(self, exec_path):
         if not os.path.isfile(exec_path):
             raise RuntimeError("Trying to run: '%s', but it doesn't exist " % exec_path)
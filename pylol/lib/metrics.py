@@ -0,0 +1,285 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Counters and timings recorded from the hot path of stepping an environment.
+
+`LoLEnv` and `RemoteController` report what they do to a `Collector`:
+
+    Timers: step, transform_action, send_actions, observe, brpop, decode,
+        transform_obs and calc_reward.
+    Counters: steps, episodes, actions_sent, observations, redis_round_trips
+        and bytes_received.
+    Startup: startup_redis_ready, startup_clients_join and
+        startup_game_started, the seconds from launching the game until
+        `RemoteController.connect` reached each state.
+
+The default collector, `NO_OP`, throws everything away. Pass an
+`InMemoryCollector` as the `metrics_collector` of a `LoLEnv` to keep running
+totals, and export them periodically with a `LogExporter` or a
+`PrometheusExporter`, or a `SampleCollector` to also keep every timing for
+percentiles, e.g. for benchmarks:
+
+    collector = metrics.InMemoryCollector()
+    exporter = metrics.PrometheusExporter(collector, "/var/lib/node/pylol.prom")
+    exporter.start(interval_secs=15)
+    env = lol_env.LoLEnv(..., metrics_collector=collector)
+"""
+
+import collections
+import os
+import threading
+import time
+
+from absl import logging
+import numpy as np
+
+class _NoOpTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        pass
+
+_NO_OP_TIMER = _NoOpTimer()
+
+class _Timer(object):
+    __slots__ = ("_collector", "_name", "_start")
+
+    def __init__(self, collector, name):
+        self._collector = collector
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self._collector.add_time(self._name, time.perf_counter() - self._start)
+
+class Collector(object):
+    """Records counters and timings. This base class ignores them all."""
+
+    def timer(self, name):
+        """A context manager which times its block as `name`."""
+        return _NO_OP_TIMER
+
+    def add_time(self, name, seconds):
+        pass
+
+    def inc(self, name, value=1):
+        pass
+
+    def snapshot(self):
+        """The counters and timers recorded so far.
+
+        Returns:
+            A dict with "counters", a dict of name to count, and "timers", a
+            dict of name to a dict of the count, sum and max seconds.
+        """
+        return {"counters": {}, "timers": {}}
+
+NO_OP = Collector()
+
+def merge_snapshots(snapshots):
+    """Sum the snapshots of several collectors, e.g. one per process."""
+    counters = collections.defaultdict(int)
+    timers = {}
+    for snapshot in snapshots:
+        for name, count in snapshot["counters"].items():
+            counters[name] += count
+        for name, stat in snapshot["timers"].items():
+            total = timers.get(name)
+            if total is None:
+                timers[name] = dict(stat)
+            else:
+                total["count"] += stat["count"]
+                total["sum"] += stat["sum"]
+                total["max"] = max(total["max"], stat["max"])
+    return {"counters": dict(counters), "timers": timers}
+
+class InMemoryCollector(Collector):
+    """Keeps running totals of every counter and timer."""
+
+    def __init__(self):
+        self._counters = collections.defaultdict(int)
+        self._timers = {}
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        stat = self._timers.get(name)
+        if stat is None:
+            self._timers[name] = [1, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            if seconds > stat[2]:
+                stat[2] = seconds
+
+    def inc(self, name, value=1):
+        self._counters[name] += value
+
+    def snapshot(self):
+        return {
+            "counters": dict(self._counters),
+            "timers": {name: {"count": s[0], "sum": s[1], "max": s[2]}
+                       for name, s in list(self._timers.items())},
+        }
+
+    def reset(self):
+        self._counters = collections.defaultdict(int)
+        self._timers = {}
+
+class SampleCollector(InMemoryCollector):
+    """Also keeps every timing, to summarise them with percentiles."""
+
+    def __init__(self):
+        super(SampleCollector, self).__init__()
+        self._samples = collections.defaultdict(list)
+
+    def add_time(self, name, seconds):
+        super(SampleCollector, self).add_time(name, seconds)
+        self._samples[name].append(seconds)
+
+    @property
+    def samples(self):
+        """A dict of the name of each timer to a list of its times in seconds."""
+        return self._samples
+
+    def stats(self):
+        """Summarise the times of each timer, in milliseconds."""
+        stats = {}
+        for name, times in self._samples.items():
+            ms = np.array(times) * 1000
+            stats[name] = {
+                "num": len(ms),
+                "sum": float(ms.sum()),
+                "mean": float(ms.mean()),
+                "min": float(ms.min()),
+                "p50": float(np.percentile(ms, 50)),
+                "p99": float(np.percentile(ms, 99)),
+                "max": float(ms.max()),
+            }
+        return stats
+
+    def reset(self):
+        super(SampleCollector, self).reset()
+        self._samples = collections.defaultdict(list)
+
+class Exporter(object):
+    """Exports the snapshot of a collector, either on demand or periodically
+    from a background thread."""
+
+    def __init__(self, collector):
+        self._collector = collector
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def export(self):
+        raise NotImplementedError()
+
+    def start(self, interval_secs=60):
+        """Export every `interval_secs` from a daemon thread until `stop`."""
+        def run():
+            while not self._stopped.wait(interval_secs):
+                try:
+                    self.export()
+                except Exception:  # Keep exporting, even if one export fails.
+                    logging.exception("Failed to export metrics.")
+        self._stopped.clear()
+        self._thread = threading.Thread(target=run, name="metrics_exporter",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop exporting, exporting one last time."""
+        if self._thread:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+            self.export()
+
+class LogExporter(Exporter):
+    """Logs the rates of the counters and the mean of the timers since the
+    last export."""
+
+    def __init__(self, collector):
+        super(LogExporter, self).__init__(collector)
+        self._last = collector.snapshot()
+        self._last_time = time.time()
+
+    def export(self):
+        snapshot = self._collector.snapshot()
+        now = time.time()
+        elapsed = max(now - self._last_time, 1e-9)
+
+        lines = []
+        for name, count in sorted(snapshot["counters"].items()):
+            delta = count - self._last["counters"].get(name, 0)
+            lines.append("%s: %d (%.1f/sec)" % (name, count, delta / elapsed))
+        for name, stat in sorted(snapshot["timers"].items()):
+            last = self._last["timers"].get(name, {"count": 0, "sum": 0.0})
+            count = stat["count"] - last["count"]
+            mean = (stat["sum"] - last["sum"]) / count if count else 0.0
+            lines.append("%s: %.3fms mean over %d" % (name, mean * 1000, count))
+        logging.info("Metrics:\n  %s", "\n  ".join(lines))
+
+        self._last, self._last_time = snapshot, now
+
+class PrometheusExporter(Exporter):
+    """Writes the snapshot to a file in the Prometheus text format, e.g. for
+    the textfile collector of the node exporter.
+
+    Counters are written as `<prefix>_<name>_total` and timers as summaries,
+    `<prefix>_<name>_seconds_count` and `<prefix>_<name>_seconds_sum`.
+    """
+
+    def __init__(self, collector, path, prefix="pylol", labels=None):
+        super(PrometheusExporter, self).__init__(collector)
+        self._path = path
+        self._prefix = prefix
+        labels = labels or {}
+        self._labels = ("{%s}" % ",".join(
+            '%s="%s"' % kv for kv in sorted(labels.items())) if labels else "")
+
+    def text(self):
+        snapshot = self._collector.snapshot()
+        lines = []
+        for name, count in sorted(snapshot["counters"].items()):
+            metric = "%s_%s_total" % (self._prefix, name)
+            lines.append("# TYPE %s counter" % metric)
+            lines.append("%s%s %s" % (metric, self._labels, count))
+        for name, stat in sorted(snapshot["timers"].items()):
+            metric = "%s_%s_seconds" % (self._prefix, name)
+            lines.append("# TYPE %s summary" % metric)
+            lines.append("%s_count%s %s" % (metric, self._labels, stat["count"]))
+            lines.append("%s_sum%s %r" % (metric, self._labels, stat["sum"]))
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        # Write then rename, so the file is never read half written.
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.text())
+        os.replace(tmp_path, self._path)
@@ -38,9 +38,9 @@ def is_port_free(port: int) -> bool:
         except (socket.error, OSError):
             return False
 
-def pick_unused_port() -> Optional[int]:
-    """Find and return a single unused port."""
-    for port in range(1024, 65535):
+def pick_unused_port(start: int = 1024) -> Optional[int]:
+    """Find and return a single unused port, starting the search at `start`."""
+    for port in range(start, 65535):
         if port not in _contiguous_ports and is_port_free(port):
             return port
     return None
@@ -77,13 +77,17 @@ def pick_contiguous_unused_ports(num_ports: int, retry_interval_secs: float = 1,
 
     for _ in range(retry_attempts):
         start_port = pick_unused_port()
-        if start_port is not None:
+        while start_port is not None:
             ports = [start_port + p for p in range(num_ports)]
             
             # Verify all ports in range are actually free
-            if all(is_port_free(p) for p in ports[1:]):
-                _contiguous_ports.update(ports[1:])
+            if all(p not in _contiguous_ports and is_port_free(p)
+                   for p in ports[1:]):
+                _contiguous_ports.update(ports)
                 return ports
+
+            # Otherwise try the ranges after it
+            start_port = pick_unused_port(start_port + 1)
                 
         time.sleep(retry_interval_secs)
 
@@ -0,0 +1,134 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Run redis-server and share it, and its connections, between games.
+
+By default every `RemoteController` starts its own redis-server. To run many
+games on one host, start a `RedisServer` once and pass its port to each
+`LoLEnv` as `shared_redis_port`. Each game then uses its own namespaced keys,
+see `keys`, and every controller in a process shares one connection pool per
+server, see `connection_pool`.
+
+On a single host redis-server can listen on a Unix domain socket instead of
+TCP, which is quicker per round trip and doesn't need a port, see
+`unix_socket_path`.
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+
+from absl import logging
+import redis
+
+# The lists the GameServer and pylol talk over.
+KEYS = ("action", "observation", "command", "command_data")
+
+# `save_replay` asks for the replay in chunks of up to `REPLAY_CHUNK_SIZE`
+# characters. A GameServer which supports it answers with `REPLAY_CHUNKED`,
+# then the chunks, then an empty chunk. Otherwise it answers with the whole
+# replay.
+REPLAY_CHUNK_SIZE = 1 << 20
+REPLAY_CHUNKED = '{"chunked": true}'
+
+def keys(prefix=""):
+    """The name of each of `KEYS` for a game whose keys start with `prefix`."""
+    return {key: prefix + key for key in KEYS}
+
+def key_prefix(client_port):
+    """The key prefix of the game whose GameServer listens on `client_port`,
+    which is unique per host."""
+    return "pylol:%s:" % client_port
+
+def unix_socket_path(name):
+    """A path in the temp directory for the Unix socket of a redis-server."""
+    return os.path.join(tempfile.gettempdir(), "pylol-redis-%s.sock" % name)
+
+def new_connection_pool(host, port, unix_socket=None):
+    """A connection pool for a redis-server, over `unix_socket` if given."""
+    if unix_socket:
+        return redis.ConnectionPool(
+            connection_class=redis.UnixDomainSocketConnection,
+            path=unix_socket, db=0)
+    return redis.ConnectionPool(host=host, port=port, db=0)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def connection_pool(host, port, unix_socket=None):
+    """The connection pool for a redis-server, shared within this process."""
+    with _pools_lock:
+        pool = _pools.get((host, port, unix_socket))
+        if pool is None:
+            pool = _pools[(host, port, unix_socket)] = new_connection_pool(
+                host, port, unix_socket)
+        return pool
+
+class RedisServer(object):
+    """A redis-server subprocess, killed on `close`."""
+
+    def __init__(self, host, port, unix_socket=None):
+        """Start redis-server.
+
+        Args:
+            host: IP to bind to.
+            port: Port to listen on, unused with `unix_socket`.
+            unix_socket: Path of a Unix domain socket to listen on instead of
+                TCP.
+
+        Raises:
+            OSError: redis-server couldn't be started, e.g. it isn't installed.
+        """
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self._proc = None
+        if unix_socket:
+            args = ["redis-server",
+                    "--port", "0",
+                    "--unixsocket", unix_socket,
+                    "--unixsocketperm", "700"]
+        else:
+            args = ["redis-server",
+                    "--bind", str(host),
+                    "--port", str(port)]
+        logging.info("Starting redis-server: %s", args)
+        self._proc = subprocess.Popen(args)
+
+    def close(self):
+        if self._proc:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+            if self.unix_socket and os.path.exists(self.unix_socket):
+                # redis-server only removes it when shut down cleanly.
+                os.remove(self.unix_socket)
+        with _pools_lock:
+            pool = _pools.pop((self.host, self.port, self.unix_socket), None)
+        if pool:
+            pool.disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
@@ -23,17 +23,29 @@
 
 import sys
 import platform
+import time
 
 from absl import logging
 from absl import flags
 # from pylol.lib import protocol
 
 import redis
+import redis.asyncio
 import json
 import subprocess
 from subprocess import SubprocessError
 
+import asyncio
+import contextlib
+import enum
 import math
+import numpy as np
+
+from pylol.lib import binary_obs
+from pylol.lib import common
+from pylol.lib import features
+from pylol.lib import metrics
+from pylol.lib import redis_server
 
 flags.DEFINE_bool("lol_log_actions", False, "Print all actions sent to GameServer.")
 flags.DEFINE_integer("lol_timeout", 60, "Timeout to connect and wait for RPC responses.")
@@ -42,11 +54,25 @@ FLAGS = flags.FLAGS
 class ConnectError(Exception):
     pass
 
+class ObservationTimeoutError(Exception):
+    pass
+
 class RequestError(Exception):
     def __init__(self, desc, res):
         super(RequestError, self).__init__(desc)
         self.res = res
 
+class StartupState(enum.IntEnum):
+    """How far the game has got with starting up, see `RemoteController.connect`."""
+    launched        = 0  # redis-server and the GameServer were started.
+    redis_ready     = 1  # redis-server answers PING.
+    clients_join    = 2  # The GameServer can take clients.
+    game_started    = 3  # The game started, so agents can connect.
+
+# Bounds of the exponential backoff between PINGs while redis-server starts.
+_PING_BACKOFF_START = 0.001
+_PING_BACKOFF_MAX = 0.1
+
 class RemoteController(object):
     """Implements a python interface to interact with the GameServer binary.
 
@@ -54,119 +80,251 @@ class RemoteController(object):
 
     All of these are implemented as blocking calls, so wait for the response
     before returning.
+
+    The controller starts its own redis-server, unless `kwargs["shared_redis"]`
+    is set, in which case it connects to one already running on
+    `kwargs["redis_port"]` and uses the keys prefixed with
+    `kwargs["redis_key_prefix"]`, see `lib/redis_server.py`. Redis is talked to
+    over the Unix domain socket `kwargs["redis_unix_socket"]` if it is set,
+    otherwise over TCP.
     """
 
-    def __init__(self, settings, host, port, timeout_seconds, proc=None, kwargs=[]):
+    def __init__(self, settings, host, port, timeout_seconds, proc=None, kwargs=[],
+                 redis_client=None):
+        """Connect to Redis, starting redis-server unless it is shared.
+
+        Args:
+            redis_client: An optional client to talk to the GameServer through
+                instead of connecting, e.g. a fake for tests, in which case no
+                redis-server is started either.
+        """
         self._kwargs = kwargs
+        self._lol_proc = proc
+        self.state = StartupState.launched
+        self.startup_times = {}
+        self._launch_time = time.perf_counter()
 
         timeout_seconds = timeout_seconds # or FLAGS.lol_timeout
         host = host or "192.168.0.16"
         port = port or 6379
         self.host = host
         self.port = port
-        print("CONNECTING TO REDIS ON:", host, self._kwargs["redis_port"])
-        self.pool = redis.ConnectionPool(host=host, port=self._kwargs["redis_port"], db=0)
-        self.r = redis.Redis(connection_pool=self.pool)
+        self._shared_redis = self._kwargs.get("shared_redis", False)
+        self._unix_socket = self._kwargs.get("redis_unix_socket")
+        if redis_client is not None:
+            self.pool = None
+            self.r = redis_client
+        else:
+            logging.info("Connecting to Redis on: %s %s", host, self._kwargs["redis_port"])
+            if self._shared_redis:
+                self.pool = redis_server.connection_pool(
+                    host, self._kwargs["redis_port"], self._unix_socket)
+            else:
+                self.pool = redis_server.new_connection_pool(
+                    host, self._kwargs["redis_port"], self._unix_socket)
+            self.r = redis.Redis(connection_pool=self.pool)
+        self._keys = redis_server.keys(self._kwargs.get("redis_key_prefix", ""))
         self.timeout = timeout_seconds
         self.settings = settings
         self._last_obs = None
         self._client = None
+        self._action_batch = None
+        self._batched_ticks = None
+        self.metrics = metrics.NO_OP
         
         self._kwargs["client_port"] = self._kwargs["client_port"] if "client_port" in kwargs \
                                       else "5119"
 
-        print("REDIS PORT:", self._kwargs["redis_port"])
-
-        try:
-            arr = ["redis-server",
-                "--bind", str(host),
-                "--port", str(self._kwargs["redis_port"])]
-            print("REDIS ARGS:", arr)
-            self._proc = subprocess.Popen(arr)
-        except SubprocessError as e:
-            print("Could not open redis. Error message: '%s'" % e)
+        if self._shared_redis or redis_client is not None:
+            self._redis_server = None
+        else:
+            self._redis_server = redis_server.RedisServer(
+                host, self._kwargs["redis_port"], self._unix_socket)
     
     def close(self):
         """Kill the redis process when the controller is done."""
-        self._proc.kill()
+        if self._redis_server:
+            self._redis_server.close()
+        elif self.r is not None:
+            # Leave the shared server, but clear this game's lists.
+            try:
+                self.r.delete(*self._keys.values())
+            except redis.RedisError:
+                pass
         # self._client.kill() doesn't kill the associated league client
     
     def connect(self):
-        """Waits until clients can join the GameServer then waits until agents can connect."""
+        """Waits until clients can join the GameServer then waits until agents can connect.
+
+        Steps through each `StartupState`, recording how long after launching
+        it was reached in `startup_times` and as the `startup_<state>` timers.
+        Fails as soon as the GameServer exits instead of waiting out the
+        timeouts. Connecting again, e.g. after a timeout, resumes from the
+        state reached so far, and does nothing once the game started.
+        """
+        if self.state == StartupState.game_started:
+            return
+
+        self._wait_for_redis()
 
         # Wait until clients can join
-        json_txt = self.r.brpop("observation", self.timeout) # Shouldn't be longer than this, will check though
-        if json_txt == None:
-            print("`clients_join` == NONE")
-            raise ConnectionError("Couldn't get `clients_join` message from GameServer")
-        else:
-            command = json.loads(json_txt[1].decode("utf-8"))
-            if command == "clients_join":
-                print("`clients_join` == START CLIENT:", command)
-                if self._kwargs["human_observer"]:
-                    print("STARTING LOL ON:", self.host, self._kwargs["client_port"])
-                    self._client = start_client(
-                        host=self.host,
-                        port=self._kwargs["client_port"],
-                        client_dir=self._kwargs["client_dir"])
-                else:
-                    self._client = None
-            else:
-                print("`clients_join` == WRONG MESSAGE:", command)
-                raise ConnectionError("Couldn't get `clients_join` message from GameServer")
+        if self.state < StartupState.clients_join:
+            self._clients_join(self._wait_for_message(self.timeout))
+            self._advance(StartupState.clients_join)
         
         # Wait until agents can connect (dependend on how long client takes to load, timing issue...)
-        json_txt = self.r.brpop("observation", 60)
-        if json_txt == None:
-            print("`game_started` == NONE")
-            raise ConnectionError("Couldn't get `game_started` message from GameServer")
-        else:
-            command = json.loads(json_txt[1].decode("utf-8"))
-            if command == "game_started":
-                print("`game_started` == START CLIENT:", command)
-                print("Running AI agents")
-            else:
-                print("`game_started` == WRONG MESSAGE:", command)
-                raise ConnectionError("Couldn't get `game_started` message from GameServer")
+        self._game_started(self._wait_for_message(60))
+        self._advance(StartupState.game_started)
         
         # Reset pipes after connecting
-        self.r.delete("action") # Reset action pipe
+        self.r.delete(self._keys["action"]) # Reset action pipe
+
+    def _advance(self, state):
+        """Move on to `state`, recording the time since launching."""
+        elapsed = time.perf_counter() - self._launch_time
+        self.startup_times[state.name] = elapsed
+        self.metrics.add_time("startup_" + state.name, elapsed)
+        self.state = state
+        logging.info("Reached %s after %.3f seconds.", state.name, elapsed)
+
+    def _wait_for_redis(self):
+        """Wait for redis-server to accept connections, PINGing it with
+        exponential backoff."""
+        if self.state >= StartupState.redis_ready:
+            return
+        deadline = time.time() + self.timeout
+        for delay in _ping_backoff():
+            try:
+                self.r.ping()
+                break
+            except redis.ConnectionError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(delay)
+        self._advance(StartupState.redis_ready)
+
+    def _wait_for_message(self, timeout):
+        """Pop the next startup message from the GameServer, checking every
+        second that it is still running. None if it timed out."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            json_txt = self.r.brpop(self._keys["observation"], 1)
+            if json_txt is not None:
+                return json_txt
+            self._check_game_server()
+        return None
+
+    def _check_game_server(self):
+        if self._lol_proc is not None and self._lol_proc.exit_code is not None:
+            raise ConnectError("GameServer exited with code %s while in state %s" % (
+                self._lol_proc.exit_code, self.state.name))
+
+    def _expect_message(self, json_txt, message):
+        """Check that the GameServer sent `message`."""
+        if json_txt == None:
+            raise ConnectionError("Couldn't get `%s` message from GameServer" % message)
+        command = json.loads(json_txt[1].decode("utf-8"))
+        if command != message:
+            logging.error("Expected `%s` from the GameServer, got: %s", message, command)
+            raise ConnectionError("Couldn't get `%s` message from GameServer" % message)
+        return command
+
+    def _clients_join(self, json_txt):
+        """Start the human observer's client once clients can join."""
+        command = self._expect_message(json_txt, "clients_join")
+        logging.info("GameServer sent: %s", command)
+        if self._kwargs["human_observer"]:
+            logging.info("Starting the League client on: %s %s", self.host,
+                         self._kwargs["client_port"])
+            self._client = start_client(
+                host=self.host,
+                port=self._kwargs["client_port"],
+                client_dir=self._kwargs["client_dir"])
+        else:
+            self._client = None
+
+    def _game_started(self, json_txt):
+        command = self._expect_message(json_txt, "game_started")
+        logging.info("GameServer sent: %s, running AI agents", command)
         
+    def _push(self, key, *values):
+        """Push `values` onto a GameServer list, buffering actions while batching."""
+        if key == "action" and self._action_batch is not None:
+            self._action_batch.extend(values)
+        else:
+            self.r.lpush(self._keys[key], *values)
+            self.metrics.inc("redis_round_trips")
+            if key == "action":
+                self.metrics.inc("actions_sent", len(values) // 2)
+
+    @contextlib.contextmanager
+    def batch_actions(self):
+        """Collect every action sent within the block and flush them at the end.
+
+        The buffered type/payload pairs are sent with a single multi-value
+        `lpush`, which inserts them in exactly the same order as pushing them
+        one at a time, so the GameServer sees no difference apart from one
+        round trip per batch instead of two per action. Nested batches are
+        flushed by the outermost one.
+        """
+        if self._action_batch is not None:
+            yield
+            return
+        self._action_batch = []
+        try:
+            yield
+            if self._action_batch:
+                self.r.lpush(self._keys["action"], *self._action_batch)
+                self.metrics.inc("redis_round_trips")
+                self.metrics.inc("actions_sent", len(self._action_batch) // 2)
+        finally:
+            self._action_batch = None
+
     def send_raw_action(self, action):
         # print("action data:", action)
 
         action_type = action["action_type"]
         action_data = action["action_data"]
 
-        self.r.lpush("action", action_type)
-        self.r.lpush("action", action_data)
+        self._push("action", action_type, action_data)
 
     # Check if someone died for this observation
     def someone_died(self, observation):
         champ_units = observation["champ_units"]
+        if isinstance(champ_units, np.ndarray):
+            return bool((champ_units[:, features.ChampUnit.alive] == 0.0).any())
         for champ_unit in champ_units:
             if champ_unit["alive"] == 0.0:
                 return True
         return False
 
-    def observe(self):
-        """Get a current observation."""
-
-        # Start observing if we haven't already.
+    def _start_observing(self):
+        """Start observing if we haven't already."""
         if self._last_obs == None:
-            self.r.delete("observation") # Reset observation pipe
-            self.r.delete("command")
-            self.r.lpush("command", "start_observing") # Start observing
+            self.r.delete(self._keys["observation"]) # Reset observation pipe
+            self.r.delete(self._keys["command"])
+            if self._kwargs.get("binary_observations", False):
+                self._push("command", "observation_format",
+                           json.dumps({"format": "binary"}))
+            self.r.lpush(self._keys["command"], "start_observing") # Start observing
 
             # self.players_reset()
 
+    def observe(self):
+        """Get a current observation."""
+        self._start_observing()
+
         # Get the observation
-        json_txt = self.r.brpop("observation", self.timeout)
+        with self.metrics.timer("brpop"):
+            json_txt = self.r.brpop(self._keys["observation"], self.timeout)
+        self._received([json_txt])
         if json_txt == None:
-            print("Error: Observation timed out")
+            logging.warning("Observation timed out")
             return None
         else:
-            obs = json.loads(json_txt[1].decode("utf-8"))
+            with self.metrics.timer("decode"):
+                obs = self._decode_observation(json_txt[1])
+            self.metrics.inc("observations")
             
             # Print first observation for testing...
             # if self._last_obs == None: print("FIRST OBSERVATION:", obs)
@@ -174,6 +332,101 @@ class RemoteController(object):
             self._last_obs = obs
             return obs
     
+    def observe_tick(self, count):
+        """Get the observations of all `count` agents for the next tick.
+
+        GameServers which batch observations send every agent's observation
+        for a tick as one message, either `{"tick": id, "observations": [...]}`
+        or concatenated binary observations. Otherwise the `count` separate
+        observations are popped with a single pipelined round trip. Which one
+        the GameServer does is worked out from the first message.
+
+        Returns:
+            A list of `count` observations.
+
+        Raises:
+            ObservationTimeoutError: The observations didn't arrive within
+                the timeout.
+        """
+        self._start_observing()
+
+        if self._batched_ticks is not False:
+            with self.metrics.timer("brpop"):
+                json_txt = self.r.brpop(self._keys["observation"], self.timeout)
+            self._received([json_txt])
+            if json_txt == None:
+                self._observation_timed_out()
+            with self.metrics.timer("decode"):
+                obs = self._split_tick(json_txt[1])
+            self._batched_ticks = len(obs) > 1 or count == 1
+            if not self._batched_ticks:
+                rest = self._pop_observations(count - 1)
+                obs = None if rest is None else obs + rest
+        else:
+            obs = self._pop_observations(count)
+        return self._finish_tick(obs, count)
+
+    def _finish_tick(self, obs, count):
+        """Check the observations of a tick are complete and keep the last."""
+        if obs is None:
+            self._observation_timed_out()
+        if len(obs) != count:
+            raise ValueError("Expected %s observations for the tick, got: %s" % (
+                count, len(obs)))
+        self.metrics.inc("observations", count)
+        ticks = set(_tick(o) for o in obs)
+        if len(ticks) > 1:
+            logging.warning("Observations are from different ticks: %s", ticks)
+
+        self._last_obs = obs[-1]
+        return obs
+
+    def _observation_timed_out(self):
+        raise ObservationTimeoutError(
+            "No observation from the GameServer within %ss" % self.timeout)
+
+    def _pop_observations(self, count):
+        """Pop `count` observations with one round trip, None if any time out."""
+        pipe = self.r.pipeline(transaction=False)
+        for _ in range(count):
+            pipe.brpop(self._keys["observation"], self.timeout)
+        with self.metrics.timer("brpop"):
+            replies = pipe.execute()
+        self._received(replies)
+        with self.metrics.timer("decode"):
+            return self._join_observations(replies)
+
+    def _received(self, replies):
+        """Record one round trip which received `replies`."""
+        self.metrics.inc("redis_round_trips")
+        self.metrics.inc("bytes_received", sum(
+            len(json_txt[1]) for json_txt in replies if json_txt))
+
+    def _join_observations(self, replies):
+        obs = []
+        for json_txt in replies:
+            if json_txt == None:
+                return None
+            obs.extend(self._split_tick(json_txt[1]))
+        return obs
+
+    def _split_tick(self, data):
+        """Decode a message into the list of observations it contains."""
+        if binary_obs.is_binary(data):
+            return binary_obs.decode_all(data)
+        obs = json.loads(data.decode("utf-8"))
+        if isinstance(obs, dict) and "observations" in obs:
+            for o in obs["observations"]:
+                o.setdefault("tick", obs.get("tick"))
+            return obs["observations"]
+        return [obs]
+
+    def _decode_observation(self, data):
+        """Decode a binary observation, falling back to JSON."""
+        if binary_obs.is_binary(data):
+            return binary_obs.decode(data)
+        return json.loads(data.decode("utf-8"))
+
     def actions(self, req_action):
         """Send an action request, which may include multiple actions."""
         """
@@ -183,42 +436,53 @@ class RemoteController(object):
                 sys.stderr.write(str(action))
         """
         
-        """Actually perform the actions here."""
-        for action in req_action.actions:
-            action = action.props
-            if action["type"] == "no_op":
-                playerId = action["user_id"]
-                self.player_noop()
-            elif action["type"] == "move":
-                playerId = action["user_id"]
-                x = action["move_range"].x - 4
-                y = action["move_range"].y - 4
-                # print("SENDING MOVE COMMAND:", x, y)
-                self.player_move(playerId, x, y)
-            elif action["type"] == "spell":
-                playerId = action["user_id"]
-                spell_slot = action["spell"]
-                x = action["position"].x
-                y = action["position"].y
-                self.player_spell(playerId, 2, spell_slot, x, y)
+        """Actually perform the actions here, sent as one batch per request."""
+        with self.batch_actions():
+            for action in req_action.actions:
+                action = action.props
+                if action["type"] == "no_op":
+                    playerId = action["user_id"]
+                    self.player_noop()
+                elif action["type"] == "move":
+                    playerId = action["user_id"]
+                    centre_x, centre_y = action.get(
+                        "move_centre", common.move_centre(common.MOVE_RANGE))
+                    x = action["move_range"].x - centre_x
+                    y = action["move_range"].y - centre_y
+                    # print("SENDING MOVE COMMAND:", x, y)
+                    self.player_move(playerId, x, y)
+                elif action["type"] == "spell":
+                    playerId = action["user_id"]
+                    spell_slot = action["spell"]
+                    x = action["position"].x
+                    y = action["position"].y
+                    self.player_spell(playerId, 2, spell_slot, x, y)
 
     def act(self, action):
         """Send a single action. This is a shortcut for `actions`."""
         if action:
             return self.actions(action)
+
+    def send_encoded_actions(self, encoded):
+        """Send the (type, payload) pairs from `Features.encode_action` in a
+        single `lpush`."""
+        values = []
+        for pair in encoded:
+            values.extend(pair)
+        if values:
+            self._push("action", *values)
         
     def quit(self):
         """Shut down the redis process."""
+        self.close()
         self.r = None
-        self._proc.kill()
 
     def player_attack(self, player_id, target_player_id):
         action = {
             "player_id": str(player_id),
             "target_player_id": str(target_player_id)
         }
-        self.r.lpush("action", "attack")
-        self.r.lpush("action", json.dumps(action))
+        self._push("action", "attack", json.dumps(action))
         
         return {"type": "attack", "data": action}
 
@@ -227,8 +491,7 @@ class RemoteController(object):
             action = {
                 "msg": str(msg)
             }
-            self.r.lpush("action", "message")
-            self.r.lpush("action", json.dumps(action))
+            self._push("action", "message", json.dumps(action))
             return {"type": "message", "data": action}
 
     def player_spell(self, player_id, target_player_id, spell_slot, x, y):
@@ -239,14 +502,12 @@ class RemoteController(object):
             "x": float(x * 1.0),
             "y": float(y * 1.0)
         }
-        self.r.lpush("action", "spell")
-        self.r.lpush("action", json.dumps(action))
+        self._push("action", "spell", json.dumps(action))
         return {"type": "spell", "data": action}
 
     def players_reset(self):
-        print("RESETTING PLAYERS")
-        self.r.lpush("action", "reset")
-        self.r.lpush("action", "")
+        logging.debug("Resetting players")
+        self._push("action", "reset", "")
 
     def player_move(self, player_id, x, y):
         # print("player_move: ", id, x, y, self.r)
@@ -255,8 +516,7 @@ class RemoteController(object):
             "x": float(x * 100.0),
             "y": float(y * 100.0)
         }
-        self.r.lpush("action", "move")
-        self.r.lpush("action", json.dumps(action))
+        self._push("action", "move", json.dumps(action))
         return {"type": "move", "data": action}
 
     def player_move_to(self, player_id, x, y):
@@ -265,8 +525,7 @@ class RemoteController(object):
             "x": float(x),
             "y": float(y)
         }
-        self.r.lpush("action", "move_to")
-        self.r.lpush("action", json.dumps(action))
+        self._push("action", "move_to", json.dumps(action))
 
     def player_teleport(self, player_id, x, y):
         action = {
@@ -274,13 +533,11 @@ class RemoteController(object):
             "x": float(x),
             "y": float(y)
         }
-        self.r.lpush("action", "teleport")
-        self.r.lpush("action", json.dumps(action))
+        self._push("action", "teleport", json.dumps(action))
 
     def player_noop(self, n=1):
         for i in range(n):
-            self.r.lpush("action", "noop")
-            self.r.lpush("action", "")
+            self._push("action", "noop", "")
         return {"type": "noop", "data": ""}
 
     def player_change(self, player_id, champion_name):
@@ -288,36 +545,284 @@ class RemoteController(object):
             "player_id": player_id,
             "champion_name": champion_name
         }
-        self.r.lpush("command", "change_champion")
-        self.r.lpush("command", json.dumps(command))
+        self._push("command", "change_champion", json.dumps(command))
 
-    def restart(self):
-        # No support for outright restarting the game within the GameServer at the moment
-        pass
+    def restart(self, spawn_positions=None, champions=None):
+        """Start a new episode in the running game instead of relaunching it.
+
+        The GameServer pops actions before commands, so the reset is only sent
+        once every command sent so far, like the champion changes, has been
+        applied, see `_wait_for_commands`.
+
+        Args:
+            spawn_positions: An optional list of (x, y) positions, one per
+                player, to teleport the champions to after resetting them.
+            champions: An optional list of champion names, one per player, to
+                change to first. None keeps a player's champion.
+
+        Raises:
+            ObservationTimeoutError: The GameServer didn't apply the commands
+                within the timeout.
+        """
+        for i, champion in enumerate(champions or []):
+            if champion:
+                self.player_change(i + 1, champion)
+        self._wait_for_commands()
+        with self.batch_actions():
+            self.players_reset()
+            for i, (x, y) in enumerate(spawn_positions or []):
+                self.player_teleport(i + 1, x, y)
+
+    def _wait_for_commands(self):
+        """Wait for the GameServer to pop every command sent so far. It
+        handles each command as it pops it, so anything sent afterwards is
+        handled after them."""
+        deadline = time.time() + self.timeout
+        for delay in _ping_backoff():
+            if not self.r.llen(self._keys["command"]):
+                return
+            if time.time() > deadline:
+                raise ObservationTimeoutError(
+                    "The GameServer didn't apply the commands within %ss" %
+                    self.timeout)
+            time.sleep(delay)
 
     def save_replay(self):
         """Save a replay, returning the data."""
+        return "".join(self.replay_chunks())
+
+    def replay_chunks(self):
+        """Save a replay, yielding the data in chunks as they arrive, so the
+        whole replay is never held in memory, e.g. to write it to a file."""
+        self._push("command", "save_replay", self._replay_command())
+
+        data = self._replay_data(
+            self.r.brpop(self._keys["command_data"], self.timeout))
+        if data != redis_server.REPLAY_CHUNKED:
+            # The GameServer sent it whole.
+            yield data
+            return
+        while True:
+            data = self._replay_data(
+                self.r.brpop(self._keys["command_data"], self.timeout))
+            if not data:
+                return
+            yield data
+
+    def _replay_command(self):
         players = ",".join(["{0}.{1}".format(player.champ, player.team)
                             for player in self._kwargs["players"]])
 
         command = {
             "map": str(self._kwargs["map_name"]),
             "players": str(players),
-            "multiplier": float(self._kwargs["multiplier"])
+            "multiplier": float(self._kwargs["multiplier"]),
+            "chunk_size": redis_server.REPLAY_CHUNK_SIZE
         }
-        self.r.lpush("command", "save_replay")
-        self.r.lpush("command", json.dumps(command))
+        return json.dumps(command)
 
-        replay_json = self.r.brpop("command_data", self.timeout)
+    def _replay_data(self, replay_json):
         if replay_json == None:
             raise ConnectionError("GameServer couldn't provide replay json data")
         
         replay_json = replay_json[1].decode("utf-8")
         return replay_json
+
+class AsyncRemoteController(RemoteController):
+    """A `RemoteController` whose GameServer calls are asyncio coroutines.
+
+    `connect`, `observe`, `observe_tick`, `actions` and `save_replay` are
+    coroutines, so one event loop can drive many GameServers at once instead of
+    needing a thread for each. Everything the controller sends is queued and
+    pipelined to Redis in one round trip by the next coroutine call, so the
+    `player_*` helpers only take effect once `flush` or one of the coroutines
+    is awaited.
+
+    It is a standalone API: `LoLEnv` only drives the blocking
+    `RemoteController`. Launch a game with one through `run_configs`, e.g.
+
+        lol_proc, ports = lol_env.launch_game(
+            run_config, async_controller=True, host=host, players=players,
+            map_name=map_name, human_observer=False, cooldowns_enabled=False,
+            manacosts_enabled=False, minion_spawns_enabled=False)
+        controller = lol_proc.controller
+        await controller.connect()
+        obs = await controller.observe_tick(len(players))
+    """
+
+    def __init__(self, settings, host, port, timeout_seconds, proc=None, kwargs=[]):
+        super(AsyncRemoteController, self).__init__(
+            settings, host, port, timeout_seconds, proc=proc, kwargs=kwargs)
+        if self._unix_socket:
+            self.ar = redis.asyncio.Redis(unix_socket_path=self._unix_socket, db=0)
+        else:
+            self.ar = redis.asyncio.Redis(host=self.host, port=self._kwargs["redis_port"], db=0)
+        self._pending = []
+
+    def _push(self, key, *values):
+        """Queue `values` to be pushed onto a GameServer list by `flush`."""
+        if self._pending and self._pending[-1][0] == key:
+            self._pending[-1][1].extend(values)
+        else:
+            self._pending.append((key, list(values)))
+
+    async def flush(self):
+        """Send everything queued so far in one round trip."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        pipe = self.ar.pipeline(transaction=False)
+        for key, values in pending:
+            pipe.lpush(self._keys[key], *values)
+            if key == "action":
+                self.metrics.inc("actions_sent", len(values) // 2)
+        await pipe.execute()
+        self.metrics.inc("redis_round_trips")
+
+    async def connect(self):
+        """Waits until clients can join the GameServer then waits until agents
+        can connect, see `RemoteController.connect`."""
+        if self.state == StartupState.game_started:
+            return
+
+        if self.state < StartupState.redis_ready:
+            deadline = time.time() + self.timeout
+            for delay in _ping_backoff():
+                try:
+                    await self.ar.ping()
+                    break
+                except redis.ConnectionError:
+                    if time.time() > deadline:
+                        raise
+                    await asyncio.sleep(delay)
+            self._advance(StartupState.redis_ready)
+
+        if self.state < StartupState.clients_join:
+            self._clients_join(await self._wait_for_message(self.timeout))
+            self._advance(StartupState.clients_join)
+        self._game_started(await self._wait_for_message(60))
+        self._advance(StartupState.game_started)
+        await self.ar.delete(self._keys["action"]) # Reset action pipe
+
+    async def _wait_for_message(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            json_txt = await self.ar.brpop(self._keys["observation"], 1)
+            if json_txt is not None:
+                return json_txt
+            self._check_game_server()
+        return None
+
+    async def _start_observing(self):
+        """Start observing if we haven't already, sending anything queued."""
+        if self._last_obs == None:
+            self._pending = [p for p in self._pending if p[0] != "command"]
+            await self.ar.delete(self._keys["observation"], self._keys["command"])
+            if self._kwargs.get("binary_observations", False):
+                self._push("command", "observation_format",
+                           json.dumps({"format": "binary"}))
+            self._push("command", "start_observing")
+        await self.flush()
+
+    async def observe(self):
+        """Get a current observation."""
+        await self._start_observing()
+
+        with self.metrics.timer("brpop"):
+            json_txt = await self.ar.brpop(self._keys["observation"], self.timeout)
+        self._received([json_txt])
+        if json_txt == None:
+            logging.warning("Observation timed out")
+            return None
+        with self.metrics.timer("decode"):
+            obs = self._decode_observation(json_txt[1])
+        self.metrics.inc("observations")
+        self._last_obs = obs
+        return obs
+
+    async def observe_tick(self, count):
+        """Get the observations of all `count` agents for the next tick, see
+        `RemoteController.observe_tick`."""
+        await self._start_observing()
+
+        if self._batched_ticks is not False:
+            with self.metrics.timer("brpop"):
+                json_txt = await self.ar.brpop(self._keys["observation"], self.timeout)
+            self._received([json_txt])
+            if json_txt == None:
+                self._observation_timed_out()
+            with self.metrics.timer("decode"):
+                obs = self._split_tick(json_txt[1])
+            self._batched_ticks = len(obs) > 1 or count == 1
+            if not self._batched_ticks:
+                rest = await self._pop_observations(count - 1)
+                obs = None if rest is None else obs + rest
+        else:
+            obs = await self._pop_observations(count)
+        return self._finish_tick(obs, count)
+
+    async def _pop_observations(self, count):
+        pipe = self.ar.pipeline(transaction=False)
+        for _ in range(count):
+            pipe.brpop(self._keys["observation"], self.timeout)
+        with self.metrics.timer("brpop"):
+            replies = await pipe.execute()
+        self._received(replies)
+        with self.metrics.timer("decode"):
+            return self._join_observations(replies)
+
+    async def actions(self, req_action):
+        """Send an action request, which may include multiple actions."""
+        super(AsyncRemoteController, self).actions(req_action)
+        await self.flush()
+
+    async def act(self, action):
+        """Send a single action. This is a shortcut for `actions`."""
+        if action:
+            return await self.actions(action)
+
+    async def send_encoded_actions(self, encoded):
+        """Send the (type, payload) pairs from `Features.encode_action`."""
+        super(AsyncRemoteController, self).send_encoded_actions(encoded)
+        await self.flush()
+
+    async def save_replay(self):
+        """Save a replay, returning the data."""
+        self._push("command", "save_replay", self._replay_command())
+        await self.flush()
+        data = self._replay_data(
+            await self.ar.brpop(self._keys["command_data"], self.timeout))
+        if data != redis_server.REPLAY_CHUNKED:
+            return data
+        chunks = []
+        while True:
+            data = self._replay_data(
+                await self.ar.brpop(self._keys["command_data"], self.timeout))
+            if not data:
+                return "".join(chunks)
+            chunks.append(data)
+
+    async def aclose(self):
+        """Disconnect the asyncio client. `close` still kills redis-server."""
+        await self.ar.connection_pool.disconnect()
         
+def _ping_backoff():
+    """The delays between PINGs, doubling up to `_PING_BACKOFF_MAX`."""
+    delay = _PING_BACKOFF_START
+    while True:
+        yield delay
+        delay = min(delay * 2, _PING_BACKOFF_MAX)
+
+def _tick(obs):
+    """The tick id of an observation, falling back to its game time."""
+    if obs.get("tick") is not None:
+        return obs["tick"]
+    return obs["observation"]["game_time"]
+
 def start_client(host="192.168.0.16", port="5119", client_dir="", playerId="1"):
     # client_path = "/mnt/c/LeagueSandbox/League_Sandbox_Client/RADS/solutions/lol_game_client_sln/releases/0.0.1.68/deploy/"
-    print("LOL CLIENT HOST, PORT, CLIENT_PATH:", host, port, client_dir)
+    logging.info("League client host, port, client dir: %s %s %s", host, port,
+                 client_dir)
     LeagueOfLegendsClient = None
     LeagueOfLegendsClientArgs = [
         #"wine",
@@ -19,32 +19,226 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-"""Utilities for replays."""
+"""Utilities for replays.
 
-from pylol.env import lol_env
+A replay is a JSON object of the game's `info`, the map, players and
+multiplier, and its `actions`, every action the GameServer was sent, e.g.
+
+    {"info": {"map": "Old Summoners Rift", "players": "Ezreal.BLUE,Ezreal.PURPLE",
+              "multiplier": 7.5},
+     "actions": [[0.0, "move", {"player_id": "1", "x": 100.0, "y": 0.0}], ...]}
 
+The replays of long games are large, so they're parsed incrementally from a
+file with `iter_replay`, which only ever holds one action and a buffer of the
+file in memory.
+"""
+
+import codecs
+import collections
+import io
 import json
 
-def get_replay_info(replay_data):
-    # Data
-    data = json.loads(replay_data)
-    
-    # Info
-    info = data["info"]
-    map = info["map"]
-    player_info = info["players"]
+from pylol.env import lol_env
+from pylol.lib import common
+
+_WHITESPACE = " \t\n\r"
+# Characters which can continue a number, e.g. "12" may be "12500.0".
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+class _Stream(object):
+    """Decodes JSON values one at a time from a file, reading it in blocks."""
+
+    def __init__(self, f, buffer_size):
+        self._f = f
+        self._buffer_size = buffer_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        # Characters may be split between the blocks of a binary file.
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        data = self._f.read(self._buffer_size)
+        if not data:
+            self._eof = True
+            return False
+        if isinstance(data, bytes):
+            data = self._utf8.decode(data)
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """The next character which isn't whitespace, or "" at the end."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of %r in the replay, got: %r" % (
+                chars, char))
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number may continue in the next block, as `raw_decode`
+                # stops at any valid prefix of it, e.g. before a "." or "e".
+                if (self._eof or not _is_number(value) or
+                        (end < len(self._buf) and
+                         self._buf[end] not in _NUMBER_CHARS)):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def iter_replay(f, buffer_size=1 << 16):
+    """Parse a replay file incrementally.
+
+    Args:
+        f: A text or binary file of the replay.
+        buffer_size: How much of the file to read at once.
+
+    Yields:
+        ("action", action) for each action, in order, and (key, value) for
+        every other key of the replay, e.g. ("info", info).
+    """
+    stream = _Stream(f, buffer_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "actions":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield "action", stream.value()
+                    if stream.expect(",]") == "]":
+                        break
+        else:
+            yield key, stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+def iter_actions(f, **kwargs):
+    """The actions of a replay file, parsed incrementally."""
+    for key, value in iter_replay(f, **kwargs):
+        if key == "action":
+            yield value
+
+# Actions which aren't part of a step, e.g. from `LoLEnv.broadcast_msg`.
+_NON_STEP_ACTIONS = frozenset(["message"])
+
+def iter_steps(f, num_players, move_range=common.MOVE_RANGE, **kwargs):
+    """Group the actions of a replay back into the steps of the `LoLEnv`
+    which played it, which sends one action for each player every step.
+
+    Args:
+        f: A text or binary file of the replay.
+        num_players: The number of players in the replay.
+        move_range: The move range of the agent interface format the replay
+            was played with, to decode the moves with.
+
+    Yields:
+        ("reset", spawn_positions) at the start of each episode, with the
+        (x, y) each of the first players was teleported to, and
+        ("step", func_calls) with the `FunctionCall` of each player for each
+        step.
+
+    Raises:
+        ValueError: An action can't be decoded, or isn't by the player whose
+            turn it is in the step, e.g. as it wasn't sent by `LoLEnv.step`.
+    """
+    spawn_positions = None
+    func_calls = []
+    for action in iter_actions(f, **kwargs):
+        _, action_type, data = action
+        if action_type == "reset":
+            if spawn_positions is not None:
+                yield "reset", _spawn_positions(spawn_positions)
+            spawn_positions = {}
+            func_calls = []
+        elif action_type == "teleport":
+            if spawn_positions is not None:
+                spawn_positions[int(data["player_id"])] = (data["x"], data["y"])
+        elif action_type in common.DECODERS:
+            if spawn_positions is not None:
+                yield "reset", _spawn_positions(spawn_positions)
+                spawn_positions = None
+            # No-ops don't say whose they are.
+            player_id = data.get("player_id") if data else None
+            if player_id is not None and int(player_id) != len(func_calls) + 1:
+                raise ValueError("Expected an action by player %s, got: %s" % (
+                    len(func_calls) + 1, action))
+            func_calls.append(common.DECODERS[action_type](data, move_range))
+            if len(func_calls) == num_players:
+                yield "step", func_calls
+                func_calls = []
+        elif action_type not in _NON_STEP_ACTIONS:
+            raise ValueError("Can't decode the action: %s" % (action,))
+    if spawn_positions is not None:
+        yield "reset", _spawn_positions(spawn_positions)
+
+def _spawn_positions(teleports):
+    positions = []
+    while len(positions) + 1 in teleports:
+        positions.append(teleports[len(positions) + 1])
+    return positions
+
+def read_replay_info(f, **kwargs):
+    """The info of a replay file and stats of its actions, see
+    `get_replay_info`, without loading the whole replay."""
+    info = None
+    action_count = 0
+    duration = 0.0
+    action_types = collections.Counter()
+    for key, value in iter_replay(f, **kwargs):
+        if key == "action":
+            action_count += 1
+            # Each action is [game_time, action_type, data].
+            if isinstance(value, list) and len(value) >= 2:
+                duration = max(duration, value[0])
+                action_types[value[1]] += 1
+        elif key == "info":
+            info = value
+    if info is None:
+        raise ValueError("The replay has no info.")
+
     players = []
-    for player in player_info.split(","):
+    for player in info["players"].split(","):
         c, t = player.split(".")
         players.append(lol_env.Agent(champion=c, team=t))
-    multiplier = info["multiplier"]
 
-    # Actions
-    actions = data["actions"]
-    action_count = len(actions)
-
-    # Return dict
-    return {"map": map,
+    return {"map": info["map"],
             "players": players,
-            "multiplier": multiplier,
-            "action_count": action_count}
\ No newline at end of file
+            "multiplier": info["multiplier"],
+            "action_count": action_count,
+            "duration": duration,
+            "action_types": dict(action_types)}
+
+def get_replay_info(replay_data):
+    """The map, players and multiplier of a replay, the number of actions,
+    the game time of the last one and the number of each type of action."""
+    return read_replay_info(io.StringIO(replay_data))
@@ -0,0 +1,219 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""An SQLite index of a directory of replays, for finding them quickly.
+
+Reading the info of every replay means parsing every file, which takes
+minutes for tens of thousands of them. `ReplayIndex.update` parses only the
+files which are new or have changed since the last update, across a pool of
+processes, and stores their info from `replay.read_replay_info` in an SQLite
+database, which `ReplayIndex.query` searches by map, champions, number of
+actions and multiplier.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+
+from absl import logging
+
+from pylol.lib import replay
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replays (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    map TEXT,
+    players TEXT,
+    num_players INTEGER,
+    multiplier REAL,
+    action_count INTEGER,
+    duration REAL,
+    action_types TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS champions (
+    path TEXT,
+    champion TEXT,
+    team TEXT
+);
+CREATE INDEX IF NOT EXISTS replays_map ON replays (map);
+CREATE INDEX IF NOT EXISTS replays_action_count ON replays (action_count);
+CREATE INDEX IF NOT EXISTS champions_champion ON champions (champion);
+CREATE INDEX IF NOT EXISTS champions_path ON champions (path);
+"""
+
+# Rows written per transaction while updating.
+_BATCH_SIZE = 1000
+
+def find_replays(replay_dir):
+    """Every replay file under `replay_dir`."""
+    return sorted(os.path.join(dirpath, filename)
+                  for dirpath, _, filenames in os.walk(replay_dir)
+                  for filename in filenames if filename.endswith(".json"))
+
+def _read(path):
+    """Read the info of a replay in a worker, returning errors rather than
+    raising them so one bad replay doesn't stop the rest."""
+    try:
+        with open(path, "rb") as f:
+            return path, replay.read_replay_info(f), None
+    except Exception as e:  # Recorded in the index instead.
+        return path, None, "%s: %s" % (type(e).__name__, e)
+
+class ReplayIndex(object):
+    """An SQLite database of the info of every replay in a directory."""
+
+    def __init__(self, index_path):
+        self._db = sqlite3.connect(index_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+
+    def update(self, replay_dir, processes=None, chunksize=16):
+        """Index the new and changed replays under `replay_dir` and forget the
+        ones which are gone.
+
+        Args:
+            replay_dir: Directory to search for replays.
+            processes: Number of processes to parse with, defaults to the
+                number of CPUs.
+            chunksize: Number of replays sent to a process at once.
+
+        Returns:
+            A dict of the number of replays "indexed", "unchanged", "removed"
+            and "failed".
+        """
+        replay_dir = os.path.abspath(replay_dir)
+        known = {row["path"]: (row["size"], row["mtime"]) for row in
+                 self._db.execute("SELECT path, size, mtime FROM replays")}
+        todo = []
+        unchanged = 0
+        for path in find_replays(replay_dir):
+            stat = os.stat(path)
+            if known.pop(path, None) == (stat.st_size, stat.st_mtime):
+                unchanged += 1
+            else:
+                todo.append((path, stat))
+        # Only the replays under `replay_dir` are forgotten.
+        root = os.path.join(replay_dir, "")
+        removed = [path for path in known if path.startswith(root)]
+        with self._db:
+            self._delete(removed)
+
+        stats = dict(todo)
+        indexed = failed = 0
+        rows = []
+        if stats:
+            with multiprocessing.Pool(processes) as pool:
+                for path, info, error in pool.imap_unordered(
+                        _read, list(stats), chunksize):
+                    rows.append((path, stats[path], info, error))
+                    if error:
+                        logging.warning("Failed to read replay %s: %s", path, error)
+                        failed += 1
+                    else:
+                        indexed += 1
+                    if len(rows) >= _BATCH_SIZE:
+                        self._insert(rows)
+                        rows = []
+            self._insert(rows)
+        return {"indexed": indexed, "unchanged": unchanged,
+                "removed": len(removed), "failed": failed}
+
+    def _delete(self, paths):
+        for table in ("replays", "champions"):
+            self._db.executemany("DELETE FROM %s WHERE path = ?" % table,
+                                 [(path,) for path in paths])
+
+    def _insert(self, rows):
+        with self._db:
+            self._delete([path for path, _, _, _ in rows])
+            self._db.executemany(
+                "INSERT INTO replays VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(path, stat.st_size, stat.st_mtime) + (
+                    (info["map"],
+                     ",".join("%s.%s" % player for player in info["players"]),
+                     len(info["players"]), info["multiplier"],
+                     info["action_count"], info["duration"],
+                     json.dumps(info["action_types"]), None)
+                    if info else (None,) * 7 + (error,))
+                 for path, stat, info, error in rows])
+            self._db.executemany(
+                "INSERT INTO champions VALUES (?, ?, ?)",
+                [(path, champion, team)
+                 for path, _, info, _ in rows if info
+                 for champion, team in info["players"]])
+
+    def query(self, map_name=None, champions=None, min_actions=None,
+              max_actions=None, multiplier=None):
+        """Find the replays which match every given condition.
+
+        Args:
+            map_name: The name of the map.
+            champions: A list of champions which all played.
+            min_actions: The fewest actions.
+            max_actions: The most actions.
+            multiplier: The multiplier the game was played at.
+
+        Returns:
+            A list of dicts of the indexed info of each replay, sorted by path.
+        """
+        conditions = ["error IS NULL"]
+        args = []
+        if map_name is not None:
+            conditions.append("map = ?")
+            args.append(map_name)
+        for champion in champions or []:
+            conditions.append(
+                "path IN (SELECT path FROM champions WHERE champion = ?)")
+            args.append(champion)
+        if min_actions is not None:
+            conditions.append("action_count >= ?")
+            args.append(min_actions)
+        if max_actions is not None:
+            conditions.append("action_count <= ?")
+            args.append(max_actions)
+        if multiplier is not None:
+            conditions.append("multiplier = ?")
+            args.append(multiplier)
+        rows = self._db.execute(
+            "SELECT * FROM replays WHERE %s ORDER BY path" % " AND ".join(conditions),
+            args)
+        return [dict(row, action_types=json.loads(row["action_types"]))
+                for row in rows]
+
+    def failed(self):
+        """The (path, error) of each replay which couldn't be read."""
+        return [(row["path"], row["error"]) for row in self._db.execute(
+            "SELECT path, error FROM replays WHERE error IS NOT NULL ORDER BY path")]
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
@@ -46,6 +46,10 @@ class RunConfig(object):
 
     def start(self, **kwargs):
         raise NotImplementedError()
+
+    def exec_command(self, exec_path):
+        """The command line to launch the GameServer at `exec_path` with."""
+        return [exec_path]
     
     @classmethod
     def priority(cls):
@@ -73,7 +77,9 @@ class RunConfig(object):
 
         Args:
             replay_data: The result of controller.save_replay(), whch is a serialised
-                list of the map, players, multiplier and timestamped actions.
+                list of the map, players, multiplier and timestamped actions,
+                or an iterable of its chunks, e.g. controller.replay_chunks(),
+                which are written as they arrive.
         
         Returns:
             The full path where the replay is saved.
@@ -97,6 +103,15 @@ class RunConfig(object):
         if not Exists(replay_dir):
             MakeDirs(replay_dir)
         replay_path = os.path.join(replay_dir, replay_filename)
-        with Open(replay_path, "w") as f:
-            f.write(replay_data)
+        if isinstance(replay_data, str):
+            replay_data = [replay_data]
+        try:
+            with Open(replay_path, "w") as f:
+                for chunk in replay_data:
+                    f.write(chunk)
+        except:
+            # Don't leave half a replay behind.
+            if Exists(replay_path):
+                os.remove(replay_path)
+            raise
         return replay_path
\ No newline at end of file
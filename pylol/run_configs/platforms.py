@@ -24,6 +24,12 @@ different platforms."""
 
 import os
 import platform
+import shutil
+import sys
+import tempfile
+import weakref
+
+from absl import logging
 
 from pylol.lib import lol_process
 from pylol.run_configs import lib
@@ -41,7 +47,7 @@ class LocalBase(lib.RunConfig):
         
     def start(self, **kwargs):
         """Launch the game."""
-        print("Local Base kwargs:", kwargs)
+        logging.debug("LocalBase kwargs: %s", kwargs)
 
         if not os.path.isdir(self.exec_dir):
             raise lol_process.LoLLaunchError(
@@ -83,4 +89,56 @@ class Linux(LocalBase):
             os.environ['DYLD_LIBRARY_PATH'] = "/opt/homebrew/lib"
             os.environ['DYLD_FALLBACK_LIBRARY_PATH'] = "/opt/homebrew/lib"
             
-        return super(Linux, self).start(**kwargs)
\ No newline at end of file
+        return super(Linux, self).start(**kwargs)
+
+class Fake(LocalBase):
+    """Run the pure Python fake GameServer in `lib/fake_game_server.py`.
+
+    Never chosen automatically, pass it as the `run_config` of a `LoLEnv` to
+    run without the real GameServer, e.g. for tests and benchmarks.
+
+    Without an `exec_dir` the game settings are written to a temporary
+    directory, which is removed by `close` or once the config is garbage
+    collected.
+    """
+    def __init__(self, exec_dir=None):
+        self._finalizer = None
+        if not exec_dir:
+            exec_dir = tempfile.mkdtemp(prefix="pylol_fake_")
+            self._finalizer = weakref.finalize(
+                self, _remove_temp_dir, exec_dir, os.getpid())
+        if not os.path.isdir(os.path.join(exec_dir, "Settings")):
+            os.makedirs(os.path.join(exec_dir, "Settings"))
+
+        # Make sure the GameServer process can import this copy of pylol.
+        pylol_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        python_path = os.environ.get("PYTHONPATH")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [pylol_dir] + ([python_path] if python_path else [])))
+
+        super(Fake, self).__init__(os.path.join(exec_dir, ""), "",
+                                   cwd=".", env=env)
+
+    def start(self, **kwargs):
+        return lol_process.LoLProcess(self, exec_path=sys.executable, **kwargs)
+
+    def exec_command(self, exec_path):
+        return [exec_path, "-m", "pylol.bin.fake_game_server"]
+
+    def close(self):
+        """Remove the temporary directory, if this config made one."""
+        if self._finalizer:
+            self._finalizer()
+
+    def __getstate__(self):
+        # Copies in other processes leave the directory to this one.
+        state = dict(self.__dict__)
+        state["_finalizer"] = None
+        return state
+
+def _remove_temp_dir(path, pid):
+    """Remove `path`, but only from the process which made it, not from the
+    forked children which inherited the config."""
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
\ No newline at end of file
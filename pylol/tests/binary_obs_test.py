@@ -0,0 +1,81 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the binary observation format against the JSON one."""
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.lib import actions
+from pylol.lib import binary_obs
+from pylol.lib import features
+from pylol.tests import utils
+
+class BinaryObsTest(utils.TestCase):
+
+    def setUp(self):
+        super(BinaryObsTest, self).setUp()
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=8)))
+        units = [utils.champ_unit(1, position=(10.0, 20.0)),
+                 utils.champ_unit(2, distance_to_me=0.0, my_team=1.0)]
+        self._json_obs = utils.observation(units, game_time=12.5)
+        self._data = binary_obs.encode(
+            12.5, [utils.champ_unit_row(u) for u in units],
+            [1] * len(binary_obs.AvailableAction))
+
+    def testRoundTrip(self):
+        self.assertTrue(binary_obs.is_binary(self._data))
+        obs = binary_obs.decode(self._data)["observation"]
+        self.assertEqual(obs["game_time"], 12.5)
+        self.assertEqual(obs["champ_units"].shape, (2, len(features.ChampUnit)))
+        self.assertEqual(obs["champ_units"][0].position_y, 20.0)
+        self.assertEqual(obs["champ_units"][1].user_id, 2)
+        self.assertTrue(obs["available_actions"].can_spell_3)
+
+    def testDecodeAll(self):
+        observations = binary_obs.decode_all(self._data * 3)
+        self.assertLen(observations, 3)
+        for obs in observations:
+            self.assertEqual(obs["observation"]["champ_units"][1].user_id, 2)
+
+    def testMatchesJsonTransform(self):
+        expected = self._features.transform_obs(self._json_obs)
+        actual = self._features.transform_obs(binary_obs.decode(self._data))
+        self.assertEqual(expected.my_id, actual.my_id)
+        np.testing.assert_array_equal(expected.champ_units, actual.champ_units)
+        np.testing.assert_array_equal(expected.available_actions,
+                                      actual.available_actions)
+
+    def testTransformActionUserId(self):
+        func_call = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+        obs = binary_obs.decode(self._data)["observation"]
+        action = self._features.transform_action(obs, func_call)
+        self.assertEqual(action.props["user_id"], 2)
+
+    def testRejectsJson(self):
+        self.assertFalse(binary_obs.is_binary(b'{"observation": {}}'))
+        with self.assertRaises(ValueError):
+            binary_obs.decode(b'{"observation": {}}')
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,48 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test running the client on the fake GameServer."""
+
+import os
+
+from absl.testing import absltest
+from absl.testing import flagsaver
+
+from pylol.bin import client
+from pylol.tests import utils
+
+class ClientTest(utils.TestCase):
+
+    @utils.requires_redis
+    @flagsaver.flagsaver(fake_game_server=True, max_steps=10, max_episodes=1)
+    def testFakeGameServer(self):
+        # Needs no config file of GameServer and client directories.
+        cwd = os.getcwd()
+        os.chdir(self.create_tempdir().full_path)
+        self.addCleanup(os.chdir, cwd)
+        self.assertFalse(os.path.exists(client.FLAGS.config_path))
+        record_dir = self.create_tempdir().full_path
+        with flagsaver.flagsaver(record_dir=record_dir):
+            client.main([])
+        self.assertTrue(os.listdir(record_dir))
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,95 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the simulation of the fake GameServer."""
+
+import gc
+import os
+import pickle
+
+from absl.testing import absltest
+
+from pylol import run_configs
+from pylol.lib import fake_game_server
+from pylol.lib import features
+from pylol.tests import utils
+
+class FakeGameServerTest(utils.TestCase):
+
+    def setUp(self):
+        super(FakeGameServerTest, self).setUp()
+        # Not observing, so nothing is sent to Redis.
+        self.server = fake_game_server.FakeGameServer(redis_port=1)
+        self.blue, self.purple = self.server.champions
+
+    def testLockstep(self):
+        self.server.handle_action("move", '{"player_id": "1", "x": 100.0, "y": 0.0}')
+        self.assertEqual(self.server.tick, 0)
+        self.server.handle_action("noop", "")
+        self.assertEqual(self.server.tick, 1)
+        self.assertGreater(self.blue.x, fake_game_server.BLUE_SPAWN[0])
+
+    def testSpellsKill(self):
+        spell = '{"player_id": "1", "target_player_id": "2", "spell_slot": 0, "x": %s, "y": %s}' % (
+            self.purple.x, self.purple.y)
+        for _ in range(20):
+            self.server.handle_action("spell", spell)
+            self.server.handle_action("noop", "")
+        self.assertFalse(self.purple.alive)
+        self.assertEqual(self.purple.death_count, 1)
+        self.assertEqual(self.blue.kill_count, 1)
+
+        obs = self.server.observation(self.purple)["observation"]
+        units = features.champ_unit_matrix(obs["champ_units"])
+        self.assertEqual(units[1, features.ChampUnit.distance_to_me], 0)
+        self.assertEqual(units[1, features.ChampUnit.alive], 0)
+        self.assertFalse(obs["available_actions"]["can_move"])
+
+        self.server.handle_action("reset", "")
+        self.assertTrue(self.purple.alive)
+        self.assertEqual(self.purple.current_hp, self.purple.stats["max_hp"])
+
+class FakeRunConfigTest(utils.TestCase):
+
+    def testRemovesTempDir(self):
+        run_config = run_configs.platforms.Fake()
+        exec_dir = run_config.exec_dir
+        self.assertTrue(os.path.isdir(exec_dir))
+        run_config.close()
+        self.assertFalse(os.path.exists(exec_dir))
+
+        run_config = run_configs.platforms.Fake()
+        exec_dir = run_config.exec_dir
+        # Copies for other processes don't remove it.
+        copy = pickle.loads(pickle.dumps(run_config))
+        copy.close()
+        self.assertTrue(os.path.isdir(exec_dir))
+        del run_config, copy
+        gc.collect()
+        self.assertFalse(os.path.exists(exec_dir))
+
+    def testKeepsExecDir(self):
+        exec_dir = self.create_tempdir().full_path
+        run_configs.platforms.Fake(exec_dir).close()
+        self.assertTrue(os.path.isdir(os.path.join(exec_dir, "Settings")))
+
+if __name__ == "__main__":
+    absltest.main()
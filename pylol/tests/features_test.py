@@ -0,0 +1,265 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the observation and action transforms in features."""
+
+import json
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.lib import actions
+from pylol.lib import common
+from pylol.lib import features
+from pylol.lib import remote_controller
+from pylol.tests import utils
+
+ChampUnit = features.ChampUnit
+
+class TransformObsTest(utils.TestCase):
+
+    def setUp(self):
+        super(TransformObsTest, self).setUp()
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=8)),
+            num_champ_units=10)
+
+    def testOneVsOne(self):
+        obs = self._features.transform_obs(utils.observation([
+            utils.champ_unit(1, distance_to_me=0.0, my_team=1.0, kill_count=3.0),
+            utils.champ_unit(2, position=(7100.0, 7200.0))]))
+        self.assertEqual(obs.my_id, 1)
+        self.assertEqual(obs.me_unit.kill_count, 3)
+        self.assertEqual(obs.enemy_unit.user_id, 2)
+        self.assertEqual(obs.enemy_unit.position_x, 7100)
+        self.assertEqual(obs.enemy_unit.position_y, 7200)
+        self.assertEqual(obs.ally_units.shape, (0, len(ChampUnit)))
+        self.assertEqual(obs.champ_units.dtype, np.float32)
+
+    def testStackedOnMe(self):
+        # An ally and an enemy standing on the same spot as the agent.
+        obs = self._features.transform_obs(utils.observation([
+            utils.champ_unit(2, distance_to_me=0.0),
+            utils.champ_unit(1, distance_to_me=0.0, my_team=1.0),
+            utils.champ_unit(3, distance_to_me=0.0, my_team=1.0)]))
+        self.assertEqual(obs.my_id, 2)
+        self.assertEqual(obs.ally_units.shape, (0, len(ChampUnit)))
+        np.testing.assert_array_equal(obs.enemy_units[:, "user_id"], [1, 3])
+
+    def testFiveVsFive(self):
+        # Interleave the teams to check the rows are reordered.
+        units = []
+        for i in range(5):
+            units.append(utils.champ_unit(2 * i + 1, my_team=1.0,
+                                          distance_to_me=0.0 if i == 2 else 10.0))
+            units.append(utils.champ_unit(2 * i + 2))
+        obs = self._features.transform_obs(utils.observation(units))
+
+        self.assertEqual(obs.champ_units.shape, (10, len(ChampUnit)))
+        self.assertEqual(obs.my_id, 5)
+        self.assertEqual(obs.champ_units.me.user_id, 5)
+        np.testing.assert_array_equal(obs.ally_units[:, ChampUnit.user_id],
+                                      [1, 3, 7, 9])
+        np.testing.assert_array_equal(obs.enemy_units[:, "user_id"],
+                                      [2, 4, 6, 8, 10])
+        self.assertEqual(obs.champ_units.enemy_4.user_id, 10)
+        self.assertEqual(obs.enemy_unit.user_id, 2)
+
+        # Views share the matrix rather than copying it.
+        obs.champ_units["me", "kill_count"] = 7
+        self.assertEqual(obs.me_unit.kill_count, 7)
+
+    def testObservationSpec(self):
+        spec = self._features.observation_spec()
+        self.assertEqual(spec["champ_units"], (10, len(ChampUnit)))
+        self.assertEqual(spec["me_unit"], (len(ChampUnit),))
+        self.assertEqual(spec["action_mask"], features.ACTION_MASK_SHAPE)
+
+    def testActionMask(self):
+        observation = utils.observation([
+            utils.champ_unit(1, distance_to_me=0.0, my_team=1.0),
+            utils.champ_unit(2)])
+        flags = observation["observation"]["available_actions"]
+        flags.update(can_move=False, can_spell_0=False, can_spell_4=False)
+        obs = self._features.transform_obs(observation)
+
+        self.assertEqual(obs.action_mask.shape, (3, 6))
+        self.assertEqual(obs.action_mask.dtype, bool)
+        self.assertTrue(obs.action_mask[actions.FUNCTIONS.no_op.id].all())
+        self.assertFalse(obs.action_mask[actions.FUNCTIONS.move.id].any())
+        np.testing.assert_array_equal(obs.action_mask[actions.FUNCTIONS.spell.id],
+                                      [False, True, True, True, False, True])
+        np.testing.assert_array_equal(obs.available_actions, [0, 2])
+
+        flags.update(can_spell_1=False, can_spell_2=False, can_spell_3=False,
+                     can_spell_5=False)
+        self.assertEqual(self._features.available_actions(
+            observation["observation"]), [0])
+
+class ObservationBufferTest(utils.TestCase):
+
+    def setUp(self):
+        super(ObservationBufferTest, self).setUp()
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=8)))
+        self._buffer = features.ObservationBuffer(num_champ_units=2)
+
+    def _transform(self, game_time, kill_count):
+        return self._features.transform_obs(utils.observation([
+            utils.champ_unit(1, distance_to_me=0.0, my_team=1.0,
+                             kill_count=kill_count),
+            utils.champ_unit(2)], game_time=game_time), buffer=self._buffer)
+
+    def testDoubleBuffered(self):
+        first = self._transform(1.0, 1.0)
+        second = self._transform(2.0, 2.0)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.me_unit.kill_count, 1)
+        self.assertEqual(second.me_unit.kill_count, 2)
+        self.assertEqual(first.game_time, 1.0)
+        np.testing.assert_array_equal(second.available_actions, [0, 1, 2])
+        self.assertIsNot(first.action_mask, second.action_mask)
+
+        # The third observation reuses the arrays of the first.
+        third = self._transform(3.0, 3.0)
+        self.assertIs(third, first)
+        self.assertIs(third.champ_units, first.champ_units)
+        self.assertEqual(first.me_unit.kill_count, 3)
+
+    def testMatchesUnbuffered(self):
+        expected = self._features.transform_obs(utils.observation([
+            utils.champ_unit(1, distance_to_me=0.0, my_team=1.0),
+            utils.champ_unit(2)]))
+        actual = self._transform(1.0, 1.0)
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for key in expected:
+            np.testing.assert_array_equal(expected[key], actual[key])
+
+    def testWrongNumberOfUnits(self):
+        with self.assertRaises(ValueError):
+            self._features.transform_obs(utils.observation([
+                utils.champ_unit(1, distance_to_me=0.0)]), buffer=self._buffer)
+
+class _FakeRedis(object):
+
+    def __init__(self):
+        self.pushed = []
+
+    def lpush(self, key, *values):
+        self.pushed.extend(values)
+
+class EncodeActionTest(utils.TestCase):
+
+    def setUp(self):
+        super(EncodeActionTest, self).setUp()
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=8)))
+        self._obs = utils.observation([
+            utils.champ_unit(2, distance_to_me=0.0, my_team=1.0),
+            utils.champ_unit(1)])["observation"]
+
+    def _legacy(self, func_calls):
+        """The pairs sent by `transform_action` and `RemoteController.actions`."""
+        controller = remote_controller.RemoteController(
+            None, "localhost", None, 1, kwargs={}, redis_client=_FakeRedis())
+        controller.actions(common.RequestAction(actions=[
+            self._features.transform_action(self._obs, f) for f in func_calls]))
+        pushed = controller.r.pushed
+        return list(zip(pushed[::2], pushed[1::2]))
+
+    def testMatchesTransformAction(self):
+        func_calls = [
+            actions.FunctionCall(actions.FUNCTIONS.no_op.id, []),
+            actions.FunctionCall(actions.FUNCTIONS.move.id, [[0, 7]]),
+            actions.FunctionCall(actions.FUNCTIONS.move.id, [[4.5, np.int64(3)]]),
+            actions.FunctionCall(actions.FUNCTIONS.spell.id, [[3], [7100.7, 50]]),
+            actions.FunctionCall(actions.FUNCTIONS.spell.id,
+                                 [[np.int64(0)], np.array([1.5, 2.0])]),
+        ]
+        encoded = [self._features.encode_action(self._obs, f) for f in func_calls]
+        self.assertEqual(encoded, self._legacy(func_calls))
+
+    def testMoveRange(self):
+        # Moves are relative to the centre of the move range.
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=16)))
+        func_call = actions.FunctionCall(actions.FUNCTIONS.move.id, [[8, 15]])
+        encoded = self._features.encode_action(self._obs, func_call)
+        self.assertEqual(encoded, self._legacy([func_call])[0])
+        data = json.loads(encoded[1])
+        self.assertEqual((data["x"], data["y"]), (0.0, 700.0))
+        self.assertEqual(common.decode_move(data, move_range=16), func_call)
+
+    def testBinaryObservation(self):
+        obs = {"champ_units": np.array(
+            [utils.champ_unit_row(u) for u in self._obs["champ_units"]])}
+        func_call = actions.FunctionCall(actions.FUNCTIONS.move.id, [[5, 5]])
+        self.assertEqual(self._features.encode_action(obs, func_call),
+                         self._features.encode_action(self._obs, func_call))
+
+    def testInvalid(self):
+        for func_call in [
+                actions.FunctionCall(99, []),
+                actions.FunctionCall(actions.FUNCTIONS.move.id, []),
+                actions.FunctionCall(actions.FUNCTIONS.move.id, [[1]]),
+                actions.FunctionCall(actions.FUNCTIONS.move.id, [[8, 0]]),
+                actions.FunctionCall(actions.FUNCTIONS.spell.id, [[6], [0, 0]]),
+                # Spell slots index their options, like `ActionValidator`.
+                actions.FunctionCall(actions.FUNCTIONS.spell.id, [[1.5], [0, 0]]),
+                actions.FunctionCall(actions.FUNCTIONS.spell.id, [[0], [-1, 0]])]:
+            with self.assertRaises(ValueError):
+                self._features.encode_action(self._obs, func_call)
+
+class ValidateActionsTest(utils.TestCase):
+
+    def setUp(self):
+        super(ValidateActionsTest, self).setUp()
+        self._features = features.Features(features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(map=16000, move_range=8)))
+
+    def testBatch(self):
+        function_ids = np.array([[0, 1, 1], [2, 2, 3]])
+        arguments = np.array([
+            [[np.nan, 9, 9], [7, 0, 0], [8, 0, 0]],
+            [[5, 15999.5, 0], [1.5, 10, 10], [0, 0, 0]]])
+        valid, errors = self._features.validate_actions(function_ids, arguments)
+        np.testing.assert_array_equal(valid, [[True, True, False],
+                                              [True, False, False]])
+        np.testing.assert_array_equal(errors, [
+            [features.ActionError.none, features.ActionError.none,
+             features.ActionError.out_of_range],
+            [features.ActionError.none, features.ActionError.out_of_range,
+             features.ActionError.invalid_function]])
+
+    def testWrongShape(self):
+        with self.assertRaises(ValueError):
+            self._features.validate_actions([0, 1], np.zeros((2, 2)))
+
+    def testTransformActionOutOfRange(self):
+        obs = utils.observation([utils.champ_unit(1, distance_to_me=0.0),
+                                 utils.champ_unit(2)])["observation"]
+        with self.assertRaises(ValueError):
+            self._features.transform_action(obs, actions.FunctionCall(
+                actions.FUNCTIONS.move.id, [[8, 0]]))
+
+if __name__ == "__main__":
+    absltest.main()
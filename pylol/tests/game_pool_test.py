@@ -0,0 +1,102 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test reusing games from a pool between environments."""
+
+import json
+import time
+
+from absl.testing import absltest
+
+from pylol.agents import random_agent
+from pylol.env import game_pool
+from pylol.env import lol_env
+from pylol.env import run_loop
+from pylol.lib import fake_game_server
+from pylol.tests import utils
+
+def _make_pool():
+    return game_pool.GamePool(1, **utils.fake_game_kwargs())
+
+def _make_env(pool, **kwargs):
+    # The env plays the pool's game, so it needs no run config of its own.
+    return lol_env.LoLEnv(
+        **utils.fake_env_kwargs(game_pool=pool, run_config=None, **kwargs))
+
+def _max_hp(champion):
+    return fake_game_server.CHAMPION_STATS.get(
+        champion, fake_game_server.BASE_STATS)["max_hp"]
+
+class GamePoolTest(utils.TestCase):
+
+    @utils.requires_redis
+    def testReuseGames(self):
+        with _make_pool() as pool:
+            games = []
+            for _ in range(2):
+                start = time.time()
+                with _make_env(pool) as env:
+                    # The game is already running and connected.
+                    self.assertLess(time.time() - start, 10)
+                    games.append(env._lol_procs[0])
+                    agents = [random_agent.RandomAgent() for _ in env.players]
+                    run_loop.run_loop(agents, env, max_steps=20)
+                    self.assertEqual(agents[0].steps, 20)
+            self.assertIs(games[0], games[1])
+            self.assertIsNone(games[0].exit_code)
+        self.assertIsNone(games[0].controller)
+
+    @utils.requires_redis
+    def testDefaultSpawnPositions(self):
+        with _make_pool() as pool:
+            with _make_env(pool) as env:
+                env.reset()
+                replay = json.loads(env._controllers[0].save_replay())
+
+        teleports = [(data["x"], data["y"])
+                     for _, action_type, data in replay["actions"]
+                     if action_type == "teleport"]
+        self.assertEqual(teleports, lol_env.DEFAULT_SPAWN_POSITIONS)
+
+    @utils.requires_redis
+    def testResetInPlace(self):
+        spawn_positions = [(7000.0, 7000.0), (7200.0, 7200.0)]
+        with _make_pool() as pool:
+            with _make_env(pool, spawn_positions=spawn_positions) as env:
+                for champions in (None, ["Ezreal", "Ashe"]):
+                    timesteps = env.reset(champions=champions)
+                    me = timesteps[0].observation["me_unit"]
+                    self.assertEqual((me.position_x, me.position_y),
+                                     spawn_positions[0])
+                    self.assertEqual(timesteps[1].observation["me_unit"].max_hp,
+                                     _max_hp("Ashe" if champions else "Ezreal"))
+
+            # The pool changes the champion back before the game is reused.
+            with _make_env(pool) as env:
+                timesteps = env.reset()
+                self.assertEqual(timesteps[1].observation["me_unit"].max_hp,
+                                 _max_hp("Ezreal"))
+
+            with self.assertRaises(ValueError):
+                _make_env(pool, spawn_positions=spawn_positions * 2)
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,104 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the metrics collectors and exporters."""
+
+import os
+import tempfile
+
+from absl.testing import absltest
+
+from pylol.lib import metrics
+from pylol.tests import utils
+
+class MetricsTest(utils.TestCase):
+
+    def testNoOp(self):
+        with metrics.NO_OP.timer("step"):
+            metrics.NO_OP.inc("steps")
+        self.assertEqual(metrics.NO_OP.snapshot(),
+                         {"counters": {}, "timers": {}})
+
+    def testInMemory(self):
+        collector = metrics.InMemoryCollector()
+        for _ in range(3):
+            with collector.timer("step"):
+                collector.inc("steps")
+        collector.inc("bytes_received", 100)
+        collector.add_time("decode", 0.5)
+        collector.add_time("decode", 0.25)
+
+        snapshot = collector.snapshot()
+        self.assertEqual(snapshot["counters"], {"steps": 3, "bytes_received": 100})
+        self.assertEqual(snapshot["timers"]["step"]["count"], 3)
+        self.assertEqual(snapshot["timers"]["decode"],
+                         {"count": 2, "sum": 0.75, "max": 0.5})
+
+        collector.reset()
+        self.assertEqual(collector.snapshot(), {"counters": {}, "timers": {}})
+
+    def testSamples(self):
+        collector = metrics.SampleCollector()
+        for seconds in (0.001, 0.002, 0.003):
+            collector.add_time("decode", seconds)
+        with collector.timer("step"):
+            collector.inc("steps")
+
+        stats = collector.stats()
+        self.assertEqual(stats["decode"]["num"], 3)
+        self.assertAlmostEqual(stats["decode"]["p50"], 2.0)
+        self.assertAlmostEqual(stats["decode"]["max"], 3.0)
+        self.assertEqual(stats["step"]["num"], 1)
+        self.assertEqual(collector.snapshot()["timers"]["decode"]["count"], 3)
+
+        collector.reset()
+        self.assertEqual(collector.stats(), {})
+
+    def testMergeSnapshots(self):
+        a = metrics.InMemoryCollector()
+        a.inc("steps", 2)
+        a.add_time("decode", 0.5)
+        b = metrics.InMemoryCollector()
+        b.inc("steps", 3)
+        b.inc("episodes")
+        b.add_time("decode", 0.25)
+
+        merged = metrics.merge_snapshots([a.snapshot(), b.snapshot()])
+        self.assertEqual(merged["counters"], {"steps": 5, "episodes": 1})
+        self.assertEqual(merged["timers"]["decode"],
+                         {"count": 2, "sum": 0.75, "max": 0.5})
+        self.assertEqual(a.snapshot()["timers"]["decode"]["count"], 1)
+
+    def testPrometheus(self):
+        collector = metrics.InMemoryCollector()
+        collector.inc("steps", 2)
+        collector.add_time("decode", 0.5)
+        path = os.path.join(tempfile.mkdtemp(), "pylol.prom")
+        exporter = metrics.PrometheusExporter(collector, path, labels={"env": "0"})
+        exporter.export()
+        with open(path) as f:
+            text = f.read()
+        self.assertIn('pylol_steps_total{env="0"} 2\n', text)
+        self.assertIn('pylol_decode_seconds_count{env="0"} 1\n', text)
+        self.assertIn('pylol_decode_seconds_sum{env="0"} 0.5\n', text)
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,105 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test running and restarting games with the orchestrator."""
+
+import functools
+import os
+import time
+
+from absl.testing import absltest
+
+from pylol.agents import random_agent
+from pylol.env import orchestrator
+from pylol.tests import utils
+
+class _CrashOnceAgent(random_agent.RandomAgent):
+    """Crashes its game the first time it's run, marking `path`."""
+
+    def __init__(self, path):
+        super(_CrashOnceAgent, self).__init__()
+        self._path = path
+
+    def step(self, obs):
+        if not os.path.exists(self._path):
+            open(self._path, "w").close()
+            raise RuntimeError("Crashing the game.")
+        return super(_CrashOnceAgent, self).step(obs)
+
+class _HangOnceAgent(random_agent.RandomAgent):
+    """Hangs the first time it's run, marking `path`."""
+
+    def __init__(self, path):
+        super(_HangOnceAgent, self).__init__()
+        self._path = path
+
+    def step(self, obs):
+        if not os.path.exists(self._path):
+            open(self._path, "w").close()
+            time.sleep(600)
+        return super(_HangOnceAgent, self).step(obs)
+
+def _make_orchestrator(num_games, agent_fn, **kwargs):
+    kwargs.setdefault("max_steps", 10)
+    kwargs.setdefault("report_secs", 0.1)
+    return orchestrator.Orchestrator(num_games, agent_fn,
+                                     **utils.fake_env_kwargs(**kwargs))
+
+class OrchestratorTest(utils.TestCase):
+
+    def testBoundedByCpus(self):
+        orch = _make_orchestrator(1000, random_agent.RandomAgent)
+        self.assertLessEqual(orch.max_concurrent, os.cpu_count())
+        orch.close()
+
+    @utils.requires_redis
+    def testRunGames(self):
+        with _make_orchestrator(2, random_agent.RandomAgent) as orch:
+            stats = orch.run()
+        self.assertEqual(stats["games_finished"], 2)
+        self.assertEqual(stats["game_restarts"], 0)
+        self.assertEqual(stats["steps"], 20)
+        self.assertGreater(stats["steps_per_sec"], 0)
+
+    @utils.requires_redis
+    def testRestartCrashedGame(self):
+        path = os.path.join(self.create_tempdir().full_path, "crashed")
+        with _make_orchestrator(1, functools.partial(_CrashOnceAgent, path),
+                                redis_unix_socket=True) as orch:
+            stats = orch.run()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(stats["game_restarts"], 1)
+        self.assertEqual(stats["games_finished"], 1)
+        self.assertEqual(stats["games_failed"], 0)
+
+    @utils.requires_redis
+    def testRestartHungGame(self):
+        path = os.path.join(self.create_tempdir().full_path, "hung")
+        with _make_orchestrator(1, functools.partial(_HangOnceAgent, path),
+                                health_timeout_secs=5) as orch:
+            stats = orch.run()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(stats["game_restarts"], 1)
+        self.assertEqual(stats["games_finished"], 1)
+        self.assertEqual(stats["games_failed"], 0)
+
+if __name__ == "__main__":
+    absltest.main()
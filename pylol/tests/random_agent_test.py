@@ -21,20 +21,68 @@
 # SOFTWARE.
 """Run a random agent for a few steps."""
 
+import os
+
 from absl.testing import absltest
 
 from pylol.agents import random_agent
 from pylol.env import run_loop
 from pylol.env import lol_env
+from pylol.lib import portspicker
+from pylol.lib import redis_server
 from pylol.tests import utils
 
-"""
 class TestRandomAgent(utils.TestCase):
+
+    @utils.requires_redis
     def test_random_agent(self):
-        with lol_env.LoLEnv(
-            map_name="Old Summoners Rift"
-        )
-"""
+        steps = 100
+        with lol_env.LoLEnv(**utils.fake_env_kwargs()) as env:
+            agents = [random_agent.RandomAgent() for _ in env.players]
+            run_loop.run_loop(agents, env, max_steps=steps)
+            for agent in agents:
+                self.assertEqual(agent.steps, steps)
+                self.assertGreaterEqual(agent.episodes, 1)
+
+    @utils.requires_redis
+    def test_random_agent_unix_socket(self):
+        steps = 100
+        with lol_env.LoLEnv(**utils.fake_env_kwargs(redis_unix_socket=True)) as env:
+            socket_path = env._controllers[0]._unix_socket
+            self.assertTrue(socket_path)
+            agents = [random_agent.RandomAgent() for _ in env.players]
+            run_loop.run_loop(agents, env, max_steps=steps)
+            self.assertEqual(agents[0].steps, steps)
+        self.assertFalse(os.path.exists(socket_path))
+
+    @utils.requires_redis
+    def test_random_agent_given_ports(self):
+        ports = portspicker.pick_contiguous_unused_ports(2)
+        self.addCleanup(portspicker.return_ports, ports)
+        with lol_env.LoLEnv(**utils.fake_env_kwargs(ports=ports)) as env:
+            agents = [random_agent.RandomAgent() for _ in env.players]
+            run_loop.run_loop(agents, env, max_steps=10)
+        # The caller still owns the ports it passed in.
+        self.assertTrue(set(ports) <= portspicker._contiguous_ports)
+
+    @utils.requires_redis
+    def test_random_agents_share_redis(self):
+        steps = 20
+        port, = portspicker.pick_contiguous_unused_ports(1)
+        envs = []
+        try:
+            with redis_server.RedisServer("localhost", port):
+                for _ in range(2):
+                    envs.append(lol_env.LoLEnv(
+                        **utils.fake_env_kwargs(shared_redis_port=port)))
+                for env in envs:
+                    agents = [random_agent.RandomAgent() for _ in env.players]
+                    run_loop.run_loop(agents, env, max_steps=steps)
+                    self.assertEqual(agents[0].steps, steps)
+        finally:
+            for env in envs:
+                env.close()
+            portspicker.return_ports([port])
 
 if __name__ == "__main__":
     absltest.main()
\ No newline at end of file
@@ -0,0 +1,212 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test starting up the connection to the GameServer."""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+from absl.testing import absltest
+import redis
+
+from pylol.env import lol_env
+from pylol.lib import portspicker
+from pylol.lib import redis_server
+from pylol.lib import remote_controller
+from pylol.tests import utils
+
+class _ExitedProcess(object):
+    exit_code = 3
+
+class StartupTest(utils.TestCase):
+
+    def testPingBackoff(self):
+        delays = list(itertools.islice(remote_controller._ping_backoff(), 10))
+        self.assertEqual(delays[0], remote_controller._PING_BACKOFF_START)
+        self.assertEqual(delays[1], 2 * delays[0])
+        self.assertEqual(delays[-1], remote_controller._PING_BACKOFF_MAX)
+
+    def testRedisServerMissing(self):
+        # Fails straight away, rather than when first talking to Redis.
+        with mock.patch.dict(os.environ, {"PATH": ""}):
+            with self.assertRaises(OSError):
+                remote_controller.RemoteController(
+                    None, "localhost", None, 30,
+                    kwargs={"redis_port": 1, "human_observer": False})
+
+    @utils.requires_redis
+    def testGameServerExited(self):
+        port, = portspicker.pick_contiguous_unused_ports(1)
+        try:
+            with redis_server.RedisServer("localhost", port):
+                controller = remote_controller.RemoteController(
+                    None, "localhost", None, 30, proc=_ExitedProcess(),
+                    kwargs={"redis_port": port, "shared_redis": True,
+                            "redis_key_prefix": "test:", "human_observer": False})
+                start = time.time()
+                with self.assertRaises(remote_controller.ConnectError):
+                    controller.connect()
+                # Fails on the first check rather than after the timeout.
+                self.assertLess(time.time() - start, 10)
+                self.assertEqual(controller.state,
+                                 remote_controller.StartupState.redis_ready)
+                self.assertIn("redis_ready", controller.startup_times)
+                controller.close()
+        finally:
+            portspicker.return_ports([port])
+
+    @utils.requires_redis
+    def testResumeConnect(self):
+        port, = portspicker.pick_contiguous_unused_ports(1)
+        self.addCleanup(portspicker.return_ports, [port])
+        server = redis_server.RedisServer("localhost", port)
+        self.addCleanup(server.close)
+        proc = _ExitedProcess()
+        controller = remote_controller.RemoteController(
+            None, "localhost", None, 30, proc=proc,
+            kwargs={"redis_port": port, "shared_redis": True,
+                    "redis_key_prefix": "test:", "human_observer": False})
+        self.addCleanup(controller.close)
+        State = remote_controller.StartupState
+
+        with self.assertRaises(remote_controller.ConnectError):
+            controller.connect()
+        self.assertEqual(controller.state, State.redis_ready)
+
+        controller.r.lpush("test:observation", json.dumps("clients_join"))
+        with self.assertRaises(remote_controller.ConnectError):
+            controller.connect()
+        self.assertEqual(controller.state, State.clients_join)
+
+        # Waits for game_started, not for clients_join all over again.
+        proc.exit_code = None
+        controller.r.lpush("test:observation", json.dumps("game_started"))
+        controller.connect()
+        self.assertEqual(controller.state, State.game_started)
+
+def _observation(tick, user_id):
+    return {"observation": {"game_time": tick, "champ_units": [
+        {"user_id": user_id, "distance_to_me": 0.0}]}}
+
+@utils.requires_redis
+class ObserveTickTest(utils.TestCase):
+
+    def setUp(self):
+        super(ObserveTickTest, self).setUp()
+        port, = portspicker.pick_contiguous_unused_ports(1)
+        self.addCleanup(portspicker.return_ports, [port])
+        server = redis_server.RedisServer("localhost", port)
+        self.addCleanup(server.close)
+        self._controller = remote_controller.RemoteController(
+            None, "localhost", None, 1,
+            kwargs={"redis_port": port, "shared_redis": True,
+                    "redis_key_prefix": "test:", "human_observer": False})
+        self.addCleanup(self._controller.close)
+        self._r = self._controller.r
+        deadline = time.time() + 10
+        for delay in remote_controller._ping_backoff():
+            try:
+                self._r.ping()
+                break
+            except redis.ConnectionError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(delay)
+
+    def _send_ticks(self, messages):
+        """Push the messages once the controller starts observing, like the
+        GameServer."""
+        def run():
+            self._r.brpop("test:command", 10)
+            for message in messages:
+                self._r.lpush("test:observation", json.dumps(message))
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def testBatched(self):
+        self._send_ticks([
+            {"tick": 1, "observations": [_observation(1, 1), _observation(1, 2)]},
+            {"tick": 2, "observations": [_observation(2, 1), _observation(2, 2)]}])
+        for tick in (1, 2):
+            obs = self._controller.observe_tick(2)
+            self.assertEqual([o["tick"] for o in obs], [tick, tick])
+            self.assertEqual(
+                [o["observation"]["champ_units"][0]["user_id"] for o in obs],
+                [1, 2])
+        self.assertTrue(self._controller._batched_ticks)
+
+    def testPerAgent(self):
+        self._send_ticks([_observation(tick, user_id)
+                          for tick in (1, 2) for user_id in (1, 2)])
+        for tick in (1, 2):
+            obs = self._controller.observe_tick(2)
+            self.assertEqual([o["observation"]["game_time"] for o in obs],
+                             [tick, tick])
+            self.assertEqual(
+                [o["observation"]["champ_units"][0]["user_id"] for o in obs],
+                [1, 2])
+        self.assertFalse(self._controller._batched_ticks)
+
+    def testTimeout(self):
+        self._send_ticks([_observation(1, 1)])
+        with self.assertRaises(remote_controller.ObservationTimeoutError):
+            self._controller.observe_tick(2)
+
+@utils.requires_redis
+class AsyncRemoteControllerTest(utils.TestCase):
+
+    def testDriveTwoGames(self):
+        game_kwargs = utils.fake_game_kwargs(
+            async_controller=True, human_observer=False, cooldowns_enabled=False,
+            manacosts_enabled=False, minion_spawns_enabled=False)
+        players = game_kwargs["players"]
+        games = []
+        for _ in range(2):
+            lol_proc, ports = lol_env.launch_game(**game_kwargs)
+            self.addCleanup(portspicker.return_ports, ports)
+            self.addCleanup(lol_proc.close)
+            games.append(lol_proc.controller)
+
+        async def play(controller):
+            await controller.connect()
+            ticks = []
+            for _ in range(3):
+                obs = await controller.observe_tick(len(players))
+                ticks.append(obs[0]["observation"]["game_time"])
+                controller.player_noop(len(players))
+            await controller.aclose()
+            return ticks
+
+        async def play_all():
+            return await asyncio.gather(*[play(c) for c in games])
+
+        for ticks in asyncio.run(play_all()):
+            self.assertEqual(len(ticks), 3)
+            self.assertLess(ticks[0], ticks[-1])
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,98 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test indexing and searching a directory of replays."""
+
+import json
+import os
+import tempfile
+
+from absl.testing import absltest
+
+from pylol.lib import replay_index
+from pylol.tests import utils
+
+def _write_replay(path, players, num_actions, multiplier=7.5):
+    with open(path, "w") as f:
+        json.dump({
+            "info": {"map": "Old Summoners Rift",
+                     "players": players,
+                     "multiplier": multiplier},
+            "actions": [[float(i), "noop", {}] for i in range(num_actions)],
+        }, f)
+
+class ReplayIndexTest(utils.TestCase):
+
+    def setUp(self):
+        super(ReplayIndexTest, self).setUp()
+        self.replay_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.replay_dir, "old"))
+        self.a = os.path.join(self.replay_dir, "a.json")
+        self.b = os.path.join(self.replay_dir, "old", "b.json")
+        self.bad = os.path.join(self.replay_dir, "bad.json")
+        _write_replay(self.a, "Ezreal.BLUE,Ashe.PURPLE", 10)
+        _write_replay(self.b, "Ezreal.BLUE,Ezreal.PURPLE", 50, multiplier=15.0)
+        with open(self.bad, "w") as f:
+            f.write('{"info": ')
+        self.index = replay_index.ReplayIndex(
+            os.path.join(tempfile.mkdtemp(), "replays.db"))
+
+    def tearDown(self):
+        self.index.close()
+        super(ReplayIndexTest, self).tearDown()
+
+    def testUpdateAndQuery(self):
+        counts = self.index.update(self.replay_dir, processes=2)
+        self.assertEqual(counts, {"indexed": 2, "unchanged": 0, "removed": 0,
+                                  "failed": 1})
+        self.assertEqual([path for path, _ in self.index.failed()], [self.bad])
+
+        self.assertEqual([r["path"] for r in self.index.query()], [self.a, self.b])
+        self.assertEqual([r["path"] for r in self.index.query(champions=["Ashe"])],
+                         [self.a])
+        self.assertEqual(
+            [r["path"] for r in self.index.query(champions=["Ezreal", "Ashe"])],
+            [self.a])
+        self.assertEqual([r["path"] for r in self.index.query(min_actions=20)],
+                         [self.b])
+        self.assertEqual([r["path"] for r in self.index.query(multiplier=7.5)],
+                         [self.a])
+        row, = self.index.query(max_actions=10)
+        self.assertEqual(row["num_players"], 2)
+        self.assertEqual(row["duration"], 9.0)
+        self.assertEqual(row["action_types"], {"noop": 10})
+
+    def testIncrementalUpdate(self):
+        self.index.update(self.replay_dir, processes=1)
+        os.remove(self.b)
+        _write_replay(self.a, "Ezreal.BLUE,Ashe.PURPLE", 30)
+        os.utime(self.a, (0, 0))
+        counts = self.index.update(self.replay_dir, processes=1)
+        # Replays which failed are only read again once they change.
+        self.assertEqual(counts, {"indexed": 1, "unchanged": 1, "removed": 1,
+                                  "failed": 0})
+        row, = self.index.query()
+        self.assertEqual(row["action_count"], 30)
+        counts = self.index.update(self.replay_dir, processes=1)
+        self.assertEqual(counts["unchanged"], 2)
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,189 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test parsing replays incrementally and saving them in chunks."""
+
+import io
+import json
+import os
+from unittest import mock
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.env import lol_env
+from pylol.env import trajectory
+from pylol.lib import actions
+from pylol.lib import redis_server
+from pylol.lib import replay
+from pylol.tests import utils
+
+REPLAY = {
+    "info": {"map": "Old Summoners Rift",
+             "players": "Ezreal.BLUE,Ashe.PURPLE",
+             "multiplier": 7.5},
+    "actions": [[0.25 * i, "message", {"msg": "héllo %s" % i}]
+                for i in range(100)],
+}
+
+class ReplayTest(utils.TestCase):
+
+    def testIterActions(self):
+        data = json.dumps(REPLAY, ensure_ascii=False, indent=2)
+        for buffer_size in (1, 3, 64, 1 << 16):
+            self.assertEqual(
+                list(replay.iter_actions(io.StringIO(data),
+                                         buffer_size=buffer_size)),
+                REPLAY["actions"])
+            # Characters split between the blocks of a binary file.
+            self.assertEqual(
+                list(replay.iter_actions(io.BytesIO(data.encode("utf-8")),
+                                         buffer_size=buffer_size)),
+                REPLAY["actions"])
+
+    def testNumbersSplitBetweenBlocks(self):
+        data = json.dumps({"game_time": 12500.0, "seed": -3, "scale": 1.5e-07,
+                           "actions": [[0.25, "noop", {}], [12500, "noop", {}]],
+                           "ended": 2.5})
+        for buffer_size in list(range(1, 21)) + [1 << 16]:
+            self.assertEqual(
+                list(replay.iter_replay(io.StringIO(data),
+                                        buffer_size=buffer_size)),
+                [("game_time", 12500.0), ("seed", -3), ("scale", 1.5e-07),
+                 ("action", [0.25, "noop", {}]), ("action", [12500, "noop", {}]),
+                 ("ended", 2.5)])
+
+    def testReplayInfo(self):
+        info = replay.get_replay_info(json.dumps(REPLAY))
+        self.assertEqual(info["map"], "Old Summoners Rift")
+        self.assertEqual(info["players"], [
+            lol_env.Agent(champion="Ezreal", team="BLUE"),
+            lol_env.Agent(champion="Ashe", team="PURPLE")])
+        self.assertEqual(info["action_count"], 100)
+        self.assertEqual(info["duration"], 24.75)
+        self.assertEqual(info["action_types"], {"message": 100})
+
+    def testIterSteps(self):
+        move = actions.FunctionCall(actions.FUNCTIONS.move.id, [[0, 7]])
+        spell = actions.FunctionCall(actions.FUNCTIONS.spell.id, [[2], [30, 40]])
+        data = json.dumps({"info": REPLAY["info"], "actions": [
+            [0, "reset", ""],
+            [0, "teleport", {"player_id": 1, "x": 100, "y": 200}],
+            [0, "teleport", {"player_id": 2, "x": 300, "y": 400}],
+            [1, "move", {"player_id": 1, "x": -400, "y": 300}],
+            [1, "spell", {"player_id": 2, "spell_slot": 2, "x": 30, "y": 40}],
+            [2, "noop", {}],
+            [2, "noop", {}],
+            [3, "reset", ""],
+        ]})
+        no_op = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+        self.assertEqual(list(replay.iter_steps(io.StringIO(data), 2)), [
+            ("reset", [(100, 200), (300, 400)]),
+            ("step", [move, spell]),
+            ("step", [no_op, no_op]),
+            ("reset", []),
+        ])
+
+    def testIterStepsMoveRange(self):
+        data = json.dumps({"info": REPLAY["info"], "actions": [
+            [0, "reset", ""],
+            [1, "move", {"player_id": 1, "x": -400, "y": 300}],
+            [1, "message", {"msg": "hello"}],
+            [1, "move", {"player_id": 2, "x": 700, "y": -800}],
+        ]})
+        self.assertEqual(
+            list(replay.iter_steps(io.StringIO(data), 2, move_range=16)), [
+                ("reset", []),
+                ("step", [
+                    actions.FunctionCall(actions.FUNCTIONS.move.id, [[4, 11]]),
+                    actions.FunctionCall(actions.FUNCTIONS.move.id, [[15, 0]])]),
+            ])
+
+    def testIterStepsUndecodable(self):
+        for action in [
+                [1, "attack", {"player_id": 1, "target_player_id": 2}],
+                # Player 1's action is missing, so this isn't player 1's.
+                [1, "move", {"player_id": 2, "x": 0, "y": 0}]]:
+            data = json.dumps({"info": REPLAY["info"], "actions": [
+                [0, "reset", ""], action]})
+            with self.assertRaises(ValueError):
+                list(replay.iter_steps(io.StringIO(data), 2))
+
+    def testTruncated(self):
+        data = json.dumps(REPLAY)
+        with self.assertRaises(ValueError):
+            list(replay.iter_replay(io.StringIO(data[:len(data) // 2])))
+
+    @utils.requires_redis
+    def testSaveReplayInChunks(self):
+        env_kwargs = utils.fake_env_kwargs()
+        with mock.patch.object(redis_server, "REPLAY_CHUNK_SIZE", 64), \
+                lol_env.LoLEnv(**env_kwargs) as env:
+            env.connect()
+            env.reset()
+            no_op = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+            for _ in range(10):
+                env.step([no_op, no_op])
+            path = env.save_replay(self.create_tempdir().full_path)
+
+        with open(path) as f:
+            info = replay.read_replay_info(f)
+        self.assertEqual(info["players"], env_kwargs["players"])
+        self.assertGreaterEqual(info["action_count"], 20)
+
+    @utils.requires_redis
+    def testRecordReplay(self):
+        env_kwargs = utils.fake_env_kwargs()
+        map_name = env_kwargs.pop("map_name")
+        players = env_kwargs.pop("players")
+        played_dir = os.path.join(self.create_tempdir().full_path, "played")
+        env = trajectory.TrajectoryRecorder(lol_env.LoLEnv(
+            map_name=map_name, players=players, **env_kwargs),
+            played_dir)
+        with env:
+            env.connect()
+            for _ in range(2):
+                env.reset()
+                for step in range(10):
+                    env.step([
+                        actions.FunctionCall(actions.FUNCTIONS.move.id,
+                                             [[step % 8, 7 - step % 8]]),
+                        actions.FunctionCall(actions.FUNCTIONS.spell.id,
+                                             [[step % 4], [step, 2 * step]])])
+            path = env.save_replay(self.create_tempdir().full_path)
+
+        resimulated_dir = os.path.join(self.create_tempdir().full_path,
+                                       "resimulated")
+        num_steps = trajectory.record_replay(path, resimulated_dir, **env_kwargs)
+        with trajectory.TrajectoryDataset([played_dir]) as played, \
+                trajectory.TrajectoryDataset([resimulated_dir]) as resimulated:
+            self.assertEqual(num_steps, len(played))
+            self.assertEqual(len(resimulated), len(played))
+            self.assertEqual(resimulated.num_episodes, played.num_episodes)
+            steps = np.arange(len(played))
+            expected = played.get(steps, played.columns)
+            for column, values in resimulated.get(steps, played.columns).items():
+                np.testing.assert_array_equal(values, expected[column],
+                                              err_msg=column)
+
+if __name__ == "__main__":
+    absltest.main()
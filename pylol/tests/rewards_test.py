@@ -0,0 +1,100 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the vectorized rewards against the scalar definition of each term."""
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.env import rewards
+from pylol.lib import features
+from pylol.tests import utils
+
+ChampUnit = features.ChampUnit
+
+def units(me, enemy):
+    out = np.ones((2, len(ChampUnit)), dtype=np.float32)
+    out[:, ChampUnit.max_hp] = 100
+    out[:, ChampUnit.max_mp] = 50
+    for i, fields in enumerate((me, enemy)):
+        for name, value in fields.items():
+            out[i, ChampUnit[name]] = value
+    return out
+
+class RewardsTest(utils.TestCase):
+
+    def testTerms(self):
+        last = units({"current_xp": 100, "current_gold": 500, "current_hp": 100,
+                      "current_mp": 50},
+                     {"current_hp": 100, "current_mp": 50})
+        cur = units({"current_xp": 150, "current_gold": 600, "current_hp": 50,
+                     "current_mp": 25, "kill_count": 2},
+                    {"current_xp": 10, "current_hp": 0, "current_mp": 50,
+                     "death_count": 2})
+        reward, terms = rewards.calc_rewards(last, cur)
+
+        self.assertAlmostEqual(terms.winning, 0)
+        self.assertAlmostEqual(terms.death, 1)
+        self.assertAlmostEqual(terms.xp, (50 - 9) * 0.002, places=5)
+        self.assertAlmostEqual(terms.gold, 100 * 0.006, places=5)
+        self.assertAlmostEqual(terms.hp, 2.0 * (
+            rewards.hp_change_to_reward(-0.5) - rewards.hp_change_to_reward(-1)),
+            places=5)
+        self.assertAlmostEqual(terms.mp, -0.5 * 0.75, places=5)
+        self.assertAlmostEqual(terms.kill, 1)
+        self.assertAlmostEqual(reward, sum(terms.values()), places=5)
+
+    def testWinning(self):
+        last = units({}, {})
+        ahead = units({"kill_count": 2}, {"kill_count": 1})
+        behind = units({"kill_count": 1}, {"kill_count": 2})
+        _, terms = rewards.calc_rewards(last, ahead, last_step=True)
+        self.assertEqual(terms.winning, 5)
+        _, terms = rewards.calc_rewards(last, behind, last_step=True)
+        self.assertEqual(terms.winning, -5)
+        _, terms = rewards.calc_rewards(last, ahead, last_step=False)
+        self.assertEqual(terms.winning, 0)
+
+    def testBatched(self):
+        last = units({}, {})
+        cur = units({"current_gold": 10}, {"current_gold": 20})
+        batch_last = np.stack([np.stack([last, cur]), np.stack([cur, last])])
+        batch_cur = np.stack([np.stack([cur, cur]), np.stack([last, cur])])
+        reward, terms = rewards.calc_rewards(
+            batch_last, batch_cur, last_step=np.array([[False], [True]]),
+            weights=rewards.RewardWeights(gold=1.0))
+        self.assertEqual(reward.shape, (2, 2))
+        for e in range(2):
+            for a in range(2):
+                expected, _ = rewards.calc_rewards(
+                    batch_last[e, a], batch_cur[e, a], last_step=e == 1,
+                    weights=rewards.RewardWeights(gold=1.0))
+                self.assertAlmostEqual(reward[e, a], expected, places=5)
+        np.testing.assert_allclose(terms.gold, [[-10, 0], [10, -10]])
+
+    def testStackUnits(self):
+        obs = {"me_unit": units({}, {})[0], "enemy_unit": units({}, {})[1]}
+        self.assertEqual(rewards.stack_units([obs, obs]).shape,
+                         (2, 2, len(ChampUnit)))
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,99 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test the shared memory buffers used by `LoLVecEnv`."""
+
+import multiprocessing
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.env import shared_buffers
+from pylol.lib import actions
+from pylol.lib import features
+from pylol.tests import utils
+
+OBS_SPEC = {
+    "my_id": (),
+    "champ_units": (2, len(features.ChampUnit)),
+    "available_actions": (0,),
+}
+
+def _write(name, slot, env_index, observations):
+    buffers = shared_buffers.SharedBuffers(OBS_SPEC, 2, 2, name=name)
+    buffers.write(slot, env_index, observations)
+    buffers.close()
+
+class SharedBuffersTest(utils.TestCase):
+
+    def testActionsRoundTrip(self):
+        func_calls = [
+            actions.FunctionCall(actions.FUNCTIONS.spell.id, [[3], [7010.5, 6.0]]),
+            actions.FunctionCall(actions.FUNCTIONS.move.id, [[1, 7]]),
+            actions.FunctionCall(actions.FUNCTIONS.no_op.id, []),
+        ]
+        out = np.empty((3, shared_buffers.ACTION_WIDTH),
+                       dtype=shared_buffers.ACTION_DTYPE)
+        shared_buffers.encode_actions(func_calls, out)
+        self.assertEqual(shared_buffers.decode_actions(out), func_calls)
+
+    def testActionMaskIsBool(self):
+        spec = dict(OBS_SPEC, action_mask=features.ACTION_MASK_SHAPE)
+        buffers = shared_buffers.SharedBuffers(spec, 1, 2)
+        try:
+            mask = np.zeros(features.ACTION_MASK_SHAPE, dtype=bool)
+            mask[actions.FUNCTIONS.spell.id, 3] = True
+            buffers.write(0, 0, [dict(my_id=i, champ_units=0, action_mask=mask)
+                                 for i in (1, 2)])
+            obs = buffers.read(0)
+            self.assertEqual(obs["action_mask"].dtype, bool)
+            np.testing.assert_array_equal(obs["action_mask"][0, 1], mask)
+            del obs
+        finally:
+            buffers.close()
+
+    def testWorkerWritesAreVisible(self):
+        buffers = shared_buffers.SharedBuffers(OBS_SPEC, 2, 2)
+        try:
+            self.assertEqual(sorted(buffers.keys), ["champ_units", "my_id"])
+            observations = [
+                {"my_id": i, "champ_units": np.full((2, len(features.ChampUnit)), i),
+                 "available_actions": [0]}
+                for i in (1, 2)]
+            proc = multiprocessing.get_context("spawn").Process(
+                target=_write, args=(buffers.name, 1, 1, observations))
+            proc.start()
+            proc.join()
+            self.assertEqual(proc.exitcode, 0)
+
+            obs = buffers.read(1)
+            np.testing.assert_array_equal(obs["my_id"], [[0, 0], [1, 2]])
+            self.assertEqual(obs["champ_units"].shape,
+                             (2, 2, 2, len(features.ChampUnit)))
+            self.assertEqual(obs["champ_units"][1, 1].min(), 2)
+            self.assertFalse(buffers.read(0)["champ_units"].any())
+            del obs
+        finally:
+            buffers.close()
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,162 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test recording trajectories to columnar chunks."""
+
+import json
+import os
+import tempfile
+
+from absl.testing import absltest
+
+import numpy as np
+
+from pylol.env import environment
+from pylol.env import shared_buffers
+from pylol.env import trajectory
+from pylol.lib import actions
+from pylol.lib import features
+from pylol.tests import utils
+
+OBS_SPEC = {
+    "my_id": (),
+    "champ_units": (2, len(features.ChampUnit)),
+    "action_mask": features.ACTION_MASK_SHAPE,
+    "available_actions": (0,),
+}
+
+def _timesteps(step, step_type):
+    return tuple(environment.TimeStep(
+        step_type=step_type,
+        reward=float(step + i),
+        discount=1.0,
+        observation={
+            "my_id": i,
+            "champ_units": np.full((2, len(features.ChampUnit)), step),
+            "action_mask": np.ones(features.ACTION_MASK_SHAPE, dtype=bool),
+            "available_actions": [0, 1],
+        }) for i in range(2))
+
+class TrajectoryWriterTest(utils.TestCase):
+
+    def testWriteChunks(self):
+        directory = tempfile.mkdtemp()
+        move = actions.FunctionCall(actions.FUNCTIONS.move.id, [[1, 7]])
+        with trajectory.TrajectoryWriter(directory, OBS_SPEC, 2,
+                                         chunk_size=3) as writer:
+            for step in range(7):
+                last = step == 6
+                writer.append(
+                    _timesteps(step, environment.StepType.LAST if last else
+                               environment.StepType.MID),
+                    None if last else [move, move])
+        self.assertEqual(writer.num_steps, 7)
+
+        with open(os.path.join(directory, trajectory.META_FILE)) as f:
+            meta = json.load(f)
+        self.assertEqual(meta["num_steps"], 7)
+        self.assertEqual(meta["chunk_lengths"], [3, 3, 1])
+        self.assertNotIn("observation/available_actions", meta["columns"])
+
+        def load(name):
+            return np.concatenate([
+                np.load(os.path.join(directory, name,
+                                     trajectory.CHUNK_FORMAT % i))
+                for i in range(3)])
+
+        np.testing.assert_array_equal(load("reward")[:, 1], np.arange(7) + 1)
+        np.testing.assert_array_equal(
+            load("observation/champ_units")[:, 0, 0, 0], np.arange(7))
+        self.assertEqual(load("observation/action_mask").dtype, bool)
+        self.assertEqual(load("step_type")[-1], environment.StepType.LAST)
+        acts = load("action")
+        self.assertEqual(acts.shape, (7, 2, shared_buffers.ACTION_WIDTH))
+        self.assertEqual(shared_buffers.decode_actions(acts[0]), [move, move])
+        self.assertEqual(shared_buffers.decode_actions(acts[-1])[0].function,
+                         actions.FUNCTIONS.no_op.id)
+
+    def testRefuseToOverwrite(self):
+        directory = tempfile.mkdtemp()
+        trajectory.TrajectoryWriter(directory, OBS_SPEC, 2).close()
+        with self.assertRaises(ValueError):
+            trajectory.TrajectoryWriter(directory, OBS_SPEC, 2)
+
+def _record(directory, episode_lengths, chunk_size=4):
+    """Record episodes whose steps' rewards count up from 0."""
+    step = 0
+    with trajectory.TrajectoryWriter(directory, OBS_SPEC, 2,
+                                     chunk_size=chunk_size) as writer:
+        for length in episode_lengths:
+            for i in range(length):
+                step_type = (environment.StepType.FIRST if i == 0 else
+                             environment.StepType.LAST if i == length - 1 else
+                             environment.StepType.MID)
+                writer.append(_timesteps(step, step_type))
+                step += 1
+
+class TrajectoryDatasetTest(utils.TestCase):
+
+    def setUp(self):
+        super(TrajectoryDatasetTest, self).setUp()
+        root = tempfile.mkdtemp()
+        _record(os.path.join(root, "a"), [5, 3])
+        _record(os.path.join(root, "b"), [6])
+        self.dataset = trajectory.TrajectoryDataset(
+            trajectory.find_recordings(root), max_open_chunks=2)
+
+    def tearDown(self):
+        self.dataset.close()
+        super(TrajectoryDatasetTest, self).tearDown()
+
+    def testIndex(self):
+        self.assertLen(self.dataset, 14)
+        self.assertEqual(self.dataset.num_episodes, 3)
+        self.assertEqual(self.dataset.episode(1), (5, 3))
+        self.assertEqual(self.dataset.episode(2), (8, 6))
+
+    def testGet(self):
+        batch = self.dataset.get([[0, 13], [7, 8]], columns=["reward", "step_type"])
+        # The rewards count up again in the second recording.
+        np.testing.assert_array_equal(batch["reward"][..., 0], [[0, 5], [7, 0]])
+        self.assertEqual(batch["step_type"].shape, (2, 2))
+        with self.assertRaises(IndexError):
+            self.dataset.get([14])
+
+    def testSampleTransitions(self):
+        batch = self.dataset.sample_transitions(
+            100, rng=np.random.RandomState(0))
+        self.assertEqual(batch["observation/champ_units"].shape,
+                         (100, 2, 2, len(features.ChampUnit)))
+        # Never across the end of an episode.
+        self.assertTrue(np.all(batch["next/reward"] == batch["reward"] + 1))
+        self.assertFalse(np.any(batch["step_type"] == environment.StepType.LAST))
+
+    def testSampleSequences(self):
+        batch = self.dataset.sample_sequences(
+            50, 4, columns=["reward"], rng=np.random.RandomState(0))
+        rewards = batch["reward"][..., 0]
+        self.assertEqual(rewards.shape, (50, 4))
+        np.testing.assert_array_equal(np.diff(rewards, axis=1), 1)
+        with self.assertRaises(ValueError):
+            self.dataset.sample_sequences(1, 7)
+
+if __name__ == "__main__":
+    absltest.main()
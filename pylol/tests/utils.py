@@ -21,13 +21,71 @@
 # SOFTWARE.
 """Unit test tools."""
 
+import shutil
+import unittest
+
+from absl import flags
 from absl.testing import absltest
 
+from pylol import run_configs
+from pylol.env import lol_env
+from pylol.lib import features
+
+# For the tests which play a game on the fake GameServer.
+requires_redis = unittest.skipUnless(shutil.which("redis-server"),
+                                     "Needs redis-server")
+
+def fake_game_kwargs(**kwargs):
+    """The arguments for launching a game of two Ezreals on the fake
+    GameServer, e.g. with `lol_env.launch_game`, `kwargs` override them."""
+    kwargs.setdefault("host", "localhost")
+    kwargs.setdefault("map_name", "Old Summoners Rift")
+    kwargs.setdefault("players", [lol_env.Agent(champion="Ezreal", team="BLUE"),
+                                  lol_env.Agent(champion="Ezreal", team="PURPLE")])
+    if "run_config" not in kwargs:
+        kwargs["run_config"] = run_configs.platforms.Fake()
+    return kwargs
+
+def fake_env_kwargs(**kwargs):
+    """The arguments of a `LoLEnv` playing `fake_game_kwargs`."""
+    if "agent_interface_format" not in kwargs:
+        kwargs["agent_interface_format"] = lol_env.parse_agent_interface_format(
+            feature_map=16000,
+            feature_move_range=8)
+    return fake_game_kwargs(**kwargs)
+
+def champ_unit(user_id, position=(0.0, 0.0), distance_to_me=500.0, my_team=0.0,
+               **kwargs):
+    """A JSON champion unit like the GameServer sends, `kwargs` override fields."""
+    unit = {c.name: 1.0 for c in features.ChampUnit}
+    del unit["position_x"], unit["position_y"]
+    unit.update(user_id=user_id, position={"X": position[0], "Y": position[1]},
+                distance_to_me=distance_to_me, my_team=my_team, **kwargs)
+    return unit
+
+def observation(champ_units, game_time=1.0, available=True):
+    """A JSON observation like the GameServer sends."""
+    flags = ["can_no_op", "can_move"] + ["can_spell_%s" % i for i in range(6)]
+    return {"observation": {
+        "game_time": game_time,
+        "champ_units": champ_units,
+        "available_actions": {f: available for f in flags}}}
+
+def champ_unit_row(unit):
+    """The `ChampUnit` row for a JSON champion unit."""
+    return [unit["position"]["X"] if c == features.ChampUnit.position_x else
+            unit["position"]["Y"] if c == features.ChampUnit.position_y else
+            unit[c.name] for c in features.ChampUnit]
+
 class TestCase(absltest.TestCase):
     """A test base class which isn't implemented for now."""
 
     def setUp(self):
         super(TestCase, self).setUp()
+        # Runners other than absltest, e.g. pytest, don't parse the flags,
+        # which `create_tempdir` needs.
+        if not flags.FLAGS.is_parsed():
+            flags.FLAGS.mark_as_parsed()
     
     def tearDown(self):
         super(TestCase, self).tearDown()
\ No newline at end of file
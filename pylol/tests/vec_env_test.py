@@ -0,0 +1,55 @@
+# MIT License
+# 
+# Copyright (c) 2020 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Test stepping many environments from one learner."""
+
+from absl.testing import absltest
+
+from pylol.env import vec_env
+from pylol.lib import actions
+from pylol.tests import utils
+
+@utils.requires_redis
+class LoLVecEnvTest(utils.TestCase):
+
+    def setUp(self):
+        super(LoLVecEnvTest, self).setUp()
+        self._env = vec_env.LoLVecEnv(2, **utils.fake_env_kwargs())
+        self.addCleanup(self._env.close)
+
+    def testStep(self):
+        obs = self._env.reset()
+        self.assertEqual(obs["my_id"].shape, (2, 2))
+        no_op = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+        obs, rewards, dones = self._env.step([[no_op, no_op]] * 2)
+        self.assertEqual(rewards.shape, (2, 2))
+        self.assertEqual(dones.shape, (2,))
+
+    def testFailedWorkers(self):
+        self._env.reset()
+        with self.assertRaisesRegex(RuntimeError, "2 environment worker"):
+            self._env._call("unknown")
+        # Every reply was received, so the next call isn't handed stale ones.
+        with self.assertRaisesRegex(RuntimeError, "The worker has exited"):
+            self._env._call("spec")
+
+if __name__ == "__main__":
+    absltest.main()